@@ -3,3 +3,7 @@ from enum import Enum
 class Algorithm(Enum):
     SHA1 = 1
     MD5 = 2
+    NTLM = 3
+    SHA256 = 4
+    SHA512 = 5
+    LM = 6
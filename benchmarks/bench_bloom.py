@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Measures the endpoint probes of memory-mapped tables with and without a
+Bloom filter, with the table file evicted from the page cache.
+
+A table file of random endpoints is written for every false positive rate,
+plus one without filter. Before every probe the file is dropped from the
+page cache (madvise and posix_fadvise DONTNEED), so a probe reading the records pays
+the page faults of a disk-resident table. Most probes are of missing
+endpoints, as in a lookup; --hit-rate of them are of stored endpoints.
+
+Usage: python3 benchmarks/bench_bloom.py [--chains N] [--probes N] [--fpr P ...]
+                                         [--hit-rate H] [--seed S] [--directory DIR]
+"""
+import os
+import sys
+import argparse
+import json
+import mmap
+import random
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_suite import scratch_directory
+from keyspace import Keyspace
+from tablefile import TableHeader, _prefix, open_table, write_table
+
+CHARSET = "abcdefghijklmnopqrstuvwxyz0123456789"
+SHA1 = 1
+
+
+def write_random_table(filename, chains, seed, fpr):
+    """Writes a table of random sorted SHA-1 sized endpoints, returns them"""
+    rng = random.Random(seed)
+    keyspace = Keyspace(CHARSET, 1, 6)
+    endpoints = sorted({rng.getrandbits(160).to_bytes(20, 'big') for _ in range(chains)})
+    header = TableHeader(SHA1, CHARSET, 1, 6, 1000, len(endpoints), len(endpoints),
+                         20, keyspace.index_size(), {"reduce_version": 2})
+    if fpr:
+        header.bloom = {"fpr": fpr}
+    write_table(filename, header,
+                ((endpoint, rng.randrange(keyspace.size)) for endpoint in endpoints))
+    return endpoints
+
+
+def evict(filename, buffer):
+    """Drops the pages of a file from the page cache and from a mapping of
+    it (the page cache keeps the pages of a file while they are mapped)"""
+    if isinstance(buffer, mmap.mmap):
+        buffer.madvise(mmap.MADV_DONTNEED)
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def measure(filename, probes):
+    """Returns the probe latencies (seconds) of a table file, cold"""
+    keyspace = Keyspace(CHARSET, 1, 6)
+    _, index = open_table(filename, lambda header: keyspace)
+    latencies = []
+    hits = 0
+    for endpoint in probes:
+        evict(filename, index.buffer)
+        start = time.perf_counter()
+        found = index.find(endpoint)
+        latencies.append(time.perf_counter() - start)
+        hits += found is not None
+    return latencies, hits, index
+
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    return {
+        "mean_us": sum(ordered) / len(ordered) * 1e6,
+        "p50_us": ordered[len(ordered) // 2] * 1e6,
+        "p99_us": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chains", type=int, default=1000000)
+    parser.add_argument("--probes", type=int, default=2000)
+    parser.add_argument("--fpr", type=float, action="append",
+                        help="false positive rates of the filters, may be repeated")
+    parser.add_argument("--hit-rate", type=float, default=0.01,
+                        help="share of probes of stored endpoints")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--directory", help="where the table files are written "
+                                            "(default: a temporary directory)")
+    args = parser.parse_args()
+    rates = args.fpr or [0.1, 0.01, 0.001]
+
+    results = {"chains": args.chains, "probes": args.probes, "hit_rate": args.hit_rate,
+               "cases": []}
+    with scratch_directory(args.directory) as directory:
+        rng = random.Random(args.seed + 1)
+        stored = set()
+        for fpr in [0] + rates:
+            filename = os.path.join(directory, f"table{fpr}.rt")
+            endpoints = write_random_table(filename, args.chains, args.seed, fpr)
+            if fpr == 0:
+                stored = set(endpoints)
+                probes = [rng.choice(endpoints) if rng.random() < args.hit_rate
+                          else rng.getrandbits(160).to_bytes(20, 'big')
+                          for _ in range(args.probes)]
+            latencies, hits, index = measure(filename, probes)
+            bloom = index.bloom
+            missing = [endpoint for endpoint in probes if endpoint not in stored]
+            results["cases"].append({
+                "fpr": fpr,
+                "filter_bytes": len(bloom.buffer) if bloom is not None else 0,
+                "filter_bits_per_chain": bloom.bits / len(endpoints) if bloom is not None else 0,
+                "file_bytes": os.path.getsize(filename),
+                "hits": hits,
+                "measured_fpr": (sum(_prefix(endpoint) in bloom for endpoint in missing)
+                                 / max(1, len(missing))) if bloom is not None else 1,
+                "probe_latency": summary(latencies),
+            })
+            os.remove(filename)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
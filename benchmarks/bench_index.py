@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Compares the memory and probe latency of the chain endpoint index with
+the dict + GomuhryTree pair previously kept by RainbowTable.
+
+Usage: python3 benchmarks/bench_index.py [--chains N] [--probes N] [--seed S]
+"""
+import os
+import sys
+import argparse
+import hashlib
+import json
+import random
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_suite import scratch_directory
+from keyspace import Keyspace
+from rainbowtable import GomuhryTree
+from tablefile import EndpointIndex
+
+CHARSET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+def make_chains(count, seed):
+    """Returns count random (start password, sha1 endpoint) pairs"""
+    rng = random.Random(seed)
+    chains = []
+    for _ in range(count):
+        password = ''.join(rng.choices(CHARSET, k=rng.randint(1, 8)))
+        chains.append((password, hashlib.sha1(password.encode() + b"#").digest()))
+    return chains
+
+
+def build_legacy(chains):
+    table = {}
+    tree = GomuhryTree(t=5)
+    for password, endpoint in chains:
+        table[endpoint] = password
+        tree.insert(endpoint, password)
+    return table, tree
+
+
+def build_index(chains):
+    keyspace = Keyspace(CHARSET, 1, 8)
+    index_size = keyspace.index_size()
+    # the last chain of an endpoint wins, as in the dict
+    starts = {endpoint: keyspace.rank(password) for password, endpoint in chains}
+    return EndpointIndex.from_sorted(sorted(starts.items()), 20, index_size, keyspace)
+
+
+def measure_build(build, chains):
+    """Returns (structure, seconds, bytes allocated) for one build"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    structure = build(chains)
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return structure, elapsed, size
+
+
+def measure_probes(probe, keys):
+    """Returns the mean probe latency in microseconds"""
+    start = time.perf_counter()
+    for key in keys:
+        probe(key)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chains", type=int, default=200000)
+    parser.add_argument("--probes", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with scratch_directory():
+        chains = make_chains(args.chains, args.seed)
+        rng = random.Random(args.seed + 1)
+        hits = [endpoint for _, endpoint in rng.sample(chains, min(args.probes, len(chains)))]
+        misses = [hashlib.sha1(str(rng.random()).encode()).digest() for _ in range(args.probes)]
+
+        (table, tree), legacy_time, legacy_bytes = measure_build(build_legacy, chains)
+        # the legacy structures also keep every start password as a str object
+        legacy_bytes += sum(sys.getsizeof(password) for password, _ in chains)
+        index, index_time, index_bytes = measure_build(build_index, chains)
+
+        results = {
+            "chains": args.chains,
+            "dict_tree": {
+                "build_seconds": legacy_time,
+                "bytes_per_chain": legacy_bytes / args.chains,
+                "dict_hit_us": measure_probes(table.get, hits),
+                "tree_hit_us": measure_probes(tree.search, hits),
+                "tree_miss_us": measure_probes(tree.search, misses),
+            },
+            "endpoint_index": {
+                "build_seconds": index_time,
+                "bytes_per_chain": index_bytes / args.chains,
+                "hit_us": measure_probes(index.find, hits),
+                "miss_us": measure_probes(index.find, misses),
+            },
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""Reproducible benchmarks of table generation, lookup and persistence.
+
+Every case builds a table with a fixed seed, then measures:
+  - generation: chains/sec and hash + reduce steps/sec
+  - save_to_file / load_from_file time, file and memory bytes per chain,
+    and file bytes per chain of the compact layout
+  - lookup: mean, p50 and p99 latency, overall and by false alarm count,
+    over hashes of passwords drawn from the chains and from the keyspace
+
+Results are printed (or written with --output) as JSON. With --baseline,
+the throughputs and latencies are compared to an earlier run, and the
+script exits with status 1 if one regressed by more than --tolerance.
+
+Usage: python3 benchmarks/bench_suite.py [--quick] [--case ALGO:CHARSET:MIN:MAX:CHAIN_LENGTH:CHAINS ...]
+                                         [--lookups N] [--seed S] [--output FILE]
+                                         [--baseline FILE] [--tolerance T]
+"""
+import os
+import sys
+import argparse
+import json
+import math
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from chainkernel import np
+from rainbowtable import RainbowTable
+
+DEFAULT_CASES = [
+    "sha1:lower_alphanumeric:1:5:100:20000",
+    "sha1:alphanumeric:4:6:400:10000",
+    "md5:numeric:6:8:1000:5000",
+    "ntlm:lower_alphanumeric:3:5:200:5000",
+]
+QUICK_CASES = [
+    "sha1:lower_alphanumeric:1:4:50:2000",
+    "md5:numeric:4:6:100:1000",
+]
+# false alarm count buckets of the lookup latencies
+FALSE_ALARM_BUCKETS = [(0, 0), (1, 1), (2, 3), (4, 7), (8, None)]
+# metrics compared with --baseline, and whether higher is better
+COMPARED = {
+    "chains_per_second": True,
+    "steps_per_second": True,
+    "save_seconds": False,
+    "load_seconds": False,
+    "lookup_mean_ms": False,
+    "lookup_p99_ms": False,
+}
+
+
+def parse_case(case):
+    """Parses ALGO:CHARSET:MIN:MAX:CHAIN_LENGTH:CHAINS"""
+    algorithm, charset, min_length, max_length, chain_length, chains = case.split(":")
+    return (algorithm, charset, int(min_length), int(max_length),
+            int(chain_length), int(chains))
+
+
+def percentile(values, fraction):
+    """Returns the given percentile of a non-empty list (nearest rank)"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def latency_summary(latencies):
+    """Returns the mean, p50 and p99 of latencies in milliseconds"""
+    if not latencies:
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        "mean_ms": sum(latencies) / len(latencies) * 1e3,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+    }
+
+
+def lookup_hashes(rt, count, seed):
+    """Returns hashes of passwords met in the chains (half of them) and of
+    random passwords of the keyspace"""
+    rng = random.Random(seed)
+    starts = list(rt.table.values())
+    hashes = []
+    for n in range(count):
+        if n % 2 == 0 and starts:
+            # a password a random number of columns into a stored chain
+            password = rng.choice(starts)
+            for column in range(rng.randrange(rt.chain_length)):
+                password = rt.reduce_function(rt.hash_function(password), column)
+        else:
+            password = rt.random_password(rng)
+        hashes.append(rt.hash_function(password).hex())
+    return hashes
+
+
+def run_case(case, lookups, seed, directory):
+    """Benchmarks one case, returns its results"""
+    algorithm, charset, min_length, max_length, chain_length, chains = parse_case(case)
+    rt = RainbowTable(algorithm, charset, min_length, max_length, chain_length, chains)
+
+    start = time.perf_counter()
+    rt.generate_table(seed=seed)
+    generate_seconds = time.perf_counter() - start
+
+    filename = os.path.join(directory, "table.rt")
+    start = time.perf_counter()
+    rt.save_to_file(filename)
+    save_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    loaded = RainbowTable.load_from_file(filename)
+    load_seconds = time.perf_counter() - start
+    stored = len(loaded.table)
+    file_bytes = os.path.getsize(filename)
+    compact_filename = os.path.join(directory, "compact.rt")
+    rt.save_to_file(compact_filename, compact=True)
+    compact_file_bytes = os.path.getsize(compact_filename)
+    os.remove(compact_filename)
+    memory_bytes = len(rt.table.buffer) + rt.table.prefixes.itemsize * len(rt.table.prefixes)
+
+    latencies = []
+    by_false_alarms = {}
+    cracked = 0
+    for hash_string in lookup_hashes(loaded, lookups, seed + 1):
+        start = time.perf_counter()
+        result = loaded.lookup_detailed(hash_string)
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        cracked += result.password is not None
+        for low, high in FALSE_ALARM_BUCKETS:
+            if result.false_alarms >= low and (high is None or result.false_alarms <= high):
+                label = f"{low}+" if high is None else (
+                    str(low) if low == high else f"{low}-{high}")
+                by_false_alarms.setdefault(label, []).append(elapsed)
+                break
+    overall = latency_summary(latencies)
+    os.remove(filename)
+
+    return {
+        "case": case,
+        "stored_chains": stored,
+        "coverage": rt.coverage,
+        "generate_seconds": generate_seconds,
+        "chains_per_second": chains / generate_seconds,
+        "steps_per_second": chains * chain_length / generate_seconds,
+        "save_seconds": save_seconds,
+        "load_seconds": load_seconds,
+        "file_bytes_per_chain": file_bytes / stored,
+        "compact_file_bytes_per_chain": compact_file_bytes / stored,
+        "memory_bytes_per_chain": memory_bytes / stored,
+        "lookups": lookups,
+        "lookup_success_rate": cracked / lookups if lookups else 0.0,
+        "lookup_mean_ms": overall.get("mean_ms"),
+        "lookup_p99_ms": overall.get("p99_ms"),
+        "lookup_latency": overall,
+        "lookup_latency_by_false_alarms": {
+            label: latency_summary(values) for label, values in by_false_alarms.items()},
+    }
+
+
+@contextmanager
+def scratch_directory(parent=None):
+    """Runs the with block in a temporary directory, deleted afterwards:
+    tables read config/config.ini, log to log/ and write hash.txt in the
+    working directory, so this keeps them out of the caller's"""
+    with tempfile.TemporaryDirectory(dir=parent) as directory:
+        os.symlink(os.path.abspath(os.path.join(ROOT, "config")),
+                   os.path.join(directory, "config"))
+        os.mkdir(os.path.join(directory, "log"))
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            yield directory
+        finally:
+            os.chdir(cwd)
+
+
+def environment():
+    """Describes the machine and the code version measured"""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "numpy": np is not None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Returns the regressions of results against a baseline run"""
+    previous = {case["case"]: case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        old = previous.get(case["case"])
+        if old is None:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            if not old.get(metric) or case.get(metric) is None:
+                continue
+            ratio = case[metric] / old[metric]
+            if (ratio < 1 - tolerance) if higher_is_better else (ratio > 1 + tolerance):
+                regressions.append({"case": case["case"], "metric": metric,
+                                    "baseline": old[metric], "current": case[metric]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--case", action="append",
+                        help="ALGO:CHARSET:MIN:MAX:CHAIN_LENGTH:CHAINS, may be repeated")
+    parser.add_argument("--quick", action="store_true", help="run the small cases only")
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+    cases = args.case or (QUICK_CASES if args.quick else DEFAULT_CASES)
+
+    results = {"environment": environment(), "seed": args.seed, "cases": []}
+    with scratch_directory() as directory:
+        for case in cases:
+            results["cases"].append(run_case(case, args.lookups, args.seed, directory))
+
+    if args.baseline is not None:
+        with open(args.baseline) as fd:
+            results["regressions"] = compare(results, json.load(fd), args.tolerance)
+
+    encoded = json.dumps(results, indent=2)
+    if args.output is not None:
+        with open(args.output, "w") as fd:
+            fd.write(encoded + "\n")
+    else:
+        print(encoded)
+    if results.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+'''Bloom filter over the endpoints of a table.
+
+The filter is stored after the records of a table file and read into
+memory when the table is opened, so it stays resident while the records
+are only memory-mapped. A probe whose endpoint is not in the filter is
+rejected without touching the records; the filter never rejects a stored
+endpoint, and accepts a missing one with probability about fpr.
+
+Keys are 64-bit integers: the first 8 bytes of an endpoint, or the
+truncated endpoint of a compact table. They are mixed with the splitmix64
+finalizer, whose two halves give the bit positions by double hashing.
+'''
+import math
+
+MASK64 = (1 << 64) - 1
+
+
+def mix(key):
+    '''Returns the splitmix64 finalizer of a 64-bit key'''
+    key = (key + 0x9E3779B97F4A7C15) & MASK64
+    key = ((key ^ (key >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    key = ((key ^ (key >> 27)) * 0x94D049BB133111EB) & MASK64
+    return key ^ (key >> 31)
+
+
+def filter_size(count, fpr):
+    '''Returns the number of bits and of hash functions of a Bloom filter
+    of count keys with the given false positive rate
+
+    Arguments:
+        count {int} -- number of keys
+        fpr {float} -- false positive rate, between 0 and 1
+
+    Raises:
+        ValueError -- if fpr is not between 0 and 1
+
+    Returns:
+        tuple -- number of bits (a multiple of 8) and of hash functions
+    '''
+    if not 0 < fpr < 1:
+        raise ValueError("The false positive rate must be between 0 and 1")
+    bits = math.ceil(-max(1, count) * math.log(fpr) / math.log(2) ** 2)
+    bits = max(64, -(-bits // 8) * 8)
+    hashes = max(1, round(bits / max(1, count) * math.log(2)))
+    return bits, hashes
+
+
+class BloomFilter:
+    '''Bloom filter of 64-bit keys over a bytearray'''
+
+    def __init__(self, bits, hashes, buffer=None, fpr=None):
+        """BloomFilter constructor
+
+        Arguments:
+                bits {int} -- size of the filter in bits, a multiple of 8
+                hashes {int} -- number of bits set per key
+                buffer {bytearray} -- the filter bits, empty if None
+                    (default: {None})
+                fpr {float} -- false positive rate the filter was sized
+                    for (default: {None})
+        """
+        self.bits = bits
+        self.hashes = hashes
+        self.buffer = buffer if buffer is not None else bytearray(bits // 8)
+        self.fpr = fpr
+
+    @staticmethod
+    def for_capacity(count, fpr):
+        '''Returns an empty filter sized for count keys (see filter_size)'''
+        return BloomFilter(*filter_size(count, fpr), fpr=fpr)
+
+    def _positions(self, key):
+        mixed = mix(key)
+        step = (mixed >> 32) | 1
+        bits = self.bits
+        return ((mixed + i * step) % bits for i in range(self.hashes))
+
+    def add(self, key):
+        '''Adds a key to the filter'''
+        buffer = self.buffer
+        for position in self._positions(key):
+            buffer[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        buffer = self.buffer
+        for position in self._positions(key):
+            if not buffer[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def expected_fpr(self, count):
+        '''Returns the false positive rate of the filter holding count keys'''
+        return (1 - math.exp(-self.hashes * count / self.bits)) ** self.hashes
@@ -0,0 +1,186 @@
+'''Batched chain stepping with NumPy.
+
+The kernel reduces many hashes at once: the digests are stacked in a
+uint8 matrix. For version 1 reduce functions the characters of every
+candidate are gathered with one lookup into a 256-entry byte -> character
+table; for version 2 the keyspace indices are computed as uint64 and
+unranked digit by digit for the whole batch. The candidates are handed to
+the hash backend in one batch, as slices of a single bytes buffer. Its
+output is bit-identical to RainbowTable.reduce_function followed by
+RainbowTable.hash_function.
+
+NumPy is optional: when it is missing (or the charset is not single-byte
+ASCII), ChainKernel.for_table returns None and RainbowTable falls back to
+its pure-Python functions.
+'''
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+from hashbackends import get_backend
+from keyspace import table_keyspace
+
+
+class ChainKernel:
+    '''Vectorized reduce + hash step for the chains of one table'''
+
+    def __init__(self, algorithm, charset, min_length, max_length, mask=None,
+                 reduce_version=1, width=None, masks=None):
+        """ChainKernel constructor
+
+        Arguments:
+                algorithm {Algorithm} -- hash algorithm of the table
+                charset {string} -- charset of the table (ASCII only)
+                min_length {int} -- minimum passwords length
+                max_length {int} -- maximum password length
+                mask {bytes} -- XORed into the digests before reducing
+                    (see RainbowTable.reduce_mask) (default: {None})
+                reduce_version {int} -- reduce functions version
+                    (default: {1})
+                width {int} -- leading digest bytes read by the version 2
+                    reduce (see RainbowTable.reduce_width) (default: {None})
+                masks {list} -- position charsets of the masks of the
+                    table, if any (see MaskKeyspace) (default: {None})
+        """
+        self.backend = get_backend(algorithm)
+        self.digest_size = self.backend.digest_size
+        self.min_length = min_length
+        self.max_length = max_length
+        self.span = max_length - min_length + 1
+        characters = np.frombuffer(charset.encode('ascii'), dtype=np.uint8)
+        # byte value -> character, same as charset[value % len(charset)]
+        self.lut = characters[np.arange(256) % len(characters)]
+        # character i of a password reads digest byte (column + i) % digest_size
+        self.offsets = np.arange(max_length)
+        self.mask = np.frombuffer(mask, dtype=np.uint8) if mask else None
+        self.reduce_version = reduce_version
+        self.width = width
+        self.masks = None
+        if reduce_version != 1:
+            keyspace = table_keyspace(charset, min_length, max_length, masks)
+            self.keyspace_size = keyspace.size
+            # first index of every password length (or mask), then the keyspace size
+            self.length_offsets = np.array(keyspace.offsets, dtype=np.uint64)
+            if masks:
+                self.masks = [[np.frombuffer(position.encode('ascii'), dtype=np.uint8)
+                               for position in mask] for mask in keyspace.masks]
+            else:
+                self.characters = characters
+                self.base = keyspace.base
+
+    @staticmethod
+    def for_table(table):
+        '''Returns a kernel for the table, or None if NumPy is missing or
+        the charset is not ASCII'''
+        if np is None:
+            return None
+        # the table charset and, with masks, the characters of the masks
+        if not (table.charset.isascii() and table.keyspace().charset.isascii()):
+            return None
+        if table.reduce_version != 1 and table.keyspace().size > 2 ** 63:
+            return None
+        return ChainKernel(table.algorithm, table.charset,
+                           table.min_length, table.max_length,
+                           table.reduce_mask(), table.reduce_version,
+                           table.reduce_width(), table.masks)
+
+    def reduce_many(self, hashes, column):
+        '''Reduces many digests with the reduce function of a column
+
+        Arguments:
+            hashes {list} -- digests to reduce
+            column {int} -- column of the digests
+
+        Returns:
+            tuple -- a bytes buffer holding one max_length-wide row per
+                digest, and the password length of every row
+        '''
+        digests = np.frombuffer(b''.join(hashes), dtype=np.uint8)
+        digests = digests.reshape(len(hashes), self.digest_size)
+        if self.mask is not None:
+            digests = digests ^ self.mask
+        if self.masks is not None:
+            return self.unrank_masks(self.indices(digests, column))
+        if self.reduce_version != 1:
+            return self.unrank_many(self.indices(digests, column))
+        lengths = digests[:, 1] % self.span + self.min_length
+        positions = (column + self.offsets) % self.digest_size
+        return self.lut[digests[:, positions]].tobytes(), lengths.tolist()
+
+    def indices(self, digests, column):
+        '''Returns the keyspace indices of the version 2 reduce of a
+        column: the leading width bytes of every digest, big-endian, plus
+        the column, modulo the keyspace size'''
+        size = self.keyspace_size
+        if self.width <= 8:
+            # the keyspace holds at most 2^32 passwords, sums fit in uint64
+            padded = np.zeros((len(digests), 8), dtype=np.uint8)
+            padded[:, 8 - self.width:] = digests[:, :self.width]
+            values = padded.view('>u8').ravel().astype(np.uint64)
+            return (values % np.uint64(size) + np.uint64(column % size)) % np.uint64(size)
+        rows = digests[:, :self.width].tobytes()
+        return np.array([(int.from_bytes(rows[start:start + self.width], 'big') + column) % size
+                         for start in range(0, len(rows), self.width)], dtype=np.uint64)
+
+    def unrank_many(self, indices):
+        '''Unranks keyspace indices (see Keyspace.unrank)
+
+        Returns:
+            tuple -- a bytes buffer holding one max_length-wide row per
+                index, and the password length of every row
+        '''
+        groups = np.searchsorted(self.length_offsets, indices, side='right') - 1
+        values = indices - self.length_offsets[groups]
+        lengths = groups + self.min_length
+        # digits[:, j] is the j-th least significant digit
+        digits = np.empty((len(indices), self.max_length), dtype=np.uint64)
+        base = np.uint64(self.base)
+        for j in range(self.max_length):
+            digits[:, j] = values % base
+            values //= base
+        # character i of a password is its digit length - 1 - i
+        positions = np.maximum(lengths[:, None] - 1 - self.offsets, 0)
+        characters = self.characters[np.take_along_axis(digits, positions, axis=1).astype(np.intp)]
+        return characters.tobytes(), lengths.tolist()
+
+    def unrank_masks(self, indices):
+        '''Unranks keyspace indices of a mask table (see
+        MaskKeyspace.unrank), mask by mask
+
+        Returns:
+            tuple -- a bytes buffer holding one max_length-wide row per
+                index, and the password length of every row
+        '''
+        groups = np.searchsorted(self.length_offsets, indices, side='right') - 1
+        values = indices - self.length_offsets[groups]
+        rows = np.zeros((len(indices), self.max_length), dtype=np.uint8)
+        lengths = np.zeros(len(indices), dtype=np.intp)
+        for k, mask in enumerate(self.masks):
+            selected = np.nonzero(groups == k)[0]
+            if not len(selected):
+                continue
+            lengths[selected] = len(mask)
+            remaining = values[selected]
+            # the last position is the least significant digit
+            for position in range(len(mask) - 1, -1, -1):
+                characters = mask[position]
+                base = np.uint64(len(characters))
+                rows[selected, position] = characters[(remaining % base).astype(np.intp)]
+                remaining = remaining // base
+        return rows.tobytes(), lengths.tolist()
+
+    def hash_many(self, passwords):
+        '''Hashes many plaintexts, given as bytes'''
+        return self.backend.hash_many(passwords)
+
+    def step_many(self, hashes, column):
+        '''Reduces many digests with the reduce function of a column and
+        hashes the results (see RainbowTable.step_many)'''
+        if not hashes:
+            return []
+        rows, lengths = self.reduce_many(hashes, column)
+        width = self.max_length
+        return self.backend.hash_many(
+            [rows[start:start + length]
+             for start, length in zip(range(0, len(rows), width), lengths)])
@@ -0,0 +1,164 @@
+'''Appendable checkpoints of a table generation.
+
+A checkpoint file starts with the generation parameters (JSON), followed
+by segments appended as generation goes. Every segment is a sorted run of
+the chains built since the previous one (see externalsort.py), followed
+by the generator state after them: start points are drawn from per-block
+RNGs (see RainbowTable.generate_block), so the next block number and the
+running totals are all that is needed to continue exactly where the run
+stopped. The state also records the length of the hash.txt log then, so
+the chains logged after the last segment are dropped on resume.
+
+A segment cut short by a crash fails its length or CRC check; it is
+dropped, and the file is truncated after the last good segment on resume.
+'''
+import json
+import os
+import struct
+import zlib
+
+MAGIC = b"RBCK"
+SEGMENT_MAGIC = b"SEGM"
+FORMAT_VERSION = 3
+HEADER = struct.Struct("<4sHI")
+SEGMENT = struct.Struct("<4sQQQQQQQQQI")
+READ_SIZE = 1 << 16
+
+
+class CheckpointState:
+    '''Generator state restored from a checkpoint'''
+
+    def __init__(self):
+        # (offset, size) of the sorted runs in the checkpoint file
+        self.runs = []
+        # blocks already built, and end of the current generation round
+        self.next_block = 0
+        self.round_end = None
+        # start points drawn, chains kept, total chain length and distinct
+        # endpoints known when the current round was planned
+        self.generated = 0
+        self.chains = 0
+        self.points = 0
+        self.unique = 0
+        # bytes of the hash.txt log holding the chains of the segments
+        self.log_offset = 0
+
+
+class Checkpoint:
+    '''Checkpoint file of one generation, open for appending'''
+
+    def __init__(self, filename, fd):
+        self.filename = filename
+        self.fd = fd
+
+    @staticmethod
+    def create(filename, parameters):
+        '''Starts a new checkpoint file, replacing any previous one
+
+        Arguments:
+            filename {string} -- checkpoint file path
+            parameters {dict} -- generation parameters, checked on resume
+
+        Returns:
+            Checkpoint -- the open checkpoint
+        '''
+        fd = open(filename, "wb")
+        encoded = json.dumps(parameters, sort_keys=True).encode('utf-8')
+        fd.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded)) + encoded)
+        fd.flush()
+        os.fsync(fd.fileno())
+        return Checkpoint(filename, fd)
+
+    @staticmethod
+    def _read_header(fd, filename):
+        header = fd.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError("Truncated checkpoint file " + filename)
+        magic, version, length = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("The file " + filename + " is not a checkpoint")
+        if version != FORMAT_VERSION:
+            raise ValueError("The checkpoint " + filename +
+                             " was written by another version")
+        return json.loads(fd.read(length))
+
+    @staticmethod
+    def read_parameters(filename):
+        '''Returns the generation parameters stored in a checkpoint file'''
+        with open(filename, "rb") as fd:
+            return Checkpoint._read_header(fd, filename)
+
+    @staticmethod
+    def resume(filename, parameters):
+        '''Reads a checkpoint file to continue its generation
+
+        Arguments:
+            filename {string} -- checkpoint file path
+            parameters {dict} -- parameters of the generation to resume
+
+        Raises:
+            ValueError -- if the file is not a checkpoint of these parameters
+
+        Returns:
+            tuple -- the open Checkpoint and the CheckpointState to resume from
+        '''
+        state = CheckpointState()
+        with open(filename, "rb") as fd:
+            stored = Checkpoint._read_header(fd, filename)
+            if stored != json.loads(json.dumps(parameters, sort_keys=True)):
+                raise ValueError("The checkpoint " + filename +
+                                 " was made with other generation parameters")
+            valid_end = fd.tell()
+            while True:
+                segment = fd.read(SEGMENT.size)
+                if len(segment) < SEGMENT.size:
+                    break
+                (magic, next_block, round_end, generated, chains, points,
+                 unique, log_offset, first_block, size, crc) = SEGMENT.unpack(segment)
+                offset = fd.tell()
+                checksum, remaining = 0, size
+                while remaining > 0:
+                    data = fd.read(min(READ_SIZE, remaining))
+                    if not data:
+                        break
+                    checksum = zlib.crc32(data, checksum)
+                    remaining -= len(data)
+                if magic != SEGMENT_MAGIC or remaining > 0 or checksum != crc \
+                        or first_block != state.next_block:
+                    break
+                if size > 0:
+                    state.runs.append((offset, size))
+                state.next_block = next_block
+                state.round_end = round_end
+                state.generated = generated
+                state.chains = chains
+                state.points = points
+                state.unique = unique
+                state.log_offset = log_offset
+                valid_end = fd.tell()
+        fd = open(filename, "r+b")
+        fd.truncate(valid_end)
+        fd.seek(valid_end)
+        return Checkpoint(filename, fd), state
+
+    def append(self, first_block, state, records):
+        '''Appends a segment, syncs it to disk and adds its run to state.runs
+
+        Arguments:
+            first_block {int} -- first block of the segment
+            state {CheckpointState} -- generator state after the segment
+            records {bytes} -- sorted run of the blocks of the segment
+        '''
+        self.fd.write(SEGMENT.pack(
+            SEGMENT_MAGIC, state.next_block, state.round_end, state.generated,
+            state.chains, state.points, state.unique, state.log_offset, first_block,
+            len(records), zlib.crc32(records)))
+        offset = self.fd.tell()
+        self.fd.write(records)
+        self.fd.flush()
+        os.fsync(self.fd.fileno())
+        if records:
+            state.runs.append((offset, len(records)))
+
+    def close(self):
+        self.fd.close()
@@ -1,3 +1,38 @@
 # config ###
 MAIN_CONFIG_FILE = 'config/config.ini'
-CHARSETS_SECTION = 'CHARSETS'
\ No newline at end of file
+CHARSETS_SECTION = 'CHARSETS'
+MASKS_SECTION = 'MASKS'
+
+# generation ###
+# reduce function family of new tables (see RainbowTable.reduce_function)
+REDUCE_VERSION = 2
+GENERATION_BLOCK_SIZE = 1024
+# blocks generated between two checkpoint segments
+CHECKPOINT_INTERVAL = 64
+# bytes of chains sorted in memory before a run is written to disk
+GENERATION_MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+# lookup ###
+# columns walked together before their endpoints are probed
+LOOKUP_COLUMN_GROUP = 64
+# tasks per worker of a parallel lookup, so that early finishers pick more
+LOOKUP_TASKS_PER_WORKER = 4
+
+
+# cracking daemon ###
+# Unix socket of rainbowd.py, relative to the working directory like config/
+DAEMON_SOCKET = 'rainbowd.sock'
+# most hashes of a batch, and seconds a batch waits for more
+DAEMON_BATCH_SIZE = 256
+DAEMON_BATCH_WAIT = 0.05
+
+
+# verification ###
+# chains recomputed and hashes cracked by default by rainbowverify.py
+VERIFY_SAMPLES = 1000
+SELF_TEST_HASHES = 100
+# chains recomputed, or hashes cracked, per task of a parallel verification
+VERIFY_BATCH = 64
+# standard deviations the self-test success rate may fall below the coverage
+SELF_TEST_SIGMAS = 3
@@ -0,0 +1,209 @@
+'''External sort of the chains of a table generation.
+
+Chains are buffered in memory and sorted by endpoint in runs of at most
+run_records records, sized from a memory budget. Full runs are written as
+segments of a checkpoint file (see checkpoint.py), the given one or a
+temporary one, and the runs are k-way merged into one stream sorted by
+endpoint, with the duplicate endpoints removed on the fly. Peak memory
+is the budget plus a read buffer per run, whatever the number of chains.
+
+A run record is the endpoint, the 8-byte big-endian sequence number of
+the chain (block * GENERATION_BLOCK_SIZE + position in the block) and the
+start index. Sequence numbers are unique, so the records of one endpoint
+come out of the merge in generation order.
+'''
+import heapq
+import os
+import tempfile
+from array import array
+
+from checkpoint import READ_SIZE, Checkpoint
+from constants import GENERATION_BLOCK_SIZE
+
+SEQUENCE_SIZE = 8
+# bytes object header and list slot of every buffered record
+RECORD_OVERHEAD = 41
+# most runs read at once, more are merged in several passes
+MERGE_FAN_IN = 64
+
+
+def buffered_size(key_size, index_size):
+    '''Returns the memory taken by one buffered chain: its run record,
+    the Python object holding it and its copy in the run being written'''
+    return 2 * (key_size + SEQUENCE_SIZE + index_size) + RECORD_OVERHEAD
+
+
+def read_run(filename, offset, size, record_size):
+    '''Yields the records of a run stored in a file, read through its own
+    file handle so that several runs can be read at once'''
+    chunk_size = max(1, READ_SIZE // record_size) * record_size
+    with open(filename, "rb") as fd:
+        fd.seek(offset)
+        while size > 0:
+            chunk = fd.read(min(chunk_size, size))
+            if not chunk:
+                raise ValueError("Truncated run in " + filename)
+            size -= len(chunk)
+            for start in range(0, len(chunk), record_size):
+                yield chunk[start:start + record_size]
+
+
+class ChainSorter:
+    '''Sorts generated chains by endpoint within a memory budget'''
+
+    def __init__(self, key_size, index_size, memory_budget, state,
+                 store=None, directory=None):
+        """ChainSorter constructor
+
+        Arguments:
+                key_size {int} -- endpoint size in bytes
+                index_size {int} -- start index size in bytes
+                memory_budget {int} -- bytes of chains buffered before a run
+                    is written
+                state {CheckpointState} -- generator state, its runs are
+                    the runs already written
+                store {Checkpoint} -- checkpoint receiving the runs, a
+                    temporary one is created when needed if None
+                directory {string} -- directory of the temporary files
+        """
+        self.key_size = key_size
+        self.index_size = index_size
+        self.record_size = key_size + SEQUENCE_SIZE + index_size
+        self.run_records = max(GENERATION_BLOCK_SIZE, memory_budget //
+                               buffered_size(key_size, index_size))
+        self.state = state
+        self.store = store
+        self.temporary = None
+        self.directory = directory
+        self.buffer = []
+
+    def add(self, endpoint, sequence, start_index):
+        '''Buffers a chain
+
+        Arguments:
+            endpoint {bytes} -- chain endpoint
+            sequence {int} -- sequence number of the chain
+            start_index {int} -- keyspace index of the chain start point
+        '''
+        self.buffer.append(
+            endpoint + sequence.to_bytes(SEQUENCE_SIZE, 'big')
+            + start_index.to_bytes(self.index_size, 'big'))
+
+    def full(self):
+        '''Returns true if the buffered chains fill a run'''
+        return len(self.buffer) >= self.run_records
+
+    def spill(self, first_block):
+        '''Writes the buffered chains as a sorted run, in a segment of the
+        checkpoint ending with the current generator state
+
+        Arguments:
+            first_block {int} -- first block of the buffered chains
+        '''
+        if self.store is None:
+            fd, filename = tempfile.mkstemp(suffix=".runs", dir=self.directory)
+            os.close(fd)
+            self.store = self.temporary = Checkpoint.create(filename, {})
+        self.buffer.sort()
+        self.store.append(first_block, self.state, b''.join(self.buffer))
+        self.buffer = []
+
+    def close(self):
+        '''Deletes the temporary run file, if any'''
+        if self.temporary is not None:
+            self.temporary.close()
+            os.remove(self.temporary.filename)
+            self.temporary = None
+            self.store = None
+
+    def _merged(self):
+        '''Yields every chain, sorted by endpoint then by sequence number'''
+        runs = [(self.store.filename, offset, size)
+                for offset, size in self.state.runs]
+        passes = []
+        try:
+            while len(runs) > MERGE_FAN_IN:
+                # merge groups of runs into longer runs, in a new file
+                fd, filename = tempfile.mkstemp(suffix=".runs", dir=self.directory)
+                passes.append(filename)
+                merged = []
+                with os.fdopen(fd, "wb") as output:
+                    for group in range(0, len(runs), MERGE_FAN_IN):
+                        offset = output.tell()
+                        for record in heapq.merge(*(
+                                read_run(*run, self.record_size)
+                                for run in runs[group:group + MERGE_FAN_IN])):
+                            output.write(record)
+                        merged.append((filename, offset, output.tell() - offset))
+                runs = merged
+            sources = [read_run(*run, self.record_size) for run in runs]
+            sources.append(sorted(self.buffer))
+            yield from heapq.merge(*sources)
+        finally:
+            for filename in passes:
+                os.remove(filename)
+
+    def _groups(self):
+        '''Yields the first and last record of every endpoint'''
+        key_size = self.key_size
+        first = last = None
+        for record in self._merged():
+            if first is not None and record[:key_size] == first[:key_size]:
+                last = record
+                continue
+            if first is not None:
+                yield first, last
+            first = last = record
+        if first is not None:
+            yield first, last
+
+    def _sequence(self, record):
+        return int.from_bytes(
+            record[self.key_size:self.key_size + SEQUENCE_SIZE], 'big')
+
+    def count_unique(self):
+        '''Returns the number of distinct endpoints'''
+        return sum(1 for _ in self._groups())
+
+    def _cutoff(self, limit):
+        '''Returns the sequence number of the chain bringing the limit-th
+        new endpoint, or None if there are fewer endpoints. New endpoints
+        are counted per block, then the block reaching the limit is
+        searched chain by chain.'''
+        per_block = array('Q', bytes(8 * max(1, self.state.next_block)))
+        total = 0
+        for first, _ in self._groups():
+            per_block[self._sequence(first) // GENERATION_BLOCK_SIZE] += 1
+            total += 1
+        if total <= limit:
+            return None
+        remaining = limit
+        for block, count in enumerate(per_block):
+            if count >= remaining:
+                break
+            remaining -= count
+        sequences = sorted(
+            self._sequence(first) for first, _ in self._groups()
+            if self._sequence(first) // GENERATION_BLOCK_SIZE == block)
+        return sequences[remaining - 1]
+
+    def unique(self, keep_first=False, limit=None):
+        '''Yields one chain per endpoint, sorted by endpoint. When several
+        chains share an endpoint, the last one generated wins, or the
+        first one with keep_first.
+
+        Arguments:
+            keep_first {bool} -- keep the first chain of an endpoint (default: {False})
+            limit {int} -- keep only the limit endpoints found first (default: {None})
+
+        Yields:
+            tuple -- (endpoint, start index) pairs
+        '''
+        cutoff = self._cutoff(limit) if limit is not None else None
+        key_size = self.key_size
+        for first, last in self._groups():
+            if cutoff is not None and self._sequence(first) > cutoff:
+                continue
+            record = first if keep_first else last
+            yield (record[:key_size],
+                   int.from_bytes(record[key_size + SEQUENCE_SIZE:], 'big'))
@@ -0,0 +1,119 @@
+'''Registry of the hash algorithms tables can be built for.
+
+A backend turns passwords into digests, one at a time (hash_text, bound
+once per table as RainbowTable.hash_function) or by batches of UTF-8
+encoded candidates (hash_many, used by the chain stepping loops), so the
+hot loops never dispatch on the algorithm.
+'''
+import hashlib
+
+from algorithm import Algorithm
+from legacyhash import lm_hash, md4
+
+BACKENDS = {}
+
+
+def register(backend):
+    '''Adds a backend to the registry, under its name'''
+    BACKENDS[backend.name] = backend
+    return backend
+
+
+def get_backend(algorithm):
+    '''Returns the backend of an algorithm
+
+    Arguments:
+        algorithm {string} -- algorithm name, or Algorithm member
+
+    Raises:
+        ValueError -- if no backend is registered for the algorithm
+
+    Returns:
+        the backend
+    '''
+    name = algorithm.name if isinstance(algorithm, Algorithm) else algorithm
+    try:
+        return BACKENDS[name.lower()]
+    except KeyError:
+        raise ValueError("Algorithm not supported") from None
+
+
+def algorithm_names():
+    '''Returns the names of the registered algorithms'''
+    return sorted(BACKENDS)
+
+
+def _openssl_md4():
+    '''Returns hashlib's MD4 as a digest function, or None when OpenSSL
+    does not provide it'''
+    try:
+        hashlib.new('md4', b"")
+    except ValueError:
+        return None
+    return lambda data: hashlib.new('md4', data).digest()
+
+
+class HashlibBackend:
+    '''Backend of a hashlib algorithm, hashing the UTF-8 password'''
+
+    def __init__(self, name, algorithm, constructor):
+        self.name = name
+        self.algorithm = algorithm
+        self.new_hash = constructor
+        self.digest_size = constructor().digest_size
+        # longest password the algorithm hashes whole, None for no limit
+        self.max_length = None
+
+    def hash_text(self, plaintext):
+        return self.new_hash(plaintext.encode('utf-8')).digest()
+
+    def hash_many(self, plaintexts):
+        '''Hashes UTF-8 encoded passwords'''
+        new_hash = self.new_hash
+        return [new_hash(plaintext).digest() for plaintext in plaintexts]
+
+
+class NTLMBackend:
+    '''NT hash: MD4 of the UTF-16LE password, through OpenSSL when it
+    still provides MD4'''
+
+    name = 'ntlm'
+    algorithm = Algorithm.NTLM
+    digest_size = 16
+    max_length = None
+
+    def __init__(self):
+        self.md4 = _openssl_md4() or md4
+
+    def hash_text(self, plaintext):
+        return self.md4(plaintext.encode('utf-16le'))
+
+    def hash_many(self, plaintexts):
+        '''Hashes UTF-8 encoded passwords'''
+        digest = self.md4
+        return [digest(plaintext.decode('utf-8').encode('utf-16le'))
+                for plaintext in plaintexts]
+
+
+class LMBackend:
+    '''LAN Manager hash, case-insensitive and limited to 14 characters'''
+
+    name = 'lm'
+    algorithm = Algorithm.LM
+    digest_size = 16
+    max_length = 14
+
+    def hash_text(self, plaintext):
+        return lm_hash(plaintext)
+
+    def hash_many(self, plaintexts):
+        '''Hashes UTF-8 encoded passwords'''
+        return [lm_hash(plaintext.decode('utf-8')) for plaintext in plaintexts]
+
+
+register(HashlibBackend('sha1', Algorithm.SHA1, hashlib.sha1))
+register(HashlibBackend('md5', Algorithm.MD5, hashlib.md5))
+register(HashlibBackend('sha256', Algorithm.SHA256, hashlib.sha256))
+register(HashlibBackend('sha512', Algorithm.SHA512, hashlib.sha512))
+register(NTLMBackend())
+register(LMBackend())
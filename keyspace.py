@@ -0,0 +1,235 @@
+import string
+
+# mask placeholders, as in hashcat; ?c is the table charset
+MASK_CHARSETS = {
+    'l': string.ascii_lowercase,
+    'u': string.ascii_uppercase,
+    'd': string.digits,
+    's': " !\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~",
+}
+MASK_CHARSETS['a'] = (MASK_CHARSETS['l'] + MASK_CHARSETS['u']
+                      + MASK_CHARSETS['d'] + MASK_CHARSETS['s'])
+
+
+class Keyspace:
+    '''Numbering of every password over a charset and a length range.
+
+    Passwords are ordered by length first, then as base-len(charset)
+    numbers whose most significant digit is the first character. This lets
+    a start point be stored as a single integer instead of a string.
+    '''
+
+    def __init__(self, charset, min_length, max_length):
+        """Keyspace constructor
+
+        Arguments:
+                charset {string} -- characters allowed in a password
+                min_length {int} -- minimum passwords length
+                max_length {int} -- maximum password length
+        """
+        self.charset = charset
+        self.min_length = min_length
+        self.max_length = max_length
+        self.base = len(charset)
+        # first index of every character, duplicated characters map to
+        # their first occurrence so rank(unrank(i)) stays consistent
+        self.digits = {}
+        for i, c in enumerate(charset):
+            self.digits.setdefault(c, i)
+        # offsets[k] is the index of the first password of length min_length + k
+        self.offsets = [0]
+        for length in range(min_length, max_length + 1):
+            self.offsets.append(self.offsets[-1] + self.base ** length)
+
+    @property
+    def size(self):
+        '''Number of passwords in the keyspace'''
+        return self.offsets[-1]
+
+    def index_size(self):
+        '''Returns the number of bytes needed to store any index'''
+        return max(1, ((self.size - 1).bit_length() + 7) // 8)
+
+    def rank(self, password):
+        '''Returns the index of a password
+
+        Arguments:
+            password {string} -- password to number
+
+        Raises:
+            ValueError -- if the password is outside the keyspace
+
+        Returns:
+            int -- index of the password
+        '''
+        length = len(password)
+        if not self.min_length <= length <= self.max_length:
+            raise ValueError("Password length outside the keyspace")
+        value = 0
+        try:
+            for c in password:
+                value = value * self.base + self.digits[c]
+        except KeyError:
+            raise ValueError("Password character outside the charset")
+        return self.offsets[length - self.min_length] + value
+
+    def unrank(self, index):
+        '''Returns the password with the given index
+
+        Arguments:
+            index {int} -- index of the password
+
+        Raises:
+            ValueError -- if the index is outside the keyspace
+
+        Returns:
+            string -- the password
+        '''
+        if not 0 <= index < self.size:
+            raise ValueError("Index outside the keyspace")
+        length = self.min_length
+        while index >= self.offsets[length - self.min_length + 1]:
+            length += 1
+        value = index - self.offsets[length - self.min_length]
+        chars = []
+        for _ in range(length):
+            value, digit = divmod(value, self.base)
+            chars.append(self.charset[digit])
+        return ''.join(reversed(chars))
+
+
+def parse_mask(mask, charsets=None):
+    '''Returns the characters allowed at every position of a mask. A
+    position is ?l, ?u, ?d, ?s or ?a (see MASK_CHARSETS), ?c or ?{name}
+    for a charset of the charsets argument, ?? for a question mark, or
+    any other character standing for itself
+
+    Arguments:
+        mask {string} -- mask such as ?u?l?l?l?d?d
+        charsets {dict} -- charsets usable by name (default: {None})
+
+    Raises:
+        ValueError -- if the mask uses an unknown placeholder
+
+    Returns:
+        list -- one string of allowed characters per position
+    '''
+    charsets = charsets or {}
+    positions = []
+    i = 0
+    while i < len(mask):
+        if mask[i] != '?':
+            positions.append(mask[i])
+            i += 1
+            continue
+        if i + 1 == len(mask):
+            raise ValueError("Mask ends with a lone '?': " + mask)
+        placeholder = mask[i + 1]
+        i += 2
+        if placeholder == '?':
+            positions.append('?')
+        elif placeholder == '{':
+            end = mask.find('}', i)
+            if end < 0 or mask[i:end] not in charsets:
+                raise ValueError("Unknown charset in mask: " + mask)
+            positions.append(charsets[mask[i:end]])
+            i = end + 1
+        elif placeholder in MASK_CHARSETS:
+            positions.append(MASK_CHARSETS[placeholder])
+        elif placeholder in charsets:
+            positions.append(charsets[placeholder])
+        else:
+            raise ValueError(f"Unknown placeholder ?{placeholder} in mask: {mask}")
+    if not positions:
+        raise ValueError("Empty mask")
+    return positions
+
+
+class MaskKeyspace(Keyspace):
+    '''Numbering of every password matching one of several masks.
+
+    Passwords are ordered by mask first, then as mixed-radix numbers whose
+    digit at every position indexes the characters allowed there, the
+    first position being the most significant. A password matching
+    several masks is numbered by the first of them.
+    '''
+
+    def __init__(self, masks):
+        """MaskKeyspace constructor
+
+        Arguments:
+                masks {list} -- masks, each a list of the characters
+                    allowed at every position (see parse_mask)
+        """
+        # duplicated characters of a position are only counted once
+        self.masks = [[''.join(dict.fromkeys(position)) for position in mask]
+                      for mask in masks]
+        self.charset = ''.join(dict.fromkeys(
+            ''.join(position for mask in self.masks for position in mask)))
+        self.min_length = min(len(mask) for mask in self.masks)
+        self.max_length = max(len(mask) for mask in self.masks)
+        self.digits = [[{c: i for i, c in enumerate(position)} for position in mask]
+                       for mask in self.masks]
+        # offsets[k] is the index of the first password of mask k
+        self.offsets = [0]
+        for mask in self.masks:
+            size = 1
+            for position in mask:
+                size *= len(position)
+            self.offsets.append(self.offsets[-1] + size)
+
+    def rank(self, password):
+        '''Returns the index of a password
+
+        Arguments:
+            password {string} -- password to number
+
+        Raises:
+            ValueError -- if no mask matches the password
+
+        Returns:
+            int -- index of the password
+        '''
+        for offset, mask, digits in zip(self.offsets, self.masks, self.digits):
+            if len(mask) != len(password):
+                continue
+            value = 0
+            for c, position, digit in zip(password, mask, digits):
+                if c not in digit:
+                    break
+                value = value * len(position) + digit[c]
+            else:
+                return offset + value
+        raise ValueError("Password outside the masks")
+
+    def unrank(self, index):
+        '''Returns the password with the given index
+
+        Arguments:
+            index {int} -- index of the password
+
+        Raises:
+            ValueError -- if the index is outside the keyspace
+
+        Returns:
+            string -- the password
+        '''
+        if not 0 <= index < self.size:
+            raise ValueError("Index outside the keyspace")
+        k = 0
+        while index >= self.offsets[k + 1]:
+            k += 1
+        value = index - self.offsets[k]
+        chars = []
+        for position in reversed(self.masks[k]):
+            value, digit = divmod(value, len(position))
+            chars.append(position[digit])
+        return ''.join(reversed(chars))
+
+
+def table_keyspace(charset, min_length, max_length, masks=None):
+    '''Returns the keyspace of a table: its masks if it has some (see
+    MaskKeyspace), else its charset over its length range'''
+    if masks:
+        return MaskKeyspace(masks)
+    return Keyspace(charset, min_length, max_length)
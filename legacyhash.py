@@ -0,0 +1,170 @@
+'''Pure-Python MD4 and DES, for the NTLM and LM hash backends.
+
+OpenSSL 3 moved MD4 to its legacy provider, so hashlib often cannot
+compute it, and the standard library has no DES at all. These
+implementations are slow, but they only have to be exact: they follow
+RFC 1320 and FIPS 46-3.
+'''
+import struct
+
+MASK = 0xffffffff
+
+# MD4 message word order of rounds 2 and 3
+_ROUND2 = [(i % 4) * 4 + i // 4 for i in range(16)]
+_ROUND3 = [0, 8, 4, 12, 2, 10, 6, 14, 1, 9, 5, 13, 3, 11, 7, 15]
+
+
+def _rotate(value, shift):
+    return ((value << shift) | (value >> (32 - shift))) & MASK
+
+
+def md4(data):
+    '''Returns the MD4 digest of data (RFC 1320)
+
+    Arguments:
+        data {bytes} -- message to hash
+
+    Returns:
+        bytes -- the 16-byte digest
+    '''
+    length = len(data) * 8
+    data = data + b"\x80" + bytes((55 - len(data)) % 64) + struct.pack("<Q", length)
+    state = [0x67452301, 0xefcdab89, 0x98badcfe, 0x10325476]
+    for offset in range(0, len(data), 64):
+        x = struct.unpack_from("<16I", data, offset)
+        a, b, c, d = state
+        for i in range(16):
+            a = _rotate((a + ((b & c) | (~b & d)) + x[i]) & MASK, (3, 7, 11, 19)[i % 4])
+            a, b, c, d = d, a, b, c
+        for i, k in enumerate(_ROUND2):
+            a = _rotate((a + ((b & c) | (b & d) | (c & d)) + x[k] + 0x5a827999) & MASK,
+                        (3, 5, 9, 13)[i % 4])
+            a, b, c, d = d, a, b, c
+        for i, k in enumerate(_ROUND3):
+            a = _rotate((a + (b ^ c ^ d) + x[k] + 0x6ed9eba1) & MASK,
+                        (3, 9, 11, 15)[i % 4])
+            a, b, c, d = d, a, b, c
+        state = [(value + step) & MASK for value, step in zip(state, (a, b, c, d))]
+    return struct.pack("<4I", *state)
+
+
+# DES tables, bit positions counted from 1 at the most significant bit
+_IP = [58, 50, 42, 34, 26, 18, 10, 2, 60, 52, 44, 36, 28, 20, 12, 4,
+       62, 54, 46, 38, 30, 22, 14, 6, 64, 56, 48, 40, 32, 24, 16, 8,
+       57, 49, 41, 33, 25, 17, 9, 1, 59, 51, 43, 35, 27, 19, 11, 3,
+       61, 53, 45, 37, 29, 21, 13, 5, 63, 55, 47, 39, 31, 23, 15, 7]
+_FP = [40, 8, 48, 16, 56, 24, 64, 32, 39, 7, 47, 15, 55, 23, 63, 31,
+       38, 6, 46, 14, 54, 22, 62, 30, 37, 5, 45, 13, 53, 21, 61, 29,
+       36, 4, 44, 12, 52, 20, 60, 28, 35, 3, 43, 11, 51, 19, 59, 27,
+       34, 2, 42, 10, 50, 18, 58, 26, 33, 1, 41, 9, 49, 17, 57, 25]
+_E = [32, 1, 2, 3, 4, 5, 4, 5, 6, 7, 8, 9, 8, 9, 10, 11, 12, 13, 12, 13,
+      14, 15, 16, 17, 16, 17, 18, 19, 20, 21, 20, 21, 22, 23, 24, 25,
+      24, 25, 26, 27, 28, 29, 28, 29, 30, 31, 32, 1]
+_P = [16, 7, 20, 21, 29, 12, 28, 17, 1, 15, 23, 26, 5, 18, 31, 10,
+      2, 8, 24, 14, 32, 27, 3, 9, 19, 13, 30, 6, 22, 11, 4, 25]
+_PC1 = [57, 49, 41, 33, 25, 17, 9, 1, 58, 50, 42, 34, 26, 18,
+        10, 2, 59, 51, 43, 35, 27, 19, 11, 3, 60, 52, 44, 36,
+        63, 55, 47, 39, 31, 23, 15, 7, 62, 54, 46, 38, 30, 22,
+        14, 6, 61, 53, 45, 37, 29, 21, 13, 5, 28, 20, 12, 4]
+_PC2 = [14, 17, 11, 24, 1, 5, 3, 28, 15, 6, 21, 10, 23, 19, 12, 4,
+        26, 8, 16, 7, 27, 20, 13, 2, 41, 52, 31, 37, 47, 55, 30, 40,
+        51, 45, 33, 48, 44, 49, 39, 56, 34, 53, 46, 42, 50, 36, 29, 32]
+_SHIFTS = [1, 1, 2, 2, 2, 2, 2, 2, 1, 2, 2, 2, 2, 2, 2, 1]
+_SBOXES = [
+    [14, 4, 13, 1, 2, 15, 11, 8, 3, 10, 6, 12, 5, 9, 0, 7,
+     0, 15, 7, 4, 14, 2, 13, 1, 10, 6, 12, 11, 9, 5, 3, 8,
+     4, 1, 14, 8, 13, 6, 2, 11, 15, 12, 9, 7, 3, 10, 5, 0,
+     15, 12, 8, 2, 4, 9, 1, 7, 5, 11, 3, 14, 10, 0, 6, 13],
+    [15, 1, 8, 14, 6, 11, 3, 4, 9, 7, 2, 13, 12, 0, 5, 10,
+     3, 13, 4, 7, 15, 2, 8, 14, 12, 0, 1, 10, 6, 9, 11, 5,
+     0, 14, 7, 11, 10, 4, 13, 1, 5, 8, 12, 6, 9, 3, 2, 15,
+     13, 8, 10, 1, 3, 15, 4, 2, 11, 6, 7, 12, 0, 5, 14, 9],
+    [10, 0, 9, 14, 6, 3, 15, 5, 1, 13, 12, 7, 11, 4, 2, 8,
+     13, 7, 0, 9, 3, 4, 6, 10, 2, 8, 5, 14, 12, 11, 15, 1,
+     13, 6, 4, 9, 8, 15, 3, 0, 11, 1, 2, 12, 5, 10, 14, 7,
+     1, 10, 13, 0, 6, 9, 8, 7, 4, 15, 14, 3, 11, 5, 2, 12],
+    [7, 13, 14, 3, 0, 6, 9, 10, 1, 2, 8, 5, 11, 12, 4, 15,
+     13, 8, 11, 5, 6, 15, 0, 3, 4, 7, 2, 12, 1, 10, 14, 9,
+     10, 6, 9, 0, 12, 11, 7, 13, 15, 1, 3, 14, 5, 2, 8, 4,
+     3, 15, 0, 6, 10, 1, 13, 8, 9, 4, 5, 11, 12, 7, 2, 14],
+    [2, 12, 4, 1, 7, 10, 11, 6, 8, 5, 3, 15, 13, 0, 14, 9,
+     14, 11, 2, 12, 4, 7, 13, 1, 5, 0, 15, 10, 3, 9, 8, 6,
+     4, 2, 1, 11, 10, 13, 7, 8, 15, 9, 12, 5, 6, 3, 0, 14,
+     11, 8, 12, 7, 1, 14, 2, 13, 6, 15, 0, 9, 10, 4, 5, 3],
+    [12, 1, 10, 15, 9, 2, 6, 8, 0, 13, 3, 4, 14, 7, 5, 11,
+     10, 15, 4, 2, 7, 12, 9, 5, 6, 1, 13, 14, 0, 11, 3, 8,
+     9, 14, 15, 5, 2, 8, 12, 3, 7, 0, 4, 10, 1, 13, 11, 6,
+     4, 3, 2, 12, 9, 5, 15, 10, 11, 14, 1, 7, 6, 0, 8, 13],
+    [4, 11, 2, 14, 15, 0, 8, 13, 3, 12, 9, 7, 5, 10, 6, 1,
+     13, 0, 11, 7, 4, 9, 1, 10, 14, 3, 5, 12, 2, 15, 8, 6,
+     1, 4, 11, 13, 12, 3, 7, 14, 10, 15, 6, 8, 0, 5, 9, 2,
+     6, 11, 13, 8, 1, 4, 10, 7, 9, 5, 0, 15, 14, 2, 3, 12],
+    [13, 2, 8, 4, 6, 15, 11, 1, 10, 9, 3, 14, 5, 0, 12, 7,
+     1, 15, 13, 8, 10, 3, 7, 4, 12, 5, 6, 11, 0, 14, 9, 2,
+     7, 11, 4, 1, 9, 12, 14, 2, 0, 6, 10, 13, 15, 3, 5, 8,
+     2, 1, 14, 7, 4, 10, 8, 13, 15, 12, 9, 0, 3, 5, 6, 11],
+]
+
+
+def _permute(value, table, width):
+    result = 0
+    for position in table:
+        result = (result << 1) | ((value >> (width - position)) & 1)
+    return result
+
+
+def _subkeys(key):
+    '''Returns the 16 round keys of a 64-bit DES key'''
+    state = _permute(int.from_bytes(key, 'big'), _PC1, 64)
+    left, right = state >> 28, state & 0xfffffff
+    subkeys = []
+    for shift in _SHIFTS:
+        left = ((left << shift) | (left >> (28 - shift))) & 0xfffffff
+        right = ((right << shift) | (right >> (28 - shift))) & 0xfffffff
+        subkeys.append(_permute((left << 28) | right, _PC2, 56))
+    return subkeys
+
+
+def des_encrypt(key, block):
+    '''Encrypts one block with DES (FIPS 46-3)
+
+    Arguments:
+        key {bytes} -- 8-byte key, parity bits ignored
+        block {bytes} -- 8-byte plaintext
+
+    Returns:
+        bytes -- the 8-byte ciphertext
+    '''
+    state = _permute(int.from_bytes(block, 'big'), _IP, 64)
+    left, right = state >> 32, state & MASK
+    for subkey in _subkeys(key):
+        mixed = _permute(right, _E, 32) ^ subkey
+        output = 0
+        for box in range(8):
+            bits = (mixed >> (42 - 6 * box)) & 0x3f
+            # outer bits select the row, inner bits the column
+            row = ((bits >> 4) & 2) | (bits & 1)
+            output = (output << 4) | _SBOXES[box][row * 16 + ((bits >> 1) & 0xf)]
+        left, right = right, left ^ _permute(output, _P, 32)
+    return _permute((right << 32) | left, _FP, 64).to_bytes(8, 'big')
+
+
+def _expand_key(half):
+    '''Spreads 7 key bytes over the 7 high bits of 8 DES key bytes'''
+    value = int.from_bytes(half, 'big')
+    return bytes(((value >> (49 - 7 * i)) & 0x7f) << 1 for i in range(8))
+
+
+def lm_hash(password):
+    '''Returns the LAN Manager hash of a password: its first 14 characters,
+    upper-cased and split into two DES keys encrypting "KGS!@#$%"
+
+    Arguments:
+        password {string} -- password to hash
+
+    Returns:
+        bytes -- the 16-byte hash
+    '''
+    key = password.upper().encode('latin-1', 'replace')[:14].ljust(14, b"\0")
+    return (des_encrypt(_expand_key(key[:7]), b"KGS!@#$%")
+            + des_encrypt(_expand_key(key[7:]), b"KGS!@#$%"))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import argparse
+import time
+from rainbowtable import RainbowTable
+from tablefile import is_table_file, read_header
+
+def main():
+    try:
+        parser = argparse.ArgumentParser(
+            description="Converts a pickled rainbow table to the binary table format, "
+                        "or a binary table to a compact one or one with a Bloom filter, "
+                        "or without checksums to one with checksums"
+        )
+        parser.add_argument("input_file", help="pickled rainbow table (from an older rainbowgen.py), "
+                                               "or binary table with --compact or --bloom, "
+                                               "or without checksums")
+        parser.add_argument("output_file", help="name of the binary table file to write")
+        parser.add_argument("--compact", action="store_true",
+                            help="write a compact table, with truncated delta-coded endpoints")
+        parser.add_argument("--bloom", type=float, default=None,
+                            help="store a Bloom filter of the endpoints with this false positive "
+                                 "rate, 0 to drop it (default: keep the filter of the table)")
+        args = parser.parse_args()
+
+        if not os.path.exists(args.input_file):
+            print(f"\n[-] Error: Rainbow table file '{args.input_file}' not found.")
+            sys.exit(1)
+        if is_table_file(args.input_file) and not args.compact and args.bloom is None \
+                and read_header(args.input_file).checksums is not None:
+            print(f"\n[-] Error: '{args.input_file}' is already a binary table file.")
+            sys.exit(1)
+
+        print("\n[+] Loading rainbow table...")
+        start_time = time.time()
+        rt = RainbowTable.load_from_file(args.input_file)
+        print(f"    Table loaded successfully in {time.time() - start_time:.2f} seconds")
+
+        print("\n[+] Writing " + ("compact" if args.compact else "binary") + " table...")
+        rt.save_to_file(args.output_file, compact=args.compact or None, bloom=args.bloom)
+        print(f"    {len(rt.table)} chains written to {args.output_file}")
+        print(f"    File size: {os.path.getsize(args.output_file)} bytes")
+
+    except Exception as e:
+        print(f"\n[-] Error: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
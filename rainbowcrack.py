@@ -6,8 +6,16 @@ import os
 import argparse
 import logging
 import time
+import csv
+import json
 from datetime import datetime
+from constants import DAEMON_SOCKET
+from rainbowd import crack_with_daemon, daemon_tables
+from stats import add_stats_arguments, stats_from_arguments
 from rainbowtable import RainbowTable
+from sharding import LocalCluster, ShardedTable, is_manifest
+from tableset import TableSet, find_tables
+from walkcache import WalkCache
 
 def format_time(seconds):
     """Format time in a human-readable foramat"""
@@ -20,25 +28,257 @@ def format_time(seconds):
         hours = seconds / 3600
         return f"{hours:.2f} hours"
 
+def read_hash_file(filename):
+    """Reads one hexadecimal hash per line, skipping blank lines"""
+    hashes = []
+    with open(filename) as fd:
+        for line in fd:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                int(line, 16)
+            except ValueError:
+                raise ValueError(f"Invalid hash format in {filename}: {line}")
+            hashes.append(line)
+    return hashes
+
+def write_report(filename, results):
+    """Writes the (hash, password) results as CSV (.csv) or JSON"""
+    if filename.lower().endswith(".csv"):
+        with open(filename, "w", newline="") as fd:
+            writer = csv.writer(fd)
+            writer.writerow(["hash", "password", "cracked"])
+            for hash_string, password in results:
+                writer.writerow([hash_string, password if password is not None else "",
+                                 password is not None])
+    else:
+        with open(filename, "w") as fd:
+            json.dump([{"hash": hash_string, "password": password,
+                        "cracked": password is not None}
+                       for hash_string, password in results], fd, indent=2)
+
+def crack_batch(rt, hashes, workers=1):
+    """Cracks a list of hashes with one lookup_many pass, printing results as they are found"""
+    print(f"\n[+] Starting batch crack of {len(hashes)} hashes...")
+    crack_start_time = time.time()
+    results = []
+    for hash_string, password in rt.lookup_many(hashes, workers):
+        if password is not None:
+            print(f"    {hash_string}:{password}")
+        results.append((hash_string, password))
+    crack_time = time.time() - crack_start_time
+
+    cracked = sum(1 for _, password in results if password is not None)
+    print(f"\n[+] Cracked {cracked} of {len(results)} hashes")
+    print(f"    Time taken: {format_time(crack_time)}")
+    if results:
+        print(f"    Average time per hash: {crack_time / len(results):.4f} seconds")
+    return results
+
+def is_table_set(location):
+    """Tells whether the table argument names several tables (a directory or a glob pattern)"""
+    return os.path.isdir(location) or any(c in location for c in "*?[")
+
+def crack_table_set(args, hashes, run_stats=None):
+    """Cracks the hashes with every table of a directory or glob pattern"""
+    print("\n[+] Loading rainbow tables...")
+    start_time = time.time()
+    cache = None
+    if args.cache is not None:
+        cache = WalkCache(args.cache, args.cache_size * 1024 * 1024)
+    tables = TableSet.load(args.rainbow_table_file, cache)
+    print(f"    {len(tables)} tables loaded in {time.time() - start_time:.2f} seconds")
+
+    print("\n[+] Table groups, in lookup order:")
+    for number, group in enumerate(tables.groups, 1):
+        parameters = group.parameters
+        print(f"    Group {number}: {parameters.algorithm.name}, lengths {parameters.min_length} - "
+              f"{parameters.max_length}, chain length {parameters.chain_length}, "
+              f"table index {parameters.table_index}, estimated success {group.success():.2%}")
+        for name, table in group.tables:
+            print(f"      {name} ({len(table.table)} chains)")
+            table.stats = run_stats
+
+    if args.hash_file is not None:
+        print(f"\n[+] Starting batch crack of {len(hashes)} hashes...")
+        crack_start_time = time.time()
+        results = []
+        for hash_string, password, name in tables.lookup_many(hashes, args.workers):
+            if password is not None:
+                print(f"    {hash_string}:{password} ({name})")
+            results.append((hash_string, password))
+        crack_time = time.time() - crack_start_time
+        cracked = sum(1 for _, password in results if password is not None)
+        print(f"\n[+] Cracked {cracked} of {len(results)} hashes")
+        print(f"    Time taken: {format_time(crack_time)}")
+        if args.report is not None:
+            write_report(args.report, results)
+            print(f"    Report written to {args.report}")
+    else:
+        print("\n[+] Starting crack attempt...")
+        crack_start_time = time.time()
+        name, result = tables.lookup(args.hash_string, args.workers)
+        crack_time = time.time() - crack_start_time
+        if result.password is not None:
+            print("\n[+] Success! Password found:")
+            print(f"    Hash: {args.hash_string}")
+            print(f"    Password: {result.password}")
+            print(f"    Table: {name}")
+        else:
+            print("\n[-] No match found")
+        print(f"    Time taken: {format_time(crack_time)}")
+        print(f"    Endpoint hits: {result.endpoint_hits} | False alarms: {result.false_alarms}")
+
+    print_cache_stats(tables)
+    print(f"\n[+] Total execution time: {format_time(time.time() - start_time)}")
+
+def crack_sharded(args, hashes, run_stats=None):
+    """Cracks the hashes with a sharded table, its shards served by --workers local node processes"""
+    print("\n[+] Loading sharded table manifest...")
+    start_time = time.time()
+    sharded = ShardedTable.load(args.rainbow_table_file)
+    rt = sharded.table
+    rt.stats = run_stats
+    print(f"    Algorithm: {rt.algorithm}")
+    print(f"    Chain Length: {rt.chain_length}")
+    print(f"    Password Length Range: {rt.min_length} - {rt.max_length}")
+    print(f"    Shards: {len(sharded.files)} | Stored Chains: {len(sharded)}")
+
+    print(f"\n[+] Starting crack of {len(hashes)} hashes...")
+    crack_start_time = time.time()
+    results = []
+    with LocalCluster(sharded, args.workers) as cluster:
+        print(f"    {cluster.nodes} node processes")
+        for hash_string, password in sharded.lookup_many(hashes, cluster):
+            if password is not None:
+                print(f"    {hash_string}:{password}")
+            results.append((hash_string, password))
+    crack_time = time.time() - crack_start_time
+    if run_stats is not None:
+        for counters in cluster.counters:
+            run_stats.merge(counters["stats"])
+
+    cracked = sum(1 for _, password in results if password is not None)
+    print(f"\n[+] Cracked {cracked} of {len(results)} hashes")
+    print(f"    Time taken: {format_time(crack_time)}")
+    print("\n[+] Node Statistics:")
+    for node, counters in enumerate(cluster.counters):
+        print(f"    Node {node} (shards {', '.join(map(str, counters['shards']))}): "
+              f"{counters['probes']} probes | Endpoint hits: {counters['endpoint_hits']} | "
+              f"False alarms: {counters['false_alarms']}")
+    if args.report is not None:
+        write_report(args.report, results)
+        print(f"    Report written to {args.report}")
+    print(f"\n[+] Total execution time: {format_time(time.time() - start_time)}")
+
+def crack_with_running_daemon(args, hashes):
+    """Cracks the hashes with a running rainbowd.py serving the requested tables,
+    returns False if there is none"""
+    served = daemon_tables(args.daemon)
+    if served is None:
+        return False
+    requested = [os.path.abspath(name) for name in find_tables(args.rainbow_table_file)]
+    if not requested or not set(requested) <= set(served):
+        return False
+
+    print(f"\n[+] Cracking with the daemon listening on {args.daemon}...")
+    start_time = time.time()
+    results = []
+    for hash_string, password, name in crack_with_daemon(hashes, args.daemon):
+        if password is not None:
+            print(f"    {hash_string}:{password} ({name})")
+        results.append((hash_string, password))
+    crack_time = time.time() - start_time
+    cracked = sum(1 for _, password in results if password is not None)
+    print(f"\n[+] Cracked {cracked} of {len(results)} hashes")
+    print(f"    Time taken: {format_time(crack_time)}")
+    if args.report is not None:
+        write_report(args.report, results)
+        print(f"    Report written to {args.report}")
+    return True
+
+def print_cache_stats(rt):
+    """Prints the walk cache counters and closes the cache"""
+    if rt.walk_cache is None:
+        return
+    stats = rt.walk_cache.stats()
+    rt.walk_cache.close()
+    print("\n[+] Walk cache:")
+    print(f"    Hits: {stats['hits']} | Misses: {stats['misses']} | Hit rate: {stats['hit_rate']:.1%}")
+    print(f"    Entries: {stats['entries']} | Size: {stats['bytes'] / (1024 * 1024):.2f} MB"
+          f" | Evictions: {stats['evictions']}")
+
 def main():
     try:
         parser = argparse.ArgumentParser()
-        parser.add_argument("hash_string", help="hash to crack")
+        parser.add_argument("hash_string", nargs="?", help="hash to crack")
         parser.add_argument("rainbow_table_file", 
-                          help="name of file containing a valid rainbow table (generated from rainbowgen.py)")
+                          help="name of file containing a valid rainbow table (generated from rainbowgen.py), "
+                               "or a directory or glob pattern of tables to search together")
+        parser.add_argument("--hash-file",
+                          help="file with one hash per line, cracked in a single batch pass")
+        parser.add_argument("--report",
+                          help="write the batch results to this file (CSV if it ends in .csv, JSON otherwise)")
+        parser.add_argument("--cache",
+                          help="persistent walk cache file, reused by later runs on tables with the same parameters")
+        parser.add_argument("--cache-size", type=int, default=256,
+                          help="maximum size of the walk cache in MB")
+        parser.add_argument("--workers", type=int, default=1,
+                          help="number of processes sharing the lookup work")
+        parser.add_argument("--daemon", default=DAEMON_SOCKET,
+                          help="socket of a running rainbowd.py, used instead of loading the tables when it serves them")
+        parser.add_argument("--no-daemon", action="store_true",
+                          help="always load the tables, even if a running daemon serves them")
+        add_stats_arguments(parser)
         args = parser.parse_args()
+        run_stats = stats_from_arguments(args)
+
+        if args.workers < 1:
+            print("\n[-] Error: The number of workers must be at least 1.")
+            sys.exit(1)
+
+        if (args.hash_string is None) == (args.hash_file is None):
+            print("\n[-] Error: Give either a hash to crack or --hash-file.")
+            sys.exit(1)
 
         # Display input parameters
         print("\n[+] Cracking Parameters:")
-        print(f"    Hash to crack: {args.hash_string}")
+        if args.hash_file is not None:
+            print(f"    Hash file: {args.hash_file}")
+        else:
+            print(f"    Hash to crack: {args.hash_string}")
         print(f"    Rainbow table: {args.rainbow_table_file}")
+        if args.workers > 1:
+            print(f"    Workers: {args.workers}")
 
         # Verify hash format
-        try:
-            int(args.hash_string, 16)
-        except ValueError:
-            print("\n[-] Error: Invalid hash format. Hash must be in hexadecimal format.")
-            sys.exit(1)
+        if args.hash_file is not None:
+            try:
+                hashes = read_hash_file(args.hash_file)
+            except (OSError, ValueError) as e:
+                print(f"\n[-] Error: {str(e)}")
+                sys.exit(1)
+        else:
+            try:
+                int(args.hash_string, 16)
+            except ValueError:
+                print("\n[-] Error: Invalid hash format. Hash must be in hexadecimal format.")
+                sys.exit(1)
+            hashes = [args.hash_string]
+
+        # the daemon does not report the counters of a request, so --stats
+        # and --progress load the tables
+        if not args.no_daemon and run_stats is None and crack_with_running_daemon(args, hashes):
+            return
+
+        if is_manifest(args.rainbow_table_file):
+            crack_sharded(args, hashes, run_stats)
+            return
+
+        if is_table_set(args.rainbow_table_file):
+            crack_table_set(args, hashes, run_stats)
+            return
 
         # Check if rainbow table file exists
         if not os.path.exists(args.rainbow_table_file):
@@ -61,11 +301,29 @@ def main():
         print(f"    Chain Length: {rt.chain_length}")
         print(f"    Number of Chains: {rt.number_of_chains}")
         print(f"    Password Length Range: {rt.min_length} - {rt.max_length}")
+        if rt.masks:
+            print(f"    Masks: {len(rt.masks)} ({rt.keyspace().size} passwords)")
+        print(f"    Stored Chains: {len(rt.table)}")
+
+        if args.cache is not None:
+            rt.walk_cache = WalkCache(args.cache, args.cache_size * 1024 * 1024)
+        rt.stats = run_stats
+
+        if args.hash_file is not None:
+            results = crack_batch(rt, hashes, args.workers)
+            if args.report is not None:
+                write_report(args.report, results)
+                print(f"    Report written to {args.report}")
+            print_cache_stats(rt)
+            total_time = time.time() - start_time
+            print(f"\n[+] Total execution time: {format_time(total_time)}")
+            return
 
         print("\n[+] Starting crack attempt...")
         crack_start_time = time.time()
         
-        psw = rt.lookup(args.hash_string)
+        result = rt.lookup_detailed(args.hash_string, args.workers)
+        psw = result.password
         
         crack_time = time.time() - crack_start_time
 
@@ -83,6 +341,15 @@ def main():
             print("  • Hash collision occurred")
             print("  • Rainbow table coverage insufficient")
 
+        print("\n[+] Lookup Statistics:")
+        print(f"    Columns walked: {result.columns_walked} of {rt.chain_length}")
+        print(f"    Endpoint hits: {result.endpoint_hits}")
+        print(f"    False alarms: {result.false_alarms}"
+              f" ({format_time(result.false_alarm_seconds)} spent regenerating them)")
+        print(f"    Time walking columns: {format_time(result.walk_seconds)}")
+
+        print_cache_stats(rt)
+
         total_time = time.time() - start_time
         print(f"\n[+] Total execution time: {format_time(total_time)}")
 
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+'''Cracking daemon keeping rainbow tables resident.
+
+The tables are loaded once, then hashes submitted by clients are queued
+and cracked in batches: a batch starts once DAEMON_BATCH_SIZE hashes are
+waiting, or DAEMON_BATCH_WAIT seconds after the first one, and runs one
+TableSet.lookup_many pass (on --workers processes). Results are sent back
+as soon as a hash is cracked.
+
+Clients talk JSON, one object per line, over a Unix socket:
+    {"op": "crack", "hashes": [...]}  -> one {"hash", "password", "table"}
+                                         line per hash, then {"done": true}
+    {"op": "metrics"}                 -> one line of metrics
+With --port, the same is served over HTTP on localhost: POST /crack with
+{"hashes": [...]} streams the result lines (chunked), GET /metrics.
+
+Usage: python3 rainbowd.py TABLES [--socket PATH] [--port PORT] [--workers N]
+'''
+import os
+import sys
+import argparse
+import asyncio
+import json
+import logging
+import math
+import socket
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from constants import DAEMON_BATCH_SIZE, DAEMON_BATCH_WAIT, DAEMON_SOCKET
+from tableset import TableSet
+from walkcache import WalkCache
+
+# request latencies kept for the percentiles of the metrics
+LATENCY_WINDOW = 10000
+
+
+class CrackService:
+    '''Queue of submitted hashes, cracked in batches by one thread'''
+
+    def __init__(self, tables, workers=1, batch_size=DAEMON_BATCH_SIZE,
+                 batch_wait=DAEMON_BATCH_WAIT):
+        """CrackService constructor
+
+        Arguments:
+                tables {TableSet} -- tables to crack the hashes with
+                workers {int} -- processes of every lookup_many pass (default: {1})
+                batch_size {int} -- most hashes of a batch (default: {DAEMON_BATCH_SIZE})
+                batch_wait {float} -- seconds a batch waits for more hashes
+                    (default: {DAEMON_BATCH_WAIT})
+        """
+        self.tables = tables
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.queue = asyncio.Queue()
+        # hash -> (submission time, result queues of the requests waiting for it)
+        self.pending = {}
+        # lookups share the tables and their walk caches, one batch at a time
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.started = time.time()
+        self.in_flight = 0
+        self.requests = 0
+        self.submitted = 0
+        self.results = 0
+        self.cracked = 0
+        self.batches = 0
+        self.batched_hashes = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def submit(self, hashes):
+        '''Queues hashes to crack
+
+        Arguments:
+            hashes {list} -- hexadecimal hashes
+
+        Returns:
+            asyncio.Queue -- receives one (hash, password, table) triple
+                per distinct hash, password and table being None if it
+                was not cracked
+        '''
+        results = asyncio.Queue()
+        self.requests += 1
+        now = time.perf_counter()
+        for hash_string in dict.fromkeys(h.lower() for h in hashes):
+            self.submitted += 1
+            if hash_string in self.pending:
+                self.pending[hash_string][1].append(results)
+                continue
+            self.pending[hash_string] = (now, [results])
+            self.queue.put_nowait(hash_string)
+        return results
+
+    def _resolve(self, hash_string, password, name):
+        '''Sends the result of a hash to every request waiting for it'''
+        entry = self.pending.pop(hash_string, None)
+        if entry is None:
+            return
+        submitted, waiting = entry
+        self.results += 1
+        self.cracked += password is not None
+        self.latencies.append(time.perf_counter() - submitted)
+        for results in waiting:
+            results.put_nowait((hash_string, password, name))
+
+    def _crack(self, batch, loop):
+        '''Cracks a batch with the tables, in the executor thread'''
+        for hash_string, password, name in self.tables.lookup_many(batch, self.workers):
+            loop.call_soon_threadsafe(self._resolve, hash_string, password, name)
+
+    async def run(self):
+        '''Takes batches off the queue and cracks them, forever'''
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(
+                        self.queue.get(), max(0.0, deadline - loop.time())))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            self.batched_hashes += len(batch)
+            self.in_flight = len(batch)
+            try:
+                await loop.run_in_executor(self.executor, self._crack, batch, loop)
+            except Exception as e:
+                logging.error(f"Batch of {len(batch)} hashes failed: {e}")
+                # the hashes of the batch not resolved yet; those of a
+                # successful batch all are, and may have been submitted again
+                for hash_string in batch:
+                    self._resolve(hash_string, None, None)
+            finally:
+                self.in_flight = 0
+            logging.info(f"Batch of {len(batch)} hashes done, {self.queue.qsize()} queued")
+
+    def metrics(self):
+        '''Returns the request counters, queue depth and latencies'''
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return latencies[max(0, math.ceil(fraction * len(latencies)) - 1)]
+
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "tables": sorted(os.path.abspath(name) for group in self.tables.groups
+                             for name, _ in group.tables),
+            "workers": self.workers,
+            "requests": self.requests,
+            "hashes_submitted": self.submitted,
+            "queue_depth": self.queue.qsize(),
+            "in_flight": self.in_flight,
+            "results": self.results,
+            "cracked": self.cracked,
+            "hit_rate": self.cracked / self.results if self.results else 0.0,
+            "batches": self.batches,
+            "average_batch_size": self.batched_hashes / self.batches if self.batches else 0.0,
+            "latency_p50_seconds": percentile(0.50),
+            "latency_p99_seconds": percentile(0.99),
+        }
+
+
+def open_walk_cache(filename, max_bytes):
+    '''Opens the walk cache of a daemon. It is used by the executor thread
+    of the lookups, one batch at a time, and closed by the main thread'''
+    return WalkCache(filename, max_bytes, check_same_thread=False)
+
+
+def result_line(hash_string, password, name):
+    return json.dumps({"hash": hash_string, "password": password, "table": name}) + "\n"
+
+
+async def crack_lines(service, hashes):
+    '''Yields the JSON result lines of a crack request, as the hashes are
+    resolved, then the closing line'''
+    if not isinstance(hashes, list) or not all(isinstance(h, str) for h in hashes):
+        yield json.dumps({"error": "hashes must be a list of strings"}) + "\n"
+        return
+    valid = []
+    for hash_string in hashes:
+        try:
+            bytes.fromhex(hash_string)
+            valid.append(hash_string)
+        except ValueError:
+            yield json.dumps({"hash": hash_string, "error": "invalid hash"}) + "\n"
+    results = service.submit(valid)
+    expected = len(set(h.lower() for h in valid))
+    cracked = 0
+    for _ in range(expected):
+        hash_string, password, name = await results.get()
+        cracked += password is not None
+        yield result_line(hash_string, password, name)
+    yield json.dumps({"done": True, "hashes": expected, "cracked": cracked}) + "\n"
+
+
+async def handle_socket_client(service, reader, writer):
+    '''Serves the JSON line requests of a Unix socket connection'''
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+            except ValueError:
+                request = {}
+            if request.get("op") == "crack":
+                async for response in crack_lines(service, request.get("hashes")):
+                    writer.write(response.encode('utf-8'))
+                    await writer.drain()
+            elif request.get("op") == "metrics":
+                writer.write((json.dumps(service.metrics()) + "\n").encode('utf-8'))
+                await writer.drain()
+            else:
+                writer.write(b'{"error": "unknown request"}\n')
+                await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def handle_http_client(service, reader, writer):
+    '''Serves one HTTP request: POST /crack or GET /metrics'''
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        method, path = request_line[:2] if len(request_line) >= 2 else ("", "")
+
+        if method == "GET" and path == "/metrics":
+            await http_reply(writer, 200, json.dumps(service.metrics()))
+        elif method == "POST" and path == "/crack":
+            try:
+                hashes = json.loads(body).get("hashes")
+            except (ValueError, AttributeError):
+                await http_reply(writer, 400, '{"error": "invalid JSON"}')
+                return
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                         b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+            async for response in crack_lines(service, hashes):
+                chunk = response.encode('utf-8')
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        else:
+            await http_reply(writer, 404, '{"error": "not found"}')
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def http_reply(writer, status, body):
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}[status]
+    body = body.encode('utf-8')
+    writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1')
+                 + body)
+    await writer.drain()
+
+
+async def serve(service, socket_path, port):
+    '''Runs the batch loop and the servers until cancelled'''
+    servers = [await asyncio.start_unix_server(
+        lambda r, w: handle_socket_client(service, r, w), path=socket_path)]
+    logging.info(f"Listening on {socket_path}")
+    if port is not None:
+        servers.append(await asyncio.start_server(
+            lambda r, w: handle_http_client(service, r, w), host="127.0.0.1", port=port))
+        logging.info(f"Listening on http://127.0.0.1:{port}")
+    try:
+        await service.run()
+    finally:
+        for server in servers:
+            server.close()
+
+
+def daemon_request(request, socket_path=DAEMON_SOCKET):
+    '''Sends a request to a running daemon
+
+    Arguments:
+        request {dict} -- request object
+        socket_path {string} -- daemon socket (default: {DAEMON_SOCKET})
+
+    Raises:
+        OSError -- if no daemon answers on socket_path
+
+    Yields:
+        dict -- the response objects, until the last one of the request
+    '''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall((json.dumps(request) + "\n").encode('utf-8'))
+        with client.makefile("r", encoding="utf-8") as responses:
+            for line in responses:
+                response = json.loads(line)
+                yield response
+                if request.get("op") != "crack" or "hash" not in response:
+                    return
+
+
+def daemon_tables(socket_path=DAEMON_SOCKET):
+    '''Returns the table files loaded by the daemon listening on
+    socket_path, or None if there is none'''
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        return next(daemon_request({"op": "metrics"}, socket_path))["tables"]
+    except (OSError, ValueError, KeyError, StopIteration):
+        return None
+
+
+def crack_with_daemon(hashes, socket_path=DAEMON_SOCKET):
+    '''Cracks hashes with a running daemon
+
+    Yields:
+        tuple -- (hash, password, table file name) as soon as a hash is
+            resolved, password and table being None if it is not cracked
+    '''
+    for response in daemon_request({"op": "crack", "hashes": list(hashes)}, socket_path):
+        if "hash" in response:
+            yield response["hash"], response.get("password"), response.get("table")
+        elif "error" in response:
+            raise ValueError(response["error"])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cracking daemon keeping rainbow tables loaded",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("rainbow_table_file",
+                        help="table file, or directory or glob pattern of tables to serve")
+    parser.add_argument("--socket", default=DAEMON_SOCKET,
+                        help="Unix socket to listen on")
+    parser.add_argument("--port", type=int, default=None,
+                        help="also serve HTTP on this localhost port")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes cracking every batch")
+    parser.add_argument("--batch-size", type=int, default=DAEMON_BATCH_SIZE,
+                        help="most hashes cracked in one batch")
+    parser.add_argument("--batch-wait", type=float, default=DAEMON_BATCH_WAIT,
+                        help="seconds a batch waits for more hashes before starting")
+    parser.add_argument("--cache",
+                        help="persistent walk cache file (see rainbowcrack.py)")
+    parser.add_argument("--cache-size", type=int, default=256,
+                        help="maximum size of the walk cache in MB")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        stream=sys.stdout)
+    if args.workers < 1 or args.batch_size < 1:
+        logging.error("The number of workers and the batch size must be at least 1")
+        sys.exit(1)
+    if daemon_tables(args.socket) is not None:
+        logging.error(f"A daemon is already listening on {args.socket}")
+        sys.exit(1)
+
+    start_time = time.time()
+    cache = None
+    if args.cache is not None:
+        cache = open_walk_cache(args.cache, args.cache_size * 1024 * 1024)
+    try:
+        tables = TableSet.load(args.rainbow_table_file, cache)
+    except (OSError, ValueError) as e:
+        logging.error(f"Cannot load the tables: {e}")
+        sys.exit(1)
+    logging.info(f"{len(tables)} tables loaded in {time.time() - start_time:.2f} seconds")
+
+    if os.path.exists(args.socket):
+        # left by a daemon that did not exit cleanly
+        os.remove(args.socket)
+
+    async def run():
+        service = CrackService(tables, args.workers, args.batch_size, args.batch_wait)
+        await serve(service, args.socket, args.port)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        logging.info("Stopping")
+    finally:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
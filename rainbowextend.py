@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import argparse
+import time
+from constants import GENERATION_MEMORY_BUDGET
+from rainbowtable import RainbowTable
+from tablemerge import extend_table
+
+def main():
+    try:
+        parser = argparse.ArgumentParser(
+            description="Adds chains to an existing table, without generating its chains again"
+        )
+        parser.add_argument("table_file", help="table to extend")
+        parser.add_argument("chains", type=int, help="number of new chains")
+        parser.add_argument("--output", help="extended table file to write (default: replace table_file)")
+        parser.add_argument("--seed", type=int, default=None,
+                            help="seed of the new start points, random by default; "
+                                 "must differ from the seed of the table")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="number of processes generating chains in parallel")
+        parser.add_argument("--compact", action="store_true", default=None,
+                            help="write a compact table (the default for a compact table)")
+        parser.add_argument("--memory-budget", type=int,
+                            default=GENERATION_MEMORY_BUDGET // (1024 * 1024),
+                            help="megabytes of chains sorted in memory before a run is written to disk")
+        args = parser.parse_args()
+
+        if not os.path.exists(args.table_file):
+            print(f"\n[-] Error: Rainbow table file '{args.table_file}' not found.")
+            sys.exit(1)
+        if args.chains < 1:
+            print("\n[-] Error: The number of chains must be at least 1.")
+            sys.exit(1)
+        output = args.output if args.output is not None else args.table_file
+
+        print("\n[+] Opening rainbow table...")
+        rt = RainbowTable.load_from_file(args.table_file)
+        print(f"    {len(rt.table)} chains, estimated coverage {rt.estimated_coverage():.2%}")
+
+        print(f"\n[+] Generating {args.chains} new chains...")
+        start_time = time.time()
+        stored = len(rt.table)
+        extended = extend_table(rt, args.chains, output, seed=args.seed, workers=args.workers,
+                                compact=args.compact,
+                                memory_budget=args.memory_budget * 1024 * 1024)
+        print(f"    {len(extended.table) - stored} chains added in "
+              f"{time.time() - start_time:.2f} seconds")
+        print(f"    {len(extended.table)} chains written to {output}")
+        print(f"    Estimated coverage: {extended.coverage:.2%}")
+
+    except Exception as e:
+        print(f"\n[-] Error: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,12 @@ import logging
 import time
 from datetime import datetime
 from rainbowtable import RainbowTable
+from constants import CHECKPOINT_INTERVAL, GENERATION_MEMORY_BUDGET, REDUCE_VERSION
+from externalsort import buffered_size
+from hashbackends import algorithm_names
+from stats import add_stats_arguments, stats_from_arguments
+from tablefile import COMPACT_BLOCK_RECORDS, DATA_ALIGNMENT
+from tradeoff import TablePlan, measure_step_rate, suggest_plans
 
 #prasanth
 def setup_logging():
@@ -42,14 +48,90 @@ def validate_arguments(args):
     if args.number_of_chains < 1:
         raise ValueError("Number of chains must be at least 1")
     
-    if args.algorithm.lower() not in ['sha1', 'md5']:
-        raise ValueError("Algorithm must be either 'sha1' or 'md5'")
+    if not 0 <= args.distinguished_bits <= 32:
+        raise ValueError("Distinguished bits must be between 0 and 32")
+
+    if args.checkpoint_interval < 1:
+        raise ValueError("Checkpoint interval must be at least 1")
+
+    if args.workers < 1:
+        raise ValueError("Number of workers must be at least 1")
+
+    if args.table_index < 0:
+        raise ValueError("Table index cannot be negative")
+
+    if args.memory_budget < 1:
+        raise ValueError("Memory budget must be at least 1 MB")
+    
+    if not 0 <= args.bloom < 1:
+        raise ValueError("The Bloom filter false positive rate must be between 0 and 1")
+
+    if args.algorithm.lower() not in algorithm_names():
+        raise ValueError("Algorithm must be one of: " + ", ".join(algorithm_names()))
+
+    if not 0 < args.target_success < 1:
+        raise ValueError("Target success must be between 0 and 1")
+
+    if args.plan and args.distinguished_bits:
+        raise ValueError("--plan does not model distinguished point tables")
 #jeevan
-def estimate_memory_usage(args):
-    """Estimate memory usage based on input parameters"""
-    avg_length = (args.min_length + args.max_length) / 2
-    estimated_bytes = args.number_of_chains * (avg_length + 20)  # 20 bytes for hash
-    return estimated_bytes
+def estimate_record_size(args, rt):
+    """Estimate the bytes stored per chain in the table file"""
+    index_size = rt.keyspace().index_size()
+    if args.compact:
+        # about 2 bytes of delta-coded endpoint and the start index per
+        # chain, plus a 16-byte sparse index entry per block
+        return 2 + index_size + 16 / COMPACT_BLOCK_RECORDS
+    # one (endpoint, start index) record per chain
+    return rt.digest_size() + index_size
+
+def estimate_memory_usage(args, rt):
+    """Estimate the table file size and the peak memory of the generation"""
+    key_size = rt.digest_size()
+    index_size = rt.keyspace().index_size()
+    file_bytes = DATA_ALIGNMENT * 3 + int(args.number_of_chains * estimate_record_size(args, rt))
+    # chains are sorted in runs of at most the memory budget
+    memory_bytes = min(args.memory_budget * 1024 * 1024,
+                       args.number_of_chains * buffered_size(key_size, index_size))
+    return file_bytes, memory_bytes
+
+def log_plan(plan):
+    """Log the predictions of a table plan"""
+    logging.info(f"  chain length {plan.chain_length}, {plan.number_of_chains} chains, "
+                 f"{plan.tables} table(s)")
+    logging.info(f"    success {plan.success:.2%}, size {plan.table_bytes / (1024 * 1024):.2f} MB, "
+                 f"generation {plan.generation_seconds:.0f} s, "
+                 f"worst-case lookup {plan.lookup_seconds:.3f} s")
+
+def plan_table(args, rt):
+    """Predict the table requested, then suggest parameters reaching the target success"""
+    keyspace_size = rt.keyspace().size
+    record_size = estimate_record_size(args, rt)
+    logging.info("Calibrating the hash + reduce rate...")
+    step_rate = measure_step_rate(rt)
+    logging.info(f"Keyspace: {keyspace_size} passwords")
+    logging.info(f"Hash + reduce rate: {step_rate:.0f} steps/s per worker")
+
+    plan = TablePlan(keyspace_size, args.chain_length, args.number_of_chains, record_size,
+                     step_rate, args.perfect, workers=args.workers)
+    logging.info("Requested table:")
+    if not plan.feasible:
+        logging.info(f"  the keyspace cannot hold {args.number_of_chains} non-merging chains "
+                     f"of length {args.chain_length}")
+    else:
+        logging.info(f"  {plan.start_points} start points, {plan.stored_chains} chains kept")
+        log_plan(plan)
+
+    max_bytes = None if args.max_table_size is None else args.max_table_size * 1024 * 1024
+    plans = suggest_plans(keyspace_size, record_size, step_rate, args.target_success,
+                          max_bytes, args.perfect, args.workers)
+    if not plans:
+        logging.info(f"No parameters reach {args.target_success:.2%} success within the size limit")
+        return
+    logging.info(f"Parameters reaching {args.target_success:.2%} success, fastest lookups first "
+                 "(several tables need distinct --table-index values):")
+    for suggestion in plans:
+        log_plan(suggestion)
 
 def print_configuration(args):
     """Print configuration details"""
@@ -58,8 +140,20 @@ def print_configuration(args):
     logging.info(f"Algorithm: {args.algorithm}")
     logging.info(f"Charset: {args.charset}")
     logging.info(f"Password Length Range: {args.min_length} - {args.max_length}")
+    if args.mask:
+        logging.info(f"Masks: {', '.join(args.mask)}")
     logging.info(f"Chain Length: {args.chain_length}")
     logging.info(f"Number of Chains: {args.number_of_chains}")
+    logging.info(f"Table Index: {args.table_index}")
+    logging.info(f"Reduce Version: {args.reduce_version}")
+    if args.distinguished_bits:
+        logging.info(f"Mode: distinguished points ({args.distinguished_bits} bits, max chain length {args.chain_length})")
+    elif args.perfect:
+        logging.info("Mode: perfect table")
+    else:
+        logging.info("Mode: rainbow table")
+    logging.info(f"Workers: {args.workers}")
+    logging.info(f"Seed: {args.seed if args.seed is not None else 'random'}")
     logging.info(f"Output File: {args.output_file}")
     logging.info("-" * 40)
 
@@ -80,7 +174,7 @@ def main():
         )
         parser.add_argument(
             "algorithm",
-            help="Hash algorithm to use (sha1 or md5)",
+            help="Hash algorithm to use (" + ", ".join(algorithm_names()) + ")",
             type=str
         )
         parser.add_argument(
@@ -113,39 +207,165 @@ def main():
             help="Name of the output file",
             type=str
         )
+        parser.add_argument(
+            "--table-index",
+            help="Reduce function family; tables with different indices are independent "
+                 "and can be searched together by rainbowcrack.py",
+            type=int,
+            default=0
+        )
+        parser.add_argument(
+            "--mask",
+            help="Draw passwords from a mask such as ?u?l?l?l?d?d instead of the whole charset "
+                 "(?l ?u ?d ?s ?a, ?c for the charset, ?{name} for a charset of config.ini), "
+                 "or from a mask list of the [MASKS] section of config.ini; may be repeated, "
+                 "masks outside min_length - max_length are skipped",
+            action="append",
+            default=None
+        )
+        parser.add_argument(
+            "--reduce-version",
+            help="Reduce functions: 2 maps hashes uniformly over the keyspace, "
+                 "1 is the original byte-based reduce, for extending older tables",
+            type=int,
+            choices=[1, 2],
+            default=REDUCE_VERSION
+        )
+        parser.add_argument(
+            "--workers",
+            help="Number of processes generating chains in parallel",
+            type=int,
+            default=1
+        )
+        parser.add_argument(
+            "--seed",
+            help="Seed of the start points; the same seed gives the same table for any number of workers",
+            type=int,
+            default=None
+        )
+        parser.add_argument(
+            "--perfect",
+            help="Drop merging chains and top up until number_of_chains distinct endpoints are reached",
+            action="store_true"
+        )
+        parser.add_argument(
+            "--distinguished-bits",
+            help="End chains at the first hash starting with this many zero bits "
+                 "(variable-length perfect chains, chain_length is the maximum); 0 disables",
+            type=int,
+            default=0
+        )
+        parser.add_argument(
+            "--checkpoint-interval",
+            help="Blocks of start points generated between two checkpoints "
+                 "(written to OUTPUT_FILE.ckpt)",
+            type=int,
+            default=CHECKPOINT_INTERVAL
+        )
+        parser.add_argument(
+            "--memory-budget",
+            help="Megabytes of chains sorted in memory before a run is written to disk; "
+                 "bounds the memory used whatever the number of chains",
+            type=int,
+            default=GENERATION_MEMORY_BUDGET // (1024 * 1024)
+        )
+        parser.add_argument(
+            "--plan",
+            help="Predict the success rate, size, generation time and lookup time of the table, "
+                 "and suggest parameters reaching --target-success, without generating anything",
+            action="store_true"
+        )
+        parser.add_argument(
+            "--target-success",
+            help="Success probability the parameters suggested by --plan must reach",
+            type=float,
+            default=0.9
+        )
+        parser.add_argument(
+            "--max-table-size",
+            help="Megabytes of tables the parameters suggested by --plan may use; no limit if omitted",
+            type=int,
+            default=None
+        )
+        parser.add_argument(
+            "--compact",
+            help="Write a compact table: endpoints truncated to the bits needed to tell "
+                 "the chains apart and delta-coded, under 10 bytes per chain",
+            action="store_true"
+        )
+        parser.add_argument(
+            "--bloom",
+            help="Store a Bloom filter of the endpoints with this false positive rate (e.g. 0.01), "
+                 "kept in memory so that most lookup probes never touch the table file; 0 for none",
+            type=float,
+            default=0
+        )
+        parser.add_argument(
+            "--resume",
+            help="Continue an interrupted generation from OUTPUT_FILE.ckpt",
+            action="store_true"
+        )
+        add_stats_arguments(parser)
         
         args = parser.parse_args()
         
         # Set up logging
         log_file = setup_logging()
         logging.info(f"Log file: {log_file}")
+        run_stats = stats_from_arguments(args, logging.info)
         
         # Validate arguments
         validate_arguments(args)
         
-        # Estimate memory usage
-        estimated_bytes = estimate_memory_usage(args)
-        logging.info(f"Estimated memory usage: {estimated_bytes / (1024 * 1024):.2f} MB")
-        
         # Print configuration
         print_configuration(args)
+
+        if args.plan:
+            plan_table(args, RainbowTable(args.algorithm, args.charset, args.min_length,
+                                          args.max_length, args.chain_length,
+                                          args.number_of_chains, table_index=args.table_index,
+                                          reduce_version=args.reduce_version,
+                                          masks=args.mask))
+            return
         
         # Check output file
         check_output_file(args.output_file)
+        checkpoint_file = args.output_file + ".ckpt"
+        if args.resume and not os.path.exists(checkpoint_file):
+            raise ValueError(f"No checkpoint to resume from ({checkpoint_file} not found)")
         
         # Create RainbowTable instance
-        rt = RainbowTable(args.algorithm, args.charset, args.min_length, args.max_length, args.chain_length, args.number_of_chains)
+        rt = RainbowTable(args.algorithm, args.charset, args.min_length, args.max_length, args.chain_length, args.number_of_chains,
+                          table_index=args.table_index, reduce_version=args.reduce_version,
+                          masks=args.mask)
+        rt.stats = run_stats
+
+        # Estimate memory usage
+        file_bytes, memory_bytes = estimate_memory_usage(args, rt)
+        logging.info(f"Estimated table size: {file_bytes / (1024 * 1024):.2f} MB")
+        logging.info(f"Estimated memory usage: {memory_bytes / (1024 * 1024):.2f} MB")
         
-        # Generate rainbow table
+        # Generate rainbow table, streamed into the output file
         start_time = time.time()
-        rt.generate_table()
+        rt.generate_table(workers=args.workers, seed=args.seed, perfect=args.perfect,
+                          distinguished_bits=args.distinguished_bits,
+                          checkpoint=checkpoint_file,
+                          checkpoint_interval=args.checkpoint_interval,
+                          resume=args.resume, output=args.output_file,
+                          memory_budget=args.memory_budget * 1024 * 1024,
+                          compact=args.compact, bloom=args.bloom)
         end_time = time.time()
         logging.info(f"Rainbow table generation took {end_time - start_time:.2f} seconds")
+        logging.info(f"Seed used: {rt.seed}")
+        logging.info(f"Distinct chains: {len(rt.table)}")
+        logging.info(f"Estimated coverage: {rt.coverage:.2%}")
         
-        # Save to file
-        rt.save_to_file(args.output_file)
         logging.info(f"Rainbow table saved to {args.output_file}")
+        os.remove(checkpoint_file)
         
+    except KeyboardInterrupt:
+        logging.error("Generation interrupted by user, run again with --resume to continue")
+        sys.exit(1)
     except Exception as e:
         logging.error(f"ERROR: {str(e)}")
         sys.exit(1)
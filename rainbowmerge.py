@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import argparse
+import time
+from rainbowtable import RainbowTable
+from tablemerge import merge_tables
+
+def main():
+    try:
+        parser = argparse.ArgumentParser(
+            description="Merges tables with the same algorithm, charset, lengths, chain length "
+                        "and reduce functions into one table, dropping duplicate endpoints"
+        )
+        parser.add_argument("output_file", help="name of the merged table file to write")
+        parser.add_argument("input_files", nargs="+",
+                            help="tables to merge; on duplicate endpoints, the chain of the "
+                                 "first table is kept")
+        parser.add_argument("--compact", action="store_true", default=None,
+                            help="write a compact table (the default when an input is compact)")
+        args = parser.parse_args()
+
+        for filename in args.input_files:
+            if not os.path.exists(filename):
+                print(f"\n[-] Error: Rainbow table file '{filename}' not found.")
+                sys.exit(1)
+
+        print("\n[+] Opening rainbow tables...")
+        tables = [RainbowTable.load_from_file(filename) for filename in args.input_files]
+        for filename, table in zip(args.input_files, tables):
+            print(f"    {filename}: {len(table.table)} chains")
+
+        print("\n[+] Merging...")
+        start_time = time.time()
+        merged = merge_tables(tables, args.output_file, args.compact)
+        stored = sum(len(table.table) for table in tables)
+        print(f"    {len(merged.table)} chains written to {args.output_file} in "
+              f"{time.time() - start_time:.2f} seconds")
+        print(f"    Duplicate endpoints dropped: {stored - len(merged.table)}")
+        print(f"    Estimated coverage: {merged.coverage:.2%}")
+        print(f"    File size: {os.path.getsize(args.output_file)} bytes")
+
+    except Exception as e:
+        print(f"\n[-] Error: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import argparse
+import time
+from rainbowtable import RainbowTable
+from sharding import split_table
+
+def main():
+    try:
+        parser = argparse.ArgumentParser(
+            description="Splits a table by endpoint prefix into shard files with a manifest, "
+                        "to be cracked with rainbowcrack.py MANIFEST"
+        )
+        parser.add_argument("table_file", help="table to split")
+        parser.add_argument("output_directory", help="directory of the shard files and manifest")
+        parser.add_argument("--shards", type=int, required=True, help="number of shards")
+        parser.add_argument("--name", help="base name of the shard files and manifest "
+                                           "(default: name of the table file)")
+        args = parser.parse_args()
+
+        if not os.path.exists(args.table_file):
+            print(f"\n[-] Error: Rainbow table file '{args.table_file}' not found.")
+            sys.exit(1)
+        name = args.name or os.path.splitext(os.path.basename(args.table_file))[0]
+
+        print("\n[+] Opening rainbow table...")
+        rt = RainbowTable.load_from_file(args.table_file)
+        print(f"    {len(rt.table)} chains")
+
+        print(f"\n[+] Writing {args.shards} shards...")
+        start_time = time.time()
+        manifest = split_table(rt, args.output_directory, args.shards, name)
+        print(f"    Shards written in {time.time() - start_time:.2f} seconds")
+        print(f"    Manifest: {manifest}")
+
+    except Exception as e:
+        print(f"\n[-] Error: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,24 @@ import hashlib
 import random
 import logging
 import pickle
-from constants import CHARSETS_SECTION, MAIN_CONFIG_FILE
+import multiprocessing
+import os
+import json
+import time
+from constants import (CHARSETS_SECTION, MASKS_SECTION, MAIN_CONFIG_FILE, GENERATION_BLOCK_SIZE,
+                       CHECKPOINT_INTERVAL, GENERATION_MEMORY_BUDGET,
+                       LOOKUP_COLUMN_GROUP, LOOKUP_TASKS_PER_WORKER, REDUCE_VERSION)
+from checkpoint import Checkpoint, CheckpointState
+from externalsort import ChainSorter
 from algorithm import Algorithm
+from chainkernel import ChainKernel
+from keyspace import parse_mask, table_keyspace
+from stats import Stats, phase, timed
+from tradeoff import perfect_coverage, points_coverage
+from hashbackends import get_backend
+from tablefile import (CompactEndpointIndex, EndpointIndex, TableHeader, compact_layout,
+                       is_table_file, open_table, write_table)
+from walkcache import WalkLog
 
 class GomuhryTree:
     #jeevan
@@ -80,7 +96,65 @@ class GomuhryTree:
         else:
             return self._search(x.child[i], k)
 
+# Table shared by the generation workers, set once per process by _init_worker
+_worker_table = None
+
+
+def _init_worker(table):
+    global _worker_table
+    _worker_table = table
+
+
+def _generate_block(work):
+    return _worker_table.generate_block(*work)
+
+
+def _lookup_columns(work):
+    target, first, stop, with_stats = work
+    _worker_table.stats = Stats() if with_stats else None
+    result = LookupResult()
+    walked = []
+    _worker_table.lookup_columns(target, first, stop, result, walked=walked)
+    return first, result, walked, _worker_stats()
+
+
+def _lookup_hashes(work):
+    hashes, walks, with_stats = work
+    # walks are read from and recorded into a WalkLog, the parent process
+    # owns the walk cache
+    _worker_table.walk_cache = WalkLog(walks) if walks is not None else None
+    _worker_table.stats = Stats() if with_stats else None
+    results = list(_worker_table.lookup_many(hashes))
+    return (results, _worker_table.walk_cache.new if walks is not None else {},
+            _worker_stats())
+
+
+def _worker_stats():
+    # counters of the last task, sent back to the parent process stats
+    return _worker_table.stats.as_dict() if _worker_table.stats is not None else None
+
+
 class RainbowTable:
+    # optional WalkCache (see walkcache.py) consulted by the lookups
+    walk_cache = None
+    # optional Stats (see stats.py) counting the work of generations and lookups
+    stats = None
+    # generation mode, see generate_table; defaults of older pickled tables
+    perfect = False
+    distinguished_bits = 0
+    seed = None
+    coverage = None
+    # reduce function family, tables of other indices are independent
+    table_index = 0
+    # reduce function version, tables without one use the original reduce
+    reduce_version = 1
+    # characters allowed at every position of every mask, None for the
+    # charset over the length range
+    masks = None
+    # attributes stored in the metadata of table files
+    METADATA = ('seed', 'perfect', 'distinguished_bits', 'coverage',
+                'table_index', 'reduce_version', 'masks')
+
     #prasanth
     def load_config(self):
         """Loads configuration from config.ini."""
@@ -94,7 +168,8 @@ class RainbowTable:
         logging.debug(self.config)
 
     def __init__(self, algorithm, charset, min_length, max_length,
-                 chain_length, number_of_chains):
+                 chain_length, number_of_chains, table_index=0,
+                 reduce_version=REDUCE_VERSION, masks=None):
         """RainbowTable constructor
 
         Arguments:
@@ -104,20 +179,31 @@ class RainbowTable:
                 max_length {int} -- maximum password length
                 chain_length {int} -- chain length
                 number_of_chains {int} -- number of chains
+                table_index {int} -- reduce function family (default: {0})
+                reduce_version {int} -- 1 for the original reduce
+                    functions, 2 for uniform index-based ones
+                    (default: {REDUCE_VERSION})
+                masks {list} -- masks (see keyspace.parse_mask) or names
+                    of mask lists of config.ini; passwords are then drawn
+                    from the masks of length min_length to max_length
+                    instead of from the charset (default: {None})
 
         Raises:
-                ValueError -- if algorithm is not 'sha1' or 'md5'
+                ValueError -- if algorithm has no backend in hashbackends.py
                 ValueError -- if charset name is not in config file
+                ValueError -- if max_length is too long for the algorithm
+                ValueError -- if the reduce version is unknown
+                ValueError -- if a mask is invalid, or none has an
+                    allowed length
         """
         self.load_config()
 
         # Load algorithm
-        if algorithm == "sha1":
-            self.algorithm = Algorithm.SHA1
-        elif algorithm == "md5":
-            self.algorithm = Algorithm.MD5
-        else:
-            raise ValueError("Algorithm not supported")
+        self.algorithm = get_backend(algorithm).algorithm
+        self.bind_backend()
+        if self.backend.max_length is not None and max_length > self.backend.max_length:
+            raise ValueError(f"{self.algorithm.name} only hashes passwords of up to "
+                             f"{self.backend.max_length} characters")
 
         # Load charset
         if self.config is not None and charset not in self.config[CHARSETS_SECTION]:
@@ -130,9 +216,79 @@ class RainbowTable:
         self.max_length = max_length
         self.chain_length = chain_length
         self.number_of_chains = number_of_chains
+        self.table_index = table_index
+        if reduce_version not in (1, 2):
+            raise ValueError("Reduce version must be 1 or 2")
+        self.reduce_version = reduce_version
+        if masks:
+            if reduce_version == 1:
+                raise ValueError("Masks need reduce version 2")
+            self.masks = self.expand_masks(masks)
+
+        # endpoint -> start password, one sorted fixed-width record per chain
+        self.table = EndpointIndex.from_sorted(
+            [], self.digest_size(), self.keyspace().index_size(), self.keyspace())
+
+    def expand_masks(self, masks):
+        '''Returns the characters allowed at every position of the masks
+        of allowed length. A mask may name a list of masks of config.ini,
+        one per line; ?c is the table charset and ?{name} a charset of
+        config.ini
+
+        Arguments:
+            masks {list} -- masks or mask list names
+
+        Raises:
+            ValueError -- if a mask is invalid, or none has an allowed length
+
+        Returns:
+            list -- one list of position charsets per mask
+        '''
+        charsets = {name: self.config.get(CHARSETS_SECTION, name, raw=True)
+                    for name in self.config[CHARSETS_SECTION]}
+        charsets['c'] = self.charset
+        named = self.config[MASKS_SECTION] if self.config.has_section(MASKS_SECTION) else {}
+        expanded = []
+        for mask in masks:
+            sources = named[mask].splitlines() if mask in named else [mask]
+            for source in sources:
+                if not source.strip():
+                    continue
+                positions = parse_mask(source.strip(), charsets)
+                if self.min_length <= len(positions) <= self.max_length:
+                    expanded.append(positions)
+        if not expanded:
+            raise ValueError("No mask has a length between the minimum and maximum lengths")
+        return expanded
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_kernel', None)
+        state.pop('_mask', None)
+        state.pop('_reducer', None)
+        state.pop('_keyspace', None)
+        state.pop('walk_cache', None)
+        state.pop('stats', None)
+        state.pop('backend', None)
+        state.pop('_hash_text', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.bind_backend()
 
-        self.tree = GomuhryTree(t=5)  # Initialize with minimum degree 5
-        self.table = {}  # Keep the original table for backward compatibility
+    def bind_backend(self):
+        '''Binds the hash backend of the table algorithm (see
+        hashbackends.py), once for all the hashes of the table'''
+        self.backend = get_backend(self.algorithm)
+        self._hash_text = self.backend.hash_text
+
+    def kernel(self):
+        '''Returns the batched ChainKernel of this table, or None when the
+        pure-Python functions have to be used'''
+        if not hasattr(self, '_kernel'):
+            self._kernel = ChainKernel.for_table(self)
+        return self._kernel
     #deepak
     def hash_function(self, plaintext):
         """Returns a string that contains the computed hash of the 
@@ -144,14 +300,37 @@ class RainbowTable:
         Returns:
                 string -- the hash computed
         """
-        if self.algorithm == Algorithm.SHA1:
-            return hashlib.sha1(plaintext.encode('utf-8')).digest()
-        elif self.algorithm == Algorithm.MD5:
-            return hashlib.md5(plaintext.encode('utf-8')).digest()
+        return self._hash_text(plaintext)
+
+    def hash_many(self, plaintexts):
+        '''Hashes many plaintexts with one call to the hash backend'''
+        return self.backend.hash_many(
+            [plaintext.encode('utf-8') for plaintext in plaintexts])
+
+    def digest_size(self):
+        '''Returns the size in bytes of the hashes of this table'''
+        return self.backend.digest_size
+
+    def reduce_mask(self):
+        '''Returns the bytes XORed into the hashes before they are
+        reduced, which select the reduce family of table_index; None for
+        table index 0, whose reduce functions are the original ones'''
+        if not self.table_index:
+            return None
+        return hashlib.shake_256(
+            f"rainbow table {self.table_index}".encode('utf-8')
+        ).digest(self.digest_size())
+
     def reduce_function(self, hashstring, index):
         """Returns a string that contains the reduced value of the 
         given hash string
 
+        Version 1 reads the password length from the second byte of the
+        hash and the characters from bytes index, index + 1, ... of it.
+        Version 2 reads the hash as a big-endian number, adds index and
+        unranks the result modulo the keyspace size (see Keyspace), so
+        every password of the keyspace is equally likely.
+
         Arguments:
                 plaintext {string} -- hash to reduce
                 index {int} -- affects the choice of the function
@@ -160,13 +339,42 @@ class RainbowTable:
         Returns:
                 string -- the hash computed
         """
-        reduced_value = ""
-        pswLength = hashstring[1] % (
-            self.max_length - self.min_length + 1) + self.min_length
-        for i in range(pswLength):
-            value = hashstring[((index + i) % len(hashstring))]
-            reduced_value += self.charset[value % len(self.charset)]
-        return reduced_value
+        if not hasattr(self, '_reducer'):
+            self._mask = self.reduce_mask()
+            self._reducer = self.reducer()
+        if self._mask is not None:
+            hashstring = bytes(a ^ b for a, b in zip(hashstring, self._mask))
+        return self._reducer(hashstring, index)
+
+    def reducer(self):
+        '''Returns the reduce function of the table version, taking an
+        already masked hash, with its tables precomputed'''
+        if self.reduce_version == 1:
+            # byte value -> character, same as charset[value % len(charset)]
+            characters = [self.charset[value % len(self.charset)] for value in range(256)]
+            span = self.max_length - self.min_length + 1
+            min_length = self.min_length
+
+            def reduce_v1(hashstring, index):
+                size = len(hashstring)
+                length = hashstring[1] % span + min_length
+                return "".join([characters[hashstring[(index + i) % size]]
+                                for i in range(length)])
+            return reduce_v1
+
+        keyspace = self.keyspace()
+        width = self.reduce_width()
+
+        def reduce_v2(hashstring, index):
+            value = int.from_bytes(hashstring[:width], 'big')
+            return keyspace.unrank((value + index) % keyspace.size)
+        return reduce_v2
+
+    def reduce_width(self):
+        '''Returns the number of leading hash bytes read by the version 2
+        reduce: 4 more than the start indices, so that the modulo bias
+        stays under 2^-32, within the digest size'''
+        return min(self.digest_size(), self.keyspace().index_size() + 4)
 
     def generate_chain(self, password):
         '''Produces a chain starting from a plaintext
@@ -187,54 +395,444 @@ class RainbowTable:
             "------------------------------------->" + hashed.hex())
         return hashed
 
-    def generate_table(self):
-        '''Generates the full table with GomuhryTree optimization and logs each
-        password-hash pair to hash.txt.'''
-        collisions = 0
-        self.table = {}
-        
+    def random_password(self, rng):
+        '''Draws a random start point of allowed length from the charset
+
+        Arguments:
+            rng {random.Random} -- generator to draw from
+
+        Returns:
+            string -- the random password
+        '''
+        if self.masks:
+            keyspace = self.keyspace()
+            return keyspace.unrank(rng.randrange(keyspace.size))
+        return ''.join(rng.choices(
+            self.charset,
+            k=rng.randint(self.min_length, self.max_length))
+        )
+
+    def is_distinguished(self, hashed):
+        '''Returns true if the first distinguished_bits bits of the hash
+        are zero, i.e. the hash ends a distinguished point chain'''
+        return int.from_bytes(hashed[:8], 'big') >> (64 - self.distinguished_bits) == 0
+
+    def generate_block(self, block, count, seed):
+        '''Generates the chains of one block of start points. Every block
+        has its own RNG, derived from the table seed and the block number,
+        so the chains do not depend on which process builds the block.
+        The chains of a block are stepped together (see step_many).
+
+        In distinguished point mode, a chain stops at its first
+        distinguished hash, and chains that find none within chain_length
+        columns are dropped.
+
+        Arguments:
+            block {int} -- block number
+            count {int} -- number of chains in the block
+            seed {int} -- table seed
+
+        Returns:
+            list -- (start password, chain tail, chain length) triples, in
+                generation order
+        '''
+        rng = random.Random(f"{seed}:{block}")
+        passwords = [self.random_password(rng) for _ in range(count)]
+        return [(password,) + ended
+                for password, ended in zip(passwords, self.chain_tails(passwords))
+                if ended is not None]
+
+    def chain_tails(self, passwords):
+        '''Steps the chains of many start points together (see step_many)
+
+        Arguments:
+            passwords {list} -- start points
+
+        Returns:
+            list -- (chain tail, chain length) pairs, in the order of the
+                start points; None for a distinguished point chain that
+                finds none within chain_length columns
+        '''
+        hashes = self.hash_many(passwords)
+        if not self.distinguished_bits:
+            for i in range(self.chain_length - 1):
+                hashes = self.step_many(hashes, i)
+            return [(hashed, self.chain_length) for hashed in hashes]
+
+        ended = {}
+        live = []
+        for n, hashed in enumerate(hashes):
+            if self.is_distinguished(hashed):
+                ended[n] = (hashed, 1)
+            else:
+                live.append(n)
+        for i in range(self.chain_length - 1):
+            if not live:
+                break
+            stepped = self.step_many([hashes[n] for n in live], i)
+            still_live = []
+            for n, hashed in zip(live, stepped):
+                if self.is_distinguished(hashed):
+                    ended[n] = (hashed, i + 2)
+                else:
+                    hashes[n] = hashed
+                    still_live.append(n)
+            live = still_live
+        return [ended.get(n) for n in range(len(passwords))]
+
+    def _block_size(self, block):
+        '''Returns the number of start points of a block: number_of_chains
+        is split into the first blocks, top-up blocks are full'''
+        first = block * GENERATION_BLOCK_SIZE
+        if first < self.number_of_chains:
+            return min(GENERATION_BLOCK_SIZE, self.number_of_chains - first)
+        return GENERATION_BLOCK_SIZE
+
+    def generation_parameters(self, seed):
+        '''Returns everything a generation depends on, as stored in its
+        checkpoint'''
+        return {
+            "algorithm": self.algorithm.name,
+            "charset": self.charset,
+            "min_length": self.min_length,
+            "max_length": self.max_length,
+            "chain_length": self.chain_length,
+            "number_of_chains": self.number_of_chains,
+            "seed": seed,
+            "perfect": self.perfect,
+            "distinguished_bits": self.distinguished_bits,
+            "table_index": self.table_index,
+            "reduce_version": self.reduce_version,
+            "masks": self.masks,
+            "block_size": GENERATION_BLOCK_SIZE,
+        }
+
+    def generate_table(self, workers=1, seed=None, perfect=False,
+                       distinguished_bits=0, checkpoint=None,
+                       checkpoint_interval=CHECKPOINT_INTERVAL, resume=False,
+                       output=None, memory_budget=GENERATION_MEMORY_BUDGET,
+                       compact=False, bloom=0):
+        '''Generates the full table into a sorted EndpointIndex and logs
+        each password-hash pair to hash.txt.
+
+        Start points are drawn block by block (see generate_block). With
+        workers > 1 the blocks are spread over a process pool and merged
+        back in block order, so a given seed yields the same table whatever
+        the number of workers.
+
+        Chains are sorted by endpoint in runs of at most memory_budget
+        bytes, written to disk when full and merged at the end (see
+        externalsort.py). With an output file, the merge is streamed
+        straight into the table file, which is then memory-mapped, so the
+        memory used does not depend on number_of_chains.
+
+        A perfect table keeps only the first chain of every endpoint and
+        tops up with new blocks of start points until number_of_chains
+        distinct endpoints are reached. Distinguished point tables
+        (distinguished_bits > 0) are always perfect, with chains of
+        variable length.
+
+        With a checkpoint file, the chains of every checkpoint_interval
+        blocks are appended to it as a sorted run, with the generator
+        state (see checkpoint.py). A generation started again with
+        resume=True continues from the last checkpoint and yields the same
+        table as an uninterrupted one.
+
+        The estimated success probability is stored in self.coverage.
+
+        Arguments:
+            workers {int} -- number of processes to use (default: {1})
+            seed {int} -- seed of the start points, random if None; taken
+                from the checkpoint on resume (default: {None})
+            perfect {bool} -- drop merging chains and top up (default: {False})
+            distinguished_bits {int} -- zero bits ending a chain, 0 for
+                fixed-length chains (default: {0})
+            checkpoint {string} -- checkpoint file path (default: {None})
+            checkpoint_interval {int} -- blocks between two checkpoints
+            resume {bool} -- continue the generation saved in checkpoint
+                (default: {False})
+            output {string} -- table file to write (default: {None})
+            memory_budget {int} -- bytes of chains sorted in memory at once
+            compact {bool} -- write output as a compact table file, with
+                truncated delta-coded endpoints (default: {False})
+            bloom {float} -- false positive rate of a Bloom filter of the
+                endpoints written with output, 0 for none (default: {0})
+
+        Raises:
+            ValueError -- if the checkpoint does not match the parameters
+        '''
+        self.distinguished_bits = distinguished_bits
+        self.perfect = perfect or distinguished_bits > 0
+        keyspace = self.keyspace()
+        key_size = self.digest_size()
+        index_size = keyspace.index_size()
+
+        ckpt = None
+        if resume:
+            if seed is None:
+                seed = Checkpoint.read_parameters(checkpoint)["seed"]
+            ckpt, state = Checkpoint.resume(
+                checkpoint, self.generation_parameters(seed))
+            logging.info(f"Resuming from block {state.next_block}, "
+                         f"{state.chains} chains done")
+        else:
+            if seed is None:
+                seed = random.getrandbits(64)
+            state = CheckpointState()
+            if checkpoint is not None:
+                ckpt = Checkpoint.create(
+                    checkpoint, self.generation_parameters(seed))
+        self.seed = seed
+        if state.round_end is None:
+            state.round_end = -(-self.number_of_chains // GENERATION_BLOCK_SIZE)
+        sorter = ChainSorter(
+            key_size, index_size, memory_budget, state, store=ckpt,
+            directory=os.path.dirname(os.path.abspath(output)) if output else None)
+
+        if workers > 1:
+            pool = multiprocessing.Pool(
+                workers, initializer=_init_worker, initargs=(self,))
+
+            def run(work):
+                return pool.imap(_generate_block, work)
+        else:
+            pool = None
+
+            def run(work):
+                return (self.generate_block(*unit) for unit in work)
+
+        def estimate_coverage(count):
+            if self.distinguished_bits:
+                # average length of the chains that found a distinguished point
+                average = state.points / max(1, state.chains)
+                self.coverage = points_coverage(keyspace.size, count * average)
+            else:
+                # the chains stored have distinct endpoints, so they never
+                # merge, whether or not the table was built perfect; the
+                # points of the chains dropped on collisions are not counted
+                self.coverage = perfect_coverage(
+                    keyspace.size, count, self.chain_length)
+
+        stats = self.stats
+        first_round_end = -(-self.number_of_chains // GENERATION_BLOCK_SIZE)
+
         # Open the file to log hashed passwords
-        with open("hash.txt", "w") as file:
-            for _ in range(self.number_of_chains):
-                # Generate a random password of allowed length
-                randomPassword = ''.join(random.choices(
-                    self.charset,
-                    k=random.randint(self.min_length, self.max_length))
-                )
-
-                # Generate the chain tail hash from the random password
-                chainTail = self.generate_chain(randomPassword)
-                
-                # Check for collisions
-                if chainTail in self.table:
-                    collisions += 1
-                self.table[chainTail] = randomPassword
-                self.tree.insert(chainTail, randomPassword)  # Insert into GomuhryTree
-                
-                # Write the password and its final hash to the file
-                file.write(f"{randomPassword} -> {chainTail.hex()}\n")
-    
-        logging.debug("Collisions detected: " + str(collisions))
+        try:
+            with open("hash.txt", "a" if resume else "w") as file:
+                if resume and file.tell() > state.log_offset:
+                    # chains logged after the last checkpoint are built again
+                    file.truncate(state.log_offset)
+                while True:
+                    work = [(block, self._block_size(block), seed)
+                            for block in range(state.next_block, state.round_end)]
+                    segment_block = state.next_block
+                    for (block, count, _), chains in zip(
+                            work, timed(run(work), stats, "chain_stepping")):
+                        sequence = block * GENERATION_BLOCK_SIZE
+                        points = state.points
+                        with phase(stats, "index_insert"):
+                            for n, (randomPassword, chainTail, length) in enumerate(chains):
+                                sorter.add(chainTail, sequence + n,
+                                           keyspace.rank(randomPassword))
+                                state.points += length
+
+                        # Write the passwords and their final hashes to the file
+                        with phase(stats, "io"):
+                            file.writelines(f"{randomPassword} -> {chainTail.hex()}\n"
+                                            for randomPassword, chainTail, _ in chains)
+                        state.chains += len(chains)
+                        state.generated += count
+                        state.next_block = block + 1
+                        if stats is not None:
+                            # chains dropped without a distinguished point
+                            # went through every column
+                            steps = state.points - points + \
+                                (count - len(chains)) * self.chain_length
+                            stats.count("hash_calls", steps)
+                            stats.count("reduce_calls", steps - count)
+                            stats.count("index_inserts", len(chains))
+                            stats.progress(state.generated, self.number_of_chains + max(
+                                0, state.round_end - first_round_end) * GENERATION_BLOCK_SIZE,
+                                "chains")
+                        if sorter.full() or ckpt is not None and (
+                                state.next_block - segment_block >= checkpoint_interval
+                                or state.next_block == state.round_end):
+                            with phase(stats, "io"):
+                                file.flush()
+                                state.log_offset = file.tell()
+                                sorter.spill(segment_block)
+                            segment_block = state.next_block
+                    if not self.perfect:
+                        break
+
+                    # Top up with enough blocks for the missing endpoints,
+                    # at the rate observed so far
+                    unique = sorter.count_unique()
+                    missing = self.number_of_chains - unique
+                    if missing <= 0:
+                        break
+                    if unique == state.unique:
+                        logging.warning("No new endpoint found, the keyspace is exhausted")
+                        break
+                    state.unique = unique
+                    rate = state.unique / state.generated
+                    state.round_end += -(-missing // max(1, int(rate * GENERATION_BLOCK_SIZE)))
+
+            # Merge the runs, colliding chains keep the last start point,
+            # or the first one in a perfect table
+            records = sorter.unique(
+                keep_first=self.perfect,
+                limit=self.number_of_chains if self.perfect else None)
+            with phase(stats, "io" if output is not None else "index_insert"):
+                if output is None:
+                    self.table = EndpointIndex.from_sorted(
+                        records, key_size, index_size, keyspace)
+                    estimate_coverage(len(self.table))
+                else:
+                    def update(header):
+                        estimate_coverage(header.record_count)
+                        header.metadata = self.header(header.record_count).metadata
+
+                    # write aside then rename, a previous table may be mapped
+                    temporary = output + ".tmp"
+                    write_table(temporary, self.header(0, compact, bloom), records, update)
+                    os.replace(temporary, output)
+                    self.table = open_table(output, lambda header: keyspace)[1]
+            if stats is not None:
+                stats.count("collisions", state.chains - len(self.table))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            sorter.close()
+            if ckpt is not None:
+                ckpt.close()
+
+        logging.debug("Collisions detected: " + str(state.chains - len(self.table)))
+        logging.debug("Chains generated: " + str(state.generated))
+        logging.debug("Estimated coverage: " + str(self.coverage))
+    def estimated_coverage(self):
+        '''Returns the coverage estimated at generation, or for tables
+        that did not record it, the coverage of their stored chains'''
+        if self.coverage is not None:
+            return self.coverage
+        return perfect_coverage(self.keyspace().size, len(self.table),
+                                self.chain_length)
     #karthik
-    def save_to_file(self, filename):
-        '''Writes this object on a file
+    def keyspace(self):
+        '''Returns the Keyspace numbering the start points of this table'''
+        if not hasattr(self, '_keyspace'):
+            self._keyspace = table_keyspace(self.charset, self.min_length,
+                                            self.max_length, self.masks)
+        return self._keyspace
+
+    def header(self, record_count, compact=False, bloom=None):
+        '''Returns the TableHeader describing this table, with the layout
+        of a compact table file if compact is true (see tablefile.py)
+
+        Arguments:
+            record_count {int} -- number of records written
+            compact {bool} -- describe a compact table file (default: {False})
+            bloom {float} -- false positive rate of the Bloom filter stored
+                with the records, 0 for none; that of the filter of the
+                table, if any, when None (default: {None})
+        '''
+        header = TableHeader(
+            self.algorithm.value, self.charset, self.min_length,
+            self.max_length, self.chain_length, self.number_of_chains,
+            record_count, self.digest_size(),
+            self.keyspace().index_size(),
+            {name: getattr(self, name) for name in self.METADATA
+             if getattr(self, name) is not None}
+        )
+        if compact:
+            if isinstance(self.table, CompactEndpointIndex):
+                # truncated endpoints are kept as they are
+                header.compact = {"key_bits": self.table.key_bits,
+                                  "block_records": self.table.block_records}
+            else:
+                header.compact = compact_layout(self.number_of_chains, self.digest_size())
+        if bloom is None:
+            bloom = getattr(getattr(self.table, 'bloom', None), 'fpr', None)
+        if bloom:
+            header.bloom = {"fpr": bloom}
+        return header
+
+    def records(self):
+        '''Yields the (endpoint, start index) pairs of the table, sorted by
+        endpoint'''
+        if isinstance(self.table, (EndpointIndex, CompactEndpointIndex)):
+            yield from self.table.records()
+            return
+        keyspace = self.keyspace()
+        for endpoint in sorted(self.table):
+            yield endpoint, keyspace.rank(self.table[endpoint])
+
+    def save_to_file(self, filename, compact=None, bloom=None):
+        '''Writes this table on a file, in the binary table format
+        (see tablefile.py)
         
         Arguments:
             filename {string} -- output file path
+            compact {bool} -- write a compact table, with truncated
+                delta-coded endpoints; the layout of the table if None
+                (default: {None})
+            bloom {float} -- false positive rate of a Bloom filter of the
+                endpoints written with the table, 0 for none; the filter
+                of the table is kept if None (default: {None})
+
+        Raises:
+            ValueError -- if the truncated endpoints of a compact table
+                would have to be written in full
         
         Returns:
             bool -- true if success
         '''
         if filename is None:
             return False
-        with open(filename, "wb") as fd:
-            if fd.write(pickle.dumps(self)) > 0:
-                return True
+        if compact is None:
+            compact = isinstance(self.table, CompactEndpointIndex)
+        elif not compact and isinstance(self.table, CompactEndpointIndex):
+            raise ValueError("A compact table only holds truncated endpoints")
+        # write aside then rename, the table may be mapped from filename
+        temporary = filename + ".tmp"
+        if write_table(temporary, self.header(len(self.table), compact, bloom),
+                       self.records()) > 0:
+            os.replace(temporary, filename)
+            return True
         return False
 
+    @classmethod
+    def from_header(cls, header, table):
+        '''Builds a table from the parameters stored in a table file,
+        without reading config.ini
+
+        Arguments:
+            header {TableHeader} -- table parameters
+            table {Mapping} -- endpoint -> start password mapping
+
+        Returns:
+            RainbowTable -- the table
+        '''
+        rt = cls.__new__(cls)
+        rt.config = None
+        rt.algorithm = Algorithm(header.algorithm)
+        rt.charset = header.charset
+        rt.min_length = header.min_length
+        rt.max_length = header.max_length
+        rt.chain_length = header.chain_length
+        rt.number_of_chains = header.number_of_chains
+        rt.table = table
+        rt.bind_backend()
+        for name in cls.METADATA:
+            if name in header.metadata:
+                setattr(rt, name, header.metadata[name])
+        return rt
+
     @staticmethod
     def load_from_file(filename):
-        '''Loads a RainbowObject previously generated
+        '''Loads a RainbowObject previously generated. Binary table files
+        are memory-mapped, legacy pickled tables are unpickled.
         
         Arguments:
             filename {string} -- input file path
@@ -245,6 +843,13 @@ class RainbowTable:
         Returns:
             RainbowTable -- the loaded object
         '''
+        if is_table_file(filename):
+            header, table = open_table(
+                filename,
+                lambda h: table_keyspace(h.charset, h.min_length, h.max_length,
+                                         h.metadata.get('masks'))
+            )
+            return RainbowTable.from_header(header, table)
         with open(filename, 'rb') as inputFile:
             objectLoaded = pickle.load(inputFile)
         if not isinstance(objectLoaded, RainbowTable):
@@ -252,34 +857,506 @@ class RainbowTable:
                              " does not contain a valid table")
         return objectLoaded
 
+    def walk_columns(self, hash_to_crack, first, stop):
+        '''Computes the endpoints of the chains that would contain the hash
+        at the columns first to stop - 1. The walks are stepped together:
+        at round j every walk started at a column <= j goes through the
+        reduce function of column j. In distinguished point mode a walk
+        stops at its first distinguished hash, and has no endpoint if it
+        finds none.
+
+        Arguments:
+            hash_to_crack {bytes} -- hash to look up
+            first {int} -- first column
+            stop {int} -- column after the last one
+
+        Returns:
+            list -- endpoints of the columns first to stop - 1, None for
+                no endpoint
+        '''
+        count = stop - first
+        endpoints = [hash_to_crack] * count
+        steps = 0
+        if not self.distinguished_bits:
+            for j in range(first, self.chain_length - 1):
+                live = min(j + 1, stop) - first
+                endpoints[:live] = self.step_many(endpoints[:live], j)
+                steps += live
+            self._count_steps(steps)
+            return endpoints
+        ended = [self.is_distinguished(hash_to_crack)] * count
+        for j in range(first, self.chain_length - 1):
+            live = [k for k in range(min(j + 1, stop) - first) if not ended[k]]
+            if not live and j + 1 >= stop:
+                break
+            stepped = self.step_many([endpoints[k] for k in live], j)
+            steps += len(live)
+            for k, hashed in zip(live, stepped):
+                endpoints[k] = hashed
+                ended[k] = self.is_distinguished(hashed)
+        self._count_steps(steps)
+        return [endpoint if end else None
+                for endpoint, end in zip(endpoints, ended)]
+
+    def _count_steps(self, reduces, hashes=None):
+        '''Counts reduce and hash calls in the stats, if any; as many hashes
+        as reduces if hashes is None'''
+        if self.stats is not None:
+            self.stats.count("reduce_calls", reduces)
+            self.stats.count("hash_calls", reduces if hashes is None else hashes)
+
+    def walk_parameters(self):
+        '''Returns a string identifying everything the column walks of a
+        hash depend on; tables sharing it can share their walks'''
+        parameters = [self.algorithm.name, self.charset, self.min_length,
+                      self.max_length, self.chain_length, self.distinguished_bits]
+        if self.table_index or self.reduce_version != 1:
+            parameters.append(self.table_index)
+        if self.reduce_version != 1:
+            parameters.append(self.reduce_version)
+        if self.masks:
+            parameters.append(self.masks)
+        return json.dumps(parameters)
+
+    def _cached_walk(self, hash_to_crack):
+        '''Returns the column endpoints of a hash from the walk cache, or
+        None if there is no cache or the walk is not in it'''
+        if self.walk_cache is None:
+            return None
+        endpoints = self.walk_cache.get(
+            self.walk_parameters(), hash_to_crack, len(hash_to_crack))
+        if endpoints is None:
+            return None
+        # columns without endpoint are cached as a zero hash
+        empty = bytes(len(hash_to_crack))
+        return [None if endpoint == empty else endpoint for endpoint in endpoints]
+
+    def _store_walk(self, hash_to_crack, endpoints):
+        '''Stores the column endpoints of a hash in the walk cache, if any'''
+        if self.walk_cache is None:
+            return
+        empty = bytes(len(hash_to_crack))
+        self.walk_cache.put(self.walk_parameters(), hash_to_crack,
+                            [empty if endpoint is None else endpoint
+                             for endpoint in endpoints])
+
     def lookup(self, hash_to_crack):
-        hash_to_crack = bytes.fromhex(hash_to_crack)
-        result = self.tree.search(hash_to_crack)
-        if result is not None:
-            print("First chain matched: " + result + " --> " + hash_to_crack.hex())
-            return self.crack(result, hash_to_crack)
+        '''Cracks a hash (see lookup_detailed)
 
-        
-        for i in range(self.chain_length-1, -1, -1):
-            hashtemp = hash_to_crack
-            for j in range(i, self.chain_length):
-                reduced = self.reduce_function(hashtemp, j)
-                hashtemp = self.hash_function(reduced)
-                if hashtemp in self.table:
-                    print(
-                        "Cracked! Found password: " + self.table[hashtemp] + 
-                        " | Step: " + str(i)
-                    )
-                    return self.crack(self.table[hashtemp], hash_to_crack)
-        return None
+        Arguments:
+            hash_to_crack {string} -- hexadecimal hash to crack
+
+        Returns:
+            string -- the password, or None
+        '''
+        return self.lookup_detailed(hash_to_crack).password
+
+    def lookup_detailed(self, hash_to_crack, workers=1):
+        '''Cracks a hash, walking the columns from the last one (the
+        cheapest) to the first, LOOKUP_COLUMN_GROUP columns at a time.
+        Every endpoint hit is checked by regenerating its chain up to the
+        hit column only; false alarms are counted and the lookup goes on
+        until a true match or the first column.
+
+        With workers > 1 the columns are split into ranges of similar cost
+        (see column_ranges), looked up by a process pool; the first
+        confirmed match cancels the ranges left.
+
+        Arguments:
+            hash_to_crack {string} -- hexadecimal hash to crack
+            workers {int} -- number of processes to use (default: {1})
+
+        Returns:
+            LookupResult -- the password (or None) and the lookup counters
+        '''
+        result = LookupResult()
+        target = bytes.fromhex(hash_to_crack)
+        if len(target) != self.digest_size():
+            return result
+        cached = self._cached_walk(target)
+        if workers > 1 and cached is None:
+            return self._lookup_parallel(target, workers)
+        walked = []
+        self.lookup_columns(target, 0, self.chain_length, result, cached, walked)
+        if cached is None and result.password is None:
+            self._store_walk(target, walked)
+        self._count_lookup(result)
+        return result
+
+    def _count_lookup(self, result):
+        '''Adds the counters and times of a lookup to the stats, if any'''
+        if self.stats is None:
+            return
+        self.stats.count("index_probes", result.index_probes)
+        self.stats.count("endpoint_hits", result.endpoint_hits)
+        self.stats.count("false_alarms", result.false_alarms)
+        self.stats.count("cracked", result.password is not None)
+        self.stats.add_time("walk", result.walk_seconds)
+        self.stats.add_time("check", result.check_seconds)
+
+    def lookup_columns(self, target, first, stop, result, cached=None, walked=None):
+        '''Looks a hash up in the columns first to stop - 1, from the last
+        one down, LOOKUP_COLUMN_GROUP columns at a time (see lookup_detailed)
+
+        Arguments:
+            target {bytes} -- hash to crack
+            first {int} -- first column
+            stop {int} -- column after the last one
+            result {LookupResult} -- receives the password and the counters
+            cached {list} -- endpoints of every column, walked if None
+                (default: {None})
+            walked {list} -- receives the endpoints walked, from column
+                first, unless the hash is cracked (default: {None})
+        '''
+        for group_stop in range(stop, first, -LOOKUP_COLUMN_GROUP):
+            group_first = max(first, group_stop - LOOKUP_COLUMN_GROUP)
+            walk_start = time.perf_counter()
+            if cached is not None:
+                endpoints = cached[group_first:group_stop]
+            else:
+                endpoints = self.walk_columns(target, group_first, group_stop)
+                if walked is not None:
+                    walked[:0] = endpoints
+            result.walk_seconds += time.perf_counter() - walk_start
+            result.columns_walked += group_stop - group_first
+
+            for column in range(group_stop - 1, group_first - 1, -1):
+                endpoint = endpoints[column - group_first]
+                if endpoint is None:
+                    continue
+                result.index_probes += 1
+                start = self.table.get(endpoint)
+                if start is None:
+                    continue
+                result.endpoint_hits += 1
+                check_start = time.perf_counter()
+                password = self.regenerate(start, target, column)
+                if password is not None:
+                    result.password = password
+                    result.column = column
+                    result.check_seconds += time.perf_counter() - check_start
+                    return
+                result.false_alarms += 1
+                result.false_alarm_seconds += time.perf_counter() - check_start
+                result.check_seconds += time.perf_counter() - check_start
+
+    def column_ranges(self, parts):
+        '''Splits the columns into about parts ranges of similar lookup
+        cost, walking a hash from column c costing chain_length - c steps
+
+        Arguments:
+            parts {int} -- number of ranges wanted
+
+        Returns:
+            list -- (first, stop) column ranges, from the last columns down
+        '''
+        total = self.chain_length * (self.chain_length + 1) // 2
+        share = max(1, -(-total // parts))
+        ranges = []
+        stop = self.chain_length
+        cost = 0
+        for column in range(self.chain_length - 1, -1, -1):
+            cost += self.chain_length - column
+            if cost >= share or column == 0:
+                ranges.append((column, stop))
+                stop = column
+                cost = 0
+        return ranges
+
+    def _lookup_parallel(self, target, workers):
+        '''Looks a hash up with a process pool, one task per column range;
+        the table reaches the workers through _init_worker, memory-mapped
+        tables being mapped again rather than copied'''
+        result = LookupResult()
+        walks = {}
+        work = [(target, first, stop, self.stats is not None)
+                for first, stop in self.column_ranges(workers * LOOKUP_TASKS_PER_WORKER)]
+        pool = multiprocessing.Pool(
+            workers, initializer=_init_worker, initargs=(self,))
+        try:
+            for first, partial, walked, stats in pool.imap_unordered(_lookup_columns, work):
+                result.add(partial)
+                walks[first] = walked
+                if stats is not None:
+                    # the lookup counters are added below, from the result
+                    self._count_steps(stats["counters"]["reduce_calls"],
+                                      stats["counters"]["hash_calls"])
+                if partial.password is not None:
+                    # the first confirmed match cancels the other ranges
+                    break
+        finally:
+            pool.terminate()
+            pool.join()
+        if result.password is None:
+            self._store_walk(target, [endpoint for first in sorted(walks)
+                                      for endpoint in walks[first]])
+        self._count_lookup(result)
+        return result
+
+    def step_many(self, hashes, column):
+        '''Advances many chains by one column: reduces every hash with the
+        reduce function of the column, then hashes the result
+
+        Arguments:
+            hashes {list} -- hashes sitting at the given column
+            column {int} -- column of the hashes
+
+        Returns:
+            list -- the hashes of the next column
+        '''
+        kernel = self.kernel()
+        if kernel is not None:
+            return kernel.step_many(hashes, column)
+        return self.hash_many([self.reduce_function(hashed, column)
+                               for hashed in hashes])
+
+    def walk_many(self, hashes, column):
+        '''Returns the endpoints of the chains that would contain the given
+        hashes at the given column, None where a distinguished point walk
+        finds no endpoint'''
+        if not self.distinguished_bits:
+            for j in range(column, self.chain_length - 1):
+                hashes = self.step_many(hashes, j)
+            self._count_steps(len(hashes) * max(0, self.chain_length - 1 - column))
+            return list(hashes)
+        endpoints = [None] * len(hashes)
+        live = []
+        for n, hashed in enumerate(hashes):
+            if self.is_distinguished(hashed):
+                endpoints[n] = hashed
+            else:
+                live.append(n)
+        hashes = list(hashes)
+        steps = 0
+        for j in range(column, self.chain_length - 1):
+            if not live:
+                break
+            stepped = self.step_many([hashes[n] for n in live], j)
+            steps += len(live)
+            still_live = []
+            for n, hashed in zip(live, stepped):
+                if self.is_distinguished(hashed):
+                    endpoints[n] = hashed
+                else:
+                    hashes[n] = hashed
+                    still_live.append(n)
+            live = still_live
+        self._count_steps(steps)
+        return endpoints
+
+    def walk(self, hashed, column):
+        '''Returns the endpoint of the chain that would contain the given
+        hash at the given column'''
+        return self.walk_many([hashed], column)[0]
+
+    def lookup_many(self, hashes, workers=1):
+        '''Cracks many hashes in one pass over the columns. For every
+        column, all the hashes still unresolved are walked to their
+        endpoint together, then the endpoints are probed in sorted order.
+        With a walk_cache, cached walks are only probed, and the walks of
+        the hashes left uncracked are stored for the next tables.
+
+        With workers > 1 the hashes are split among a process pool, each
+        worker cracking its share in one pass.
+
+        Arguments:
+            hashes {iterable} -- hexadecimal hashes to crack
+            workers {int} -- number of processes to use (default: {1})
+
+        Yields:
+            tuple -- (hash, password) as soon as a hash is cracked, then
+                (hash, None) for every hash left uncracked; with workers,
+                results come per share of hashes
+        '''
+        if workers > 1:
+            yield from self._lookup_many_parallel(hashes, workers)
+            return
+        pending = {}
+        digest_size = self.digest_size()
+        for hash_to_crack in hashes:
+            target = bytes.fromhex(hash_to_crack)
+            if len(target) != digest_size:
+                # cannot be a hash of this table
+                yield hash_to_crack, None
+                continue
+            pending.setdefault(target, hash_to_crack)
+
+        # walks already known from the cache, and walks computed here
+        cached = {}
+        walks = {}
+        if self.walk_cache is not None:
+            for target in pending:
+                endpoints = self._cached_walk(target)
+                if endpoints is not None:
+                    cached[target] = endpoints
+                else:
+                    walks[target] = [None] * self.chain_length
+
+        stats = self.stats
+        started = time.perf_counter()
+        for column in range(self.chain_length - 1, -1, -1):
+            if not pending:
+                break
+            with phase(stats, "walk"):
+                targets = [target for target in pending if target not in cached]
+                endpoints = self.walk_many(targets, column)
+            probes = list(zip(endpoints, targets))
+            for endpoint, target in probes:
+                if target in walks:
+                    walks[target][column] = endpoint
+            probes += [(cached[target][column], target)
+                       for target in pending if target in cached]
+            probes = sorted(probe for probe in probes if probe[0] is not None)
+            hits = cracked = 0
+            probe_start = time.perf_counter()
+            for endpoint, target in probes:
+                start = self.table.get(endpoint)
+                if start is None:
+                    continue
+                hits += 1
+                password = self.regenerate(start, target, column)
+                if password is not None:
+                    cracked += 1
+                    yield pending.pop(target), password
+            if stats is not None:
+                # includes the time the caller spends on the yielded results
+                stats.add_time("probe", time.perf_counter() - probe_start)
+                stats.count("index_probes", len(probes))
+                stats.count("endpoint_hits", hits)
+                stats.count("false_alarms", hits - cracked)
+                stats.count("cracked", cracked)
+                # walking from column c costs chain_length - c steps
+                done = self.chain_length - column
+                stats.progress(done, self.chain_length, "columns", started,
+                               done * (done + 1) / (self.chain_length * (self.chain_length + 1)))
+
+        if self.walk_cache is not None:
+            # uncracked hashes have been walked through every column
+            for target in pending:
+                if target in walks:
+                    self._store_walk(target, walks[target])
+            self.walk_cache.commit()
+        for hash_to_crack in pending.values():
+            yield hash_to_crack, None
+
+    def _lookup_many_parallel(self, hashes, workers):
+        '''Splits the hashes among a process pool (see lookup_many). The
+        workers get the cached walks of their hashes and send back the
+        walks they compute, which are stored in the walk_cache here.'''
+        pending = {}
+        digest_size = self.digest_size()
+        for hash_to_crack in hashes:
+            target = bytes.fromhex(hash_to_crack)
+            if len(target) != digest_size:
+                yield hash_to_crack, None
+                continue
+            pending.setdefault(target, hash_to_crack)
+        if not pending:
+            return
+
+        parameters = self.walk_parameters()
+        targets = list(pending.values())
+        size = -(-len(targets) // (workers * LOOKUP_TASKS_PER_WORKER))
+        work = []
+        for start in range(0, len(targets), size):
+            share = targets[start:start + size]
+            walks = None
+            if self.walk_cache is not None:
+                walks = {}
+                for hash_to_crack in share:
+                    target = bytes.fromhex(hash_to_crack)
+                    endpoints = self.walk_cache.get(parameters, target, digest_size)
+                    if endpoints is not None:
+                        walks[target] = endpoints
+            work.append((share, walks, self.stats is not None))
+
+        pool = multiprocessing.Pool(
+            workers, initializer=_init_worker, initargs=(self,))
+        try:
+            for results, walks, stats in pool.imap_unordered(_lookup_hashes, work):
+                for target, endpoints in walks.items():
+                    self.walk_cache.put(parameters, target, endpoints)
+                if stats is not None:
+                    self.stats.merge(stats)
+                yield from results
+        finally:
+            pool.terminate()
+            pool.join()
+            if self.walk_cache is not None:
+                self.walk_cache.commit()
 
     def crack(self, password, hash_to_crack):
         '''Attempts to crack the hash with a known starting password'''
         print(f"Attempting to crack {hash_to_crack.hex()} starting with {password}")
+        return self.regenerate(password, hash_to_crack)
+
+    def regenerate(self, password, hash_to_crack, column=None):
+        '''Walks the chain of a starting password looking for the hash
+
+        Arguments:
+            password {string} -- start point of the chain
+            hash_to_crack {bytes} -- hash looked up
+            column {int} -- column where the hash should be; when None, every
+                column is checked (default: {None})
+
+        Returns:
+            string -- the password hashing to hash_to_crack, or None on a
+                false alarm
+        '''
         reduced = password
+        if column is not None:
+            hashed = self.hash_function(reduced)
+            for i in range(column):
+                if self.distinguished_bits and self.is_distinguished(hashed):
+                    # the chain ends before the column
+                    self._count_steps(i, i + 1)
+                    return None
+                reduced = self.reduce_function(hashed, i)
+                hashed = self.hash_function(reduced)
+            self._count_steps(column, column + 1)
+            return reduced if hashed == hash_to_crack else None
+
         for i in range(self.chain_length):
             hashed = self.hash_function(reduced)
             if hashed == hash_to_crack:
+                self._count_steps(i, i + 1)
                 return reduced
+            if self.distinguished_bits and self.is_distinguished(hashed):
+                # end of a distinguished point chain
+                self._count_steps(i, i + 1)
+                return None
             reduced = self.reduce_function(hashed, i)
+        self._count_steps(self.chain_length)
         return None
+
+
+class LookupResult:
+    '''Outcome and cost counters of one lookup'''
+
+    def __init__(self):
+        self.password = None
+        # column of the hash in the matching chain
+        self.column = None
+        self.columns_walked = 0
+        self.index_probes = 0
+        self.endpoint_hits = 0
+        self.false_alarms = 0
+        self.walk_seconds = 0.0
+        self.check_seconds = 0.0
+        self.false_alarm_seconds = 0.0
+
+    def add(self, other):
+        '''Adds the counters of a partial lookup, and its password if any'''
+        if other.password is not None:
+            self.password = other.password
+            self.column = other.column
+        self.columns_walked += other.columns_walked
+        self.index_probes += other.index_probes
+        self.endpoint_hits += other.endpoint_hits
+        self.false_alarms += other.false_alarms
+        self.walk_seconds += other.walk_seconds
+        self.check_seconds += other.check_seconds
+        self.false_alarm_seconds += other.false_alarm_seconds
+
+    def as_dict(self):
+        return dict(self.__dict__)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import argparse
+import json
+import time
+from constants import SELF_TEST_HASHES, VERIFY_SAMPLES
+from rainbowtable import RainbowTable
+from tablefile import is_table_file, read_header
+from tableverify import check_chains, check_checksums, check_header, self_test
+
+# problems of a kind listed, the others are counted
+LISTED = 10
+
+
+def print_problems(problems):
+    for problem in problems[:LISTED]:
+        print(f"[-] {problem}")
+    if len(problems) > LISTED:
+        print(f"[-] ... and {len(problems) - LISTED} more")
+
+
+def milliseconds(seconds):
+    return f"{seconds * 1000:.1f} ms"
+
+
+def print_times(name, times):
+    if times is not None:
+        print(f"    {name}: median {milliseconds(times['p50'])}, "
+              f"90% {milliseconds(times['p90'])}, 99% {milliseconds(times['p99'])}, "
+              f"max {milliseconds(times['max'])}")
+
+
+def main():
+    try:
+        parser = argparse.ArgumentParser(
+            description="Verifies a table: header consistency, checksums, a sample of "
+                        "chains recomputed, and a self-test of its coverage"
+        )
+        parser.add_argument("table_file", help="table to verify")
+        parser.add_argument("--samples", type=int, default=VERIFY_SAMPLES,
+                            help="chains recomputed, 0 to skip (default: %(default)s)")
+        parser.add_argument("--self-test", type=int, default=SELF_TEST_HASHES,
+                            help="hashes of random passwords cracked, 0 to skip "
+                                 "(default: %(default)s)")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="processes recomputing chains and cracking hashes")
+        parser.add_argument("--seed", type=int, help="seed of the samples")
+        parser.add_argument("--report", help="write the results as JSON to this file")
+        args = parser.parse_args()
+
+        if not os.path.exists(args.table_file):
+            print(f"\n[-] Error: Rainbow table file '{args.table_file}' not found.")
+            sys.exit(1)
+
+        report = {"table": args.table_file}
+        failed = False
+        binary = is_table_file(args.table_file)
+        if binary:
+            header = read_header(args.table_file)
+        print("\n[+] Opening rainbow table...")
+        try:
+            rt = RainbowTable.load_from_file(args.table_file)
+        except ValueError as e:
+            print(f"\n[-] The table cannot be opened: {str(e)}")
+            sys.exit(1)
+        print(f"    {len(rt.table)} chains of length {rt.chain_length}, "
+              f"{rt.algorithm.name}, reduce version {rt.reduce_version}")
+
+        if binary:
+            print("\n[+] Checking header...")
+            problems = check_header(header, rt, os.path.getsize(args.table_file))
+            report["header_problems"] = problems
+            print_problems(problems)
+            if not problems:
+                print("    Header consistent")
+            failed |= bool(problems)
+
+            print("\n[+] Checking checksums...")
+            start_time = time.time()
+            bad = check_checksums(args.table_file, header)
+            report["bad_checksum_blocks"] = bad
+            if bad is None:
+                print("    No checksums: the file was written by an older version, "
+                      "rainbowconvert.py adds them")
+            elif bad:
+                block_size = header.checksums['block_size']
+                ranges = [(header.data_offset + block * block_size,
+                           min(header.data_offset + (block + 1) * block_size,
+                               header.data_end()) - 1) for block in bad]
+                print_problems([f"Checksum mismatch in bytes {first} to {last}"
+                                for first, last in ranges])
+                failed = True
+            else:
+                print(f"    {header.checksums['blocks']} checksum blocks checked "
+                      f"in {time.time() - start_time:.2f} seconds")
+        else:
+            print("\n[-] Pickled table: no header or checksums to check")
+
+        if args.samples > 0:
+            print(f"\n[+] Recomputing {min(args.samples, len(rt.table))} chains...")
+            start_time = time.time()
+            chains = check_chains(rt, args.samples, args.workers, args.seed)
+            report["chains"] = chains
+            print_problems([f"The chain of record {position}, from '{password}', "
+                            f"does not end in its endpoint"
+                            for position, password in chains["mismatches"]])
+            print_problems([f"Record {position} is not found by its endpoint"
+                            for position in chains["unsearchable"]])
+            if chains["mismatches"] or chains["unsearchable"]:
+                failed = True
+            else:
+                print(f"    {chains['checked']} chains checked "
+                      f"in {time.time() - start_time:.2f} seconds")
+
+        if args.self_test > 0:
+            print(f"\n[+] Cracking {args.self_test} random hashes...")
+            result = self_test(rt, args.self_test, args.workers, args.seed)
+            report["self_test"] = result
+            print(f"    {result['cracked']} cracked: success rate {result['success']:.2%}, "
+                  f"expected {result['expected_success']:.2%}")
+            print_times("Lookup time", result["lookup_seconds"])
+            print_times("Cracked", result["hit_seconds"])
+            print_times("Not cracked", result["miss_seconds"])
+            if result["mean_miss_seconds"] is not None:
+                print(f"    Not cracked on average: {result['mean_miss_steps']:.0f} steps "
+                      f"in {milliseconds(result['mean_miss_seconds'])}")
+            if result["expected_miss_steps"] is not None:
+                print(f"    Expected: {result['expected_miss_steps']:.0f} steps, hashed "
+                      f"in {milliseconds(result['expected_miss_seconds'])} at least")
+            if not result["passed"]:
+                print("[-] The success rate is well below the coverage of the table")
+                failed = True
+
+        report["passed"] = not failed
+        if args.report:
+            with open(args.report, "w") as fd:
+                json.dump(report, fd, indent=2)
+        print("\n[-] Verification failed" if failed else "\n[+] Verification passed")
+        sys.exit(1 if failed else 0)
+
+    except Exception as e:
+        print(f"\n[-] Error: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+'''Sharded tables: the chains of one table split by endpoint prefix into
+several shard files, described by a JSON manifest.
+
+Every shard holds a contiguous range of the sorted endpoints, about the
+same number of chains each. The manifest lists the shard files with the
+first 8-byte endpoint prefix of each, so the shard owning an endpoint is
+found by bisection without opening any shard. A node only maps the shards
+it serves.
+
+A lookup is coordinated from one process: the column endpoints of the
+hashes are computed once, from the table parameters stored in the
+manifest, and every probe is sent to the node serving the shard that owns
+its endpoint. The node looks the endpoint up and regenerates the chains
+it hits, so the probes, the index pages read and the false alarms are
+split among the nodes. LocalCluster runs the nodes as local processes.
+'''
+import bisect
+import json
+import multiprocessing
+import os
+import time
+
+from constants import LOOKUP_COLUMN_GROUP
+from rainbowtable import RainbowTable
+from stats import Stats, phase
+from tablefile import CompactEndpointIndex, TableHeader, write_table
+
+MANIFEST_FORMAT = "rainbow-shards"
+MANIFEST_VERSION = 1
+
+
+def shard_prefix(endpoint):
+    '''Returns the number the shards of an endpoint are looked up by'''
+    return int.from_bytes(endpoint[:8], 'big')
+
+
+def is_manifest(filename):
+    '''Tells whether a file is the manifest of a sharded table'''
+    if not filename.endswith(".json") or not os.path.isfile(filename):
+        return False
+    try:
+        with open(filename) as fd:
+            return json.load(fd).get("format") == MANIFEST_FORMAT
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def split_table(table, directory, shards, name="table"):
+    '''Splits a table into shard files and writes their manifest. The
+    records are streamed from the table into the shards, in endpoint order.
+
+    Arguments:
+        table {RainbowTable} -- table to split
+        directory {string} -- directory of the shard files and manifest
+        shards {int} -- number of shards; fewer are written if the table
+            has fewer chains
+        name {string} -- base name of the files (default: {"table"})
+
+    Raises:
+        ValueError -- if shards is not positive
+
+    Returns:
+        string -- path of the manifest, NAME.json
+    '''
+    if shards < 1:
+        raise ValueError("The number of shards must be at least 1")
+    os.makedirs(directory, exist_ok=True)
+    compact = isinstance(table.table, CompactEndpointIndex)
+    count = len(table.table)
+    records = iter(table.records())
+    pending = next(records, None)
+    written = 0
+    entries = []
+
+    def shard_records(limit):
+        # the chains of a shard: up to limit chains written in all, and
+        # the chains sharing the prefix of the last one
+        nonlocal pending, written
+        last = None
+        while pending is not None and (
+                written < limit or shard_prefix(pending[0]) == last):
+            last = shard_prefix(pending[0])
+            yield pending
+            written += 1
+            pending = next(records, None)
+
+    for number in range(shards):
+        if pending is None:
+            break
+        filename = f"{name}.shard{number}.rt"
+        first_prefix = 0 if number == 0 else shard_prefix(pending[0])
+        limit = (number + 1) * count // shards
+        header = table.header(0, compact)
+        header.metadata['shard'] = {"index": number, "shards": shards}
+        if header.bloom is not None:
+            # a filter of the shard chains only
+            header.bloom['capacity'] = limit - written
+        write_table(os.path.join(directory, filename), header,
+                    shard_records(limit), lambda header: None)
+        entries.append({"file": filename, "first_prefix": first_prefix,
+                        "records": header.record_count})
+
+    header = table.header(0)
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "version": MANIFEST_VERSION,
+        "table": {
+            "algorithm": header.algorithm,
+            "charset": header.charset,
+            "min_length": header.min_length,
+            "max_length": header.max_length,
+            "chain_length": header.chain_length,
+            "number_of_chains": header.number_of_chains,
+            "key_size": header.key_size,
+            "index_size": header.index_size,
+            "metadata": header.metadata,
+        },
+        "shards": entries,
+    }
+    path = os.path.join(directory, name + ".json")
+    with open(path, "w") as fd:
+        json.dump(manifest, fd, indent=2)
+    return path
+
+
+class ShardedTable:
+    '''Manifest of a sharded table: its parameters and shard files'''
+
+    def __init__(self, manifest, directory):
+        """ShardedTable constructor
+
+        Arguments:
+                manifest {dict} -- parsed manifest (see split_table)
+                directory {string} -- directory of the shard files
+        """
+        if manifest.get("format") != MANIFEST_FORMAT:
+            raise ValueError("Not a sharded table manifest")
+        if manifest.get("version", 0) > MANIFEST_VERSION:
+            raise ValueError("Unsupported manifest version " + str(manifest["version"]))
+        parameters = manifest["table"]
+        header = TableHeader(parameters["algorithm"], parameters["charset"],
+                             parameters["min_length"], parameters["max_length"],
+                             parameters["chain_length"], parameters["number_of_chains"],
+                             0, parameters["key_size"], parameters["index_size"],
+                             parameters["metadata"])
+        # the parameters only, to walk the columns of the hashes
+        self.table = RainbowTable.from_header(header, None)
+        self.files = [os.path.join(directory, shard["file"]) for shard in manifest["shards"]]
+        self.first_prefixes = [shard["first_prefix"] for shard in manifest["shards"]]
+        self.records = [shard["records"] for shard in manifest["shards"]]
+
+    @staticmethod
+    def load(filename):
+        '''Reads the manifest of a sharded table'''
+        with open(filename) as fd:
+            return ShardedTable(json.load(fd), os.path.dirname(os.path.abspath(filename)))
+
+    def __len__(self):
+        return sum(self.records)
+
+    def shard_of(self, endpoint):
+        '''Returns the number of the shard owning an endpoint'''
+        return bisect.bisect_right(self.first_prefixes, shard_prefix(endpoint)) - 1
+
+    def lookup_many(self, hashes, cluster):
+        '''Cracks many hashes with the nodes of a cluster, one group of
+        LOOKUP_COLUMN_GROUP columns at a time, from the last ones. The
+        column endpoints are computed here, every probe goes to the node
+        serving its shard, and the hashes cracked are dropped before the
+        next group.
+
+        When self.table.stats is set, the walks and the probes are timed
+        there, the probe time including the round trip to the nodes; the
+        nodes keep the counters of their own probes (see ShardNode).
+
+        Arguments:
+            hashes {iterable} -- hexadecimal hashes to crack
+            cluster {LocalCluster} -- nodes serving the shards
+
+        Yields:
+            tuple -- (hash, password) as soon as a hash is cracked, then
+                (hash, None) for every hash left uncracked
+        '''
+        table = self.table
+        pending = {}
+        for hash_to_crack in hashes:
+            target = bytes.fromhex(hash_to_crack)
+            if len(target) != table.digest_size():
+                yield hash_to_crack, None
+                continue
+            pending.setdefault(target, hash_to_crack)
+
+        stats = table.stats
+        started = time.perf_counter()
+        for group_stop in range(table.chain_length, 0, -LOOKUP_COLUMN_GROUP):
+            if not pending:
+                break
+            requests = [[] for _ in range(cluster.nodes)]
+            targets = list(pending)
+            group_start = max(0, group_stop - LOOKUP_COLUMN_GROUP)
+            with phase(stats, "walk"):
+                for column in range(group_stop - 1, group_start - 1, -1):
+                    for endpoint, target in zip(table.walk_many(targets, column), targets):
+                        if endpoint is not None:
+                            shard = self.shard_of(endpoint)
+                            requests[cluster.node_of(shard)].append(
+                                (shard, target, column, endpoint))
+            with phase(stats, "probe"):
+                cracked = cluster.probe(requests)
+            for target, password in cracked:
+                if target in pending:
+                    if stats is not None:
+                        stats.count("cracked")
+                    yield pending.pop(target), password
+            if stats is not None:
+                # walking from column c costs chain_length - c steps
+                done = table.chain_length - group_start
+                stats.progress(done, table.chain_length, "columns", started,
+                               done * (done + 1) / (table.chain_length * (table.chain_length + 1)))
+        for hash_to_crack in pending.values():
+            yield hash_to_crack, None
+
+
+class ShardNode:
+    '''Serves the probes of some shards of a sharded table'''
+
+    def __init__(self, files):
+        """ShardNode constructor
+
+        Arguments:
+                files {dict} -- shard number -> shard file
+        """
+        self.tables = {shard: RainbowTable.load_from_file(filename)
+                       for shard, filename in files.items()}
+        # probes, endpoint hits, false alarms and the steps of the chains checked
+        self.stats = Stats()
+        for table in self.tables.values():
+            table.stats = self.stats
+
+    def probe(self, requests):
+        '''Looks endpoints up in their shard and checks the chains hit
+
+        Arguments:
+            requests {list} -- (shard, hash, column, endpoint) probes
+
+        Returns:
+            list -- (hash, password) pairs of the hashes cracked
+        '''
+        cracked = []
+        hits = 0
+        for shard, target, column, endpoint in sorted(requests, key=lambda r: (r[0], r[3])):
+            table = self.tables[shard]
+            start = table.table.get(endpoint)
+            if start is None:
+                continue
+            hits += 1
+            password = table.regenerate(start, target, column)
+            if password is not None:
+                cracked.append((target, password))
+        self.stats.count("index_probes", len(requests))
+        self.stats.count("endpoint_hits", hits)
+        self.stats.count("false_alarms", hits - len(cracked))
+        return cracked
+
+    def counters(self):
+        '''Returns the probes, endpoint hits and false alarms served, and
+        the as_dict() of the node stats'''
+        counters = self.stats.counters
+        return {"shards": sorted(self.tables), "probes": counters["index_probes"],
+                "endpoint_hits": counters["endpoint_hits"],
+                "false_alarms": counters["false_alarms"], "stats": self.stats.as_dict()}
+
+
+def _serve_node(connection, files):
+    # node process: answers probe batches until a None request
+    node = ShardNode(files)
+    while True:
+        requests = connection.recv()
+        if requests is None:
+            connection.send(node.counters())
+            return
+        connection.send(node.probe(requests))
+
+
+class LocalCluster:
+    '''Stand-in for the nodes of a sharded table: one local process per
+    node, shard i being served by node i modulo the number of nodes'''
+
+    def __init__(self, sharded, nodes):
+        """LocalCluster constructor
+
+        Arguments:
+                sharded {ShardedTable} -- table whose shards are served
+                nodes {int} -- number of node processes, at most one per shard
+        """
+        self.nodes = max(1, min(nodes, len(sharded.files)))
+        self.connections = []
+        self.processes = []
+        self.counters = None
+        for node in range(self.nodes):
+            files = {shard: filename for shard, filename in enumerate(sharded.files)
+                     if self.node_of(shard) == node}
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve_node, args=(child, files),
+                                              daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def node_of(self, shard):
+        '''Returns the node serving a shard'''
+        return shard % self.nodes
+
+    def probe(self, requests):
+        '''Sends every node its probes, then gathers the hashes cracked
+
+        Arguments:
+            requests {list} -- probes of every node (see ShardNode.probe)
+
+        Returns:
+            list -- (hash, password) pairs
+        '''
+        busy = []
+        for connection, probes in zip(self.connections, requests):
+            if probes:
+                connection.send(probes)
+                busy.append(connection)
+        return [pair for connection in busy for pair in connection.recv()]
+
+    def close(self):
+        '''Stops the nodes, keeping their counters in self.counters'''
+        if self.counters is not None:
+            return
+        self.counters = []
+        for connection in self.connections:
+            connection.send(None)
+            self.counters.append(connection.recv())
+            connection.close()
+        for process in self.processes:
+            process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,211 @@
+'''Counters, phase timers and progress reports of a generation or a lookup.
+
+A Stats object counts the chain steps (hash_calls and reduce_calls) of
+the chains generated, of the walks through the columns of a hash and of
+the chains checked; the chains added to the table (index_inserts) and
+those dropped because their endpoint was already stored (collisions);
+the endpoints looked up (index_probes), those found (endpoint_hits) and
+those whose chain does not hold the hash (false_alarms); and the hashes
+cracked (cracked).
+
+It also adds up the seconds spent in each phase: chain_stepping,
+index_insert and io for a generation, and walk, probe and check for a
+lookup. Worker processes and shard nodes fill their own Stats, which are
+merged into the parent's. With a progress interval, progress() prints the
+rate and the time left at most that often.
+
+On the command line (see add_stats_arguments), --stats FILE writes
+as_dict() as JSON when the program exits, to stdout if FILE is "-":
+elapsed_seconds, then counters and phase_seconds, both keyed by name.
+--profile FILE runs the program under cProfile and dumps the profile to
+FILE when it exits.
+'''
+import atexit
+import cProfile
+import json
+import time
+from contextlib import nullcontext
+
+
+class Stats:
+    '''Counters and phase timers of a generation or a cracking run.
+
+    A table only updates its counters when its stats attribute is set, and
+    does so once per batch of chains or per column rather than per hash,
+    so runs without stats pay a single None check per batch.
+    '''
+    COUNTERS = ('hash_calls', 'reduce_calls', 'index_inserts', 'index_probes',
+                'endpoint_hits', 'false_alarms', 'collisions', 'cracked')
+
+    def __init__(self, progress_interval=None, report=print):
+        """Stats constructor
+
+        Arguments:
+                progress_interval {float} -- seconds between two progress
+                    lines, None for no progress line (default: {None})
+                report {function} -- prints a progress line (default: {print})
+        """
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.phases = {}
+        self.progress_interval = progress_interval
+        self.report = report
+        self.started = time.perf_counter()
+        self.last_progress = self.started
+
+    def count(self, name, n=1):
+        '''Adds n to a counter'''
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        '''Adds seconds to a phase'''
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def merge(self, other):
+        '''Adds the counters and phase times of another Stats, such as one
+        filled in a worker process
+
+        Arguments:
+            other {dict} -- as_dict() of the other Stats
+        '''
+        for name, n in other["counters"].items():
+            self.count(name, n)
+        for name, seconds in other["phase_seconds"].items():
+            self.add_time(name, seconds)
+
+    def progress(self, done, total, unit, since=None, fraction=None):
+        '''Reports the rate and the time left, at most every
+        progress_interval seconds
+
+        Arguments:
+            done {int} -- units done so far
+            total {int} -- units of the whole run
+            unit {string} -- name of the units, such as chains
+            since {float} -- perf_counter() time the units started, the
+                creation of the stats if None (default: {None})
+            fraction {float} -- part of the work done, when the units do
+                not all cost the same, done / total if None (default: {None})
+        '''
+        if self.progress_interval is None:
+            return
+        now = time.perf_counter()
+        if now - self.last_progress < self.progress_interval:
+            return
+        self.last_progress = now
+        elapsed = now - (self.started if since is None else since)
+        if fraction is None:
+            fraction = done / max(1, total)
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = format_seconds(elapsed * (1 - fraction) / fraction) if 0 < fraction <= 1 else "unknown"
+        self.report(f"    {done}/{total} {unit} ({fraction:.1%}), "
+                    f"{rate:.0f} {unit}/sec, ETA {eta}")
+
+    def as_dict(self):
+        '''Returns the counters, the phase times and the elapsed time'''
+        return {
+            "elapsed_seconds": time.perf_counter() - self.started,
+            "counters": dict(self.counters),
+            "phase_seconds": dict(self.phases),
+        }
+
+    def write(self, filename=None):
+        '''Writes the stats as JSON to a file, or prints them if filename
+        is None or "-"'''
+        encoded = json.dumps(self.as_dict(), indent=2)
+        if filename is None or filename == "-":
+            print(encoded)
+        else:
+            with open(filename, "w") as fd:
+                fd.write(encoded + "\n")
+
+
+class PhaseTimer:
+    '''Adds the time spent in a with block to a phase of a Stats'''
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def phase(stats, name):
+    '''Times a phase when stats is not None, does nothing otherwise'''
+    return nullcontext() if stats is None else PhaseTimer(stats, name)
+
+
+def timed(iterable, stats, name):
+    '''Iterates over iterable, adding the time spent producing every item
+    to a phase of stats when it is not None'''
+    if stats is None:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            stats.add_time(name, time.perf_counter() - start)
+            return
+        stats.add_time(name, time.perf_counter() - start)
+        yield item
+
+
+def format_seconds(seconds):
+    '''Formats a duration as 1h02m03s, 2m03s or 3s'''
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m{seconds:02d}s"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+def add_stats_arguments(parser):
+    '''Adds the --stats, --progress and --profile options to a command line parser'''
+    parser.add_argument("--stats", metavar="FILE",
+                        help="count hash and reduce calls, index probes, endpoint hits, false "
+                             "alarms and collisions, time the phases, and write them as JSON "
+                             "to FILE at the end, or print them if FILE is -")
+    parser.add_argument("--progress", type=float, metavar="SECONDS",
+                        help="print the rate and the time left every SECONDS seconds")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="run under cProfile and write the profile to FILE "
+                             "(read it with python3 -m pstats FILE)")
+
+
+def stats_from_arguments(args, report=print):
+    '''Starts the profiler and creates the Stats asked for on the command
+    line (see add_stats_arguments); the profile and the stats are written
+    when the program exits
+
+    Arguments:
+        args {Namespace} -- parsed command line
+        report {function} -- prints the progress lines (default: {print})
+
+    Returns:
+        Stats -- the stats to give the tables, or None
+    '''
+    if args.profile is not None:
+        profiler = cProfile.Profile()
+
+        def write_profile():
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"\n[+] Profile written to {args.profile}")
+        atexit.register(write_profile)
+        profiler.enable()
+    if args.stats is None and args.progress is None:
+        return None
+    stats = Stats(args.progress, report)
+    if args.stats is not None:
+        atexit.register(stats.write, args.stats)
+    return stats
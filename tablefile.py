@@ -0,0 +1,602 @@
+'''Binary on-disk rainbow table format.
+
+A table file is a fixed little-endian header, followed by the charset, a
+JSON object of extra metadata and then fixed-width records sorted by
+endpoint. Each record is the chain endpoint followed by the big-endian
+keyspace index of the chain start point, so records can be binary
+searched in place from a memory map without deserializing anything.
+
+Compact table files (format version 2) keep only the first key_bits bits
+of every endpoint, enough to tell the chains apart with a few false
+matches. The sorted keys are delta-coded (LEB128) in blocks of
+block_records records, each followed by its big-endian start index, and
+a sparse index of (first key, block offset) pairs after the blocks finds
+the one block a lookup has to decode.
+
+Either kind of file may end with a Bloom filter of its endpoints (see
+bloom.py), read into memory when the file is opened so that most probes
+of missing endpoints never touch the records. Readers that do not know
+it ignore it.
+
+Table files end with the CRC32 of every checksum block of the data after
+the header (records, sparse index and filter), so that a corrupt file can
+be told apart without generating its chains again (see tableverify.py).
+'''
+import bisect
+import itertools
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping
+
+from bloom import BloomFilter
+
+MAGIC = b"RBWT"
+FORMAT_VERSION = 2
+# version of fixed-width record files, readable by older versions
+FIXED_FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHBBBxHHIQQHIQ")
+DATA_ALIGNMENT = 64
+# records per delta-coded block of a compact table
+COMPACT_BLOCK_RECORDS = 64
+# endpoint bits kept beyond the number of chains: a probe of a compact
+# table falsely matches another chain with probability about 2^-12
+COMPACT_FALSE_MATCH_BITS = 12
+# bytes of data per CRC32 checksum
+CHECKSUM_BLOCK_SIZE = 1 << 20
+
+
+def is_table_file(filename):
+    '''Returns true if the file starts with the binary table magic'''
+    with open(filename, "rb") as fd:
+        return fd.read(len(MAGIC)) == MAGIC
+
+
+class TableHeader:
+    '''Parameters of a table, as stored at the start of a table file'''
+
+    def __init__(self, algorithm, charset, min_length, max_length,
+                 chain_length, number_of_chains, record_count,
+                 key_size, index_size, metadata=None, data_offset=0,
+                 compact=None, bloom=None, checksums=None):
+        self.algorithm = algorithm
+        self.charset = charset
+        self.min_length = min_length
+        self.max_length = max_length
+        self.chain_length = chain_length
+        self.number_of_chains = number_of_chains
+        self.record_count = record_count
+        self.key_size = key_size
+        self.index_size = index_size
+        self.metadata = metadata if metadata is not None else {}
+        self.data_offset = data_offset
+        # layout of a compact table (see compact_layout), None for fixed records
+        self.compact = compact
+        # Bloom filter of the endpoints: fpr and optionally capacity before
+        # the table is written, then its bits, hashes and offset; None for none
+        self.bloom = bloom
+        # CRC32 of the data: block_size, then the number of blocks and the
+        # offset of the checksums once written; None in older files
+        self.checksums = checksums
+
+    @property
+    def record_size(self):
+        return self.key_size + self.index_size
+
+    def pack(self, data_offset=None):
+        '''Returns the serialized header, padded up to the records
+
+        Arguments:
+            data_offset {int} -- offset of the records, the smallest aligned
+                one if None (default: {None})
+
+        Raises:
+            ValueError -- if the header does not fit before data_offset
+        '''
+        charset = self.charset.encode('utf-8')
+        metadata = dict(self.metadata)
+        if self.compact is not None:
+            metadata['compact'] = self.compact
+        if self.bloom is not None:
+            metadata['bloom'] = self.bloom
+        if self.checksums is not None:
+            metadata['checksums'] = self.checksums
+        metadata = json.dumps(metadata, sort_keys=True).encode('utf-8')
+        size = HEADER.size + len(charset) + len(metadata)
+        if data_offset is None:
+            data_offset = -(-size // DATA_ALIGNMENT) * DATA_ALIGNMENT
+        elif data_offset < size:
+            raise ValueError("The table header does not fit before the records")
+        self.data_offset = data_offset
+        packed = HEADER.pack(
+            MAGIC, FORMAT_VERSION if self.compact is not None else FIXED_FORMAT_VERSION,
+            self.algorithm, self.key_size,
+            self.index_size, self.min_length, self.max_length,
+            self.chain_length, self.number_of_chains, self.record_count,
+            len(charset), len(metadata), self.data_offset
+        ) + charset + metadata
+        return packed + bytes(self.data_offset - size)
+
+    @staticmethod
+    def unpack(buffer):
+        '''Parses a header from the start of a buffer
+
+        Raises:
+            ValueError -- if the buffer does not start with a valid header
+        '''
+        if len(buffer) < HEADER.size:
+            raise ValueError("Truncated table header")
+        (magic, version, algorithm, key_size, index_size, min_length,
+         max_length, chain_length, number_of_chains, record_count,
+         charset_length, metadata_length, data_offset) = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError("Not a rainbow table file")
+        if version > FORMAT_VERSION:
+            raise ValueError("Unsupported table format version " + str(version))
+        start = HEADER.size
+        charset = bytes(buffer[start:start + charset_length]).decode('utf-8')
+        start += charset_length
+        metadata = json.loads(bytes(buffer[start:start + metadata_length]))
+        compact = metadata.pop('compact', None) if version >= 2 else None
+        bloom = metadata.pop('bloom', None)
+        checksums = metadata.pop('checksums', None)
+        return TableHeader(algorithm, charset, min_length, max_length,
+                           chain_length, number_of_chains, record_count,
+                           key_size, index_size, metadata, data_offset, compact, bloom,
+                           checksums)
+
+    def data_end(self):
+        '''Returns the offset of the end of the data: records, sparse index
+        and Bloom filter, up to the checksums'''
+        if self.compact is not None:
+            end = self.data_offset + self.compact['index_offset'] + self.compact['blocks'] * 16
+        else:
+            end = self.data_offset + self.record_count * self.record_size
+        if self.bloom is not None:
+            end = max(end, self.data_offset + self.bloom['offset'] + self.bloom['bits'] // 8)
+        return end
+
+    def file_size(self):
+        '''Returns the size of the table file described'''
+        if self.checksums is not None:
+            return self.data_offset + self.checksums['offset'] + self.checksums['blocks'] * 4
+        return self.data_end()
+
+
+def compact_layout(number_of_chains, key_size):
+    '''Returns the layout of a compact table of at most number_of_chains
+    chains: COMPACT_FALSE_MATCH_BITS more endpoint bits than needed to
+    number the chains, at most 64 and at most the endpoint size
+
+    Arguments:
+        number_of_chains {int} -- expected number of chains
+        key_size {int} -- endpoint size in bytes
+
+    Returns:
+        dict -- key_bits and block_records, completed with the number of
+            blocks and the sparse index offset once written
+    '''
+    key_bits = max(1, number_of_chains - 1).bit_length() + COMPACT_FALSE_MATCH_BITS
+    return {"key_bits": min(key_bits, 64, key_size * 8),
+            "block_records": COMPACT_BLOCK_RECORDS}
+
+
+class EndpointIndex(Mapping):
+    '''Read-only mapping endpoint -> start password over sorted records.
+
+    The records live in any buffer (bytes, bytearray or mmap), lookups are
+    binary searches that only touch the pages they need.
+    '''
+    # optional BloomFilter of the endpoint prefixes, checked before the records
+    bloom = None
+
+    def __init__(self, buffer, count, key_size, index_size, keyspace,
+                 offset=0, path=None, prefixes=None):
+        self.buffer = buffer
+        self.count = count
+        self.key_size = key_size
+        self.index_size = index_size
+        self.record_size = key_size + index_size
+        self.keyspace = keyspace
+        self.offset = offset
+        self.path = path
+        # optional first 8 bytes of every endpoint, searched in C by bisect
+        self.prefixes = prefixes
+
+    @staticmethod
+    def from_sorted(records, key_size, index_size, keyspace):
+        '''Builds an in-memory index from (endpoint, start index) pairs
+        already sorted by endpoint, without duplicates'''
+        buffer = bytearray()
+        prefixes = array('Q')
+        for endpoint, start_index in records:
+            buffer += endpoint
+            buffer += start_index.to_bytes(index_size, 'big')
+            prefixes.append(_prefix(endpoint))
+        return EndpointIndex(buffer, len(prefixes), key_size, index_size,
+                             keyspace, prefixes=prefixes)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.path is not None:
+            # memory-mapped: reopen the file rather than copying the records
+            state['buffer'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.buffer is None:
+            self.buffer = map_file(self.path)
+
+    def _key(self, position):
+        start = self.offset + position * self.record_size
+        return bytes(self.buffer[start:start + self.key_size])
+
+    def _start_index(self, position):
+        start = self.offset + position * self.record_size + self.key_size
+        return int.from_bytes(self.buffer[start:start + self.index_size], 'big')
+
+    def find(self, endpoint):
+        '''Returns the keyspace index of the start point of the chain
+        ending in endpoint, or None'''
+        buffer = self.buffer
+        record_size = self.record_size
+        key_size = self.key_size
+        low, high = 0, self.count
+        if self.bloom is not None and _prefix(endpoint) not in self.bloom:
+            return None
+        if self.prefixes is not None:
+            prefix = _prefix(endpoint)
+            low = bisect.bisect_left(self.prefixes, prefix)
+            high = bisect.bisect_right(self.prefixes, prefix, low)
+        while low < high:
+            middle = (low + high) // 2
+            start = self.offset + middle * record_size
+            key = buffer[start:start + key_size]
+            if key < endpoint:
+                low = middle + 1
+            elif key > endpoint:
+                high = middle
+            else:
+                return int.from_bytes(
+                    buffer[start + key_size:start + record_size], 'big')
+        return None
+
+    def records(self):
+        '''Yields (endpoint, start index) pairs sorted by endpoint'''
+        for position in range(self.count):
+            yield self._key(position), self._start_index(position)
+
+    def record(self, position):
+        '''Returns the (endpoint, start index) pair at a position'''
+        return self._key(position), self._start_index(position)
+
+    def __contains__(self, endpoint):
+        return self.find(endpoint) is not None
+
+    def __getitem__(self, endpoint):
+        start_index = self.find(endpoint)
+        if start_index is None:
+            raise KeyError(endpoint)
+        return self.keyspace.unrank(start_index)
+
+    def __iter__(self):
+        for position in range(self.count):
+            yield self._key(position)
+
+    def __len__(self):
+        return self.count
+
+
+class CompactEndpointIndex(Mapping):
+    '''Read-only mapping endpoint -> start password over the delta-coded
+    blocks of a compact table file (see compact_layout).
+
+    Only the first key_bits bits of the endpoints are kept, so an endpoint
+    of another chain sharing them matches too: lookups already check
+    every match by regenerating the chain. The keys iterated over are the
+    truncated endpoints, padded with zero bits.
+    '''
+    # optional BloomFilter of the truncated endpoints, checked before the blocks
+    bloom = None
+
+    def __init__(self, buffer, count, key_size, index_size, keyspace, layout,
+                 offset=0, path=None):
+        self.buffer = buffer
+        self.count = count
+        self.key_size = key_size
+        self.index_size = index_size
+        self.keyspace = keyspace
+        self.layout = layout
+        self.key_bits = layout['key_bits']
+        self.block_records = layout['block_records']
+        self.offset = offset
+        self.path = path
+        # sparse index: first key and offset of every block
+        start = offset + layout['index_offset']
+        pairs = array('Q')
+        pairs.frombytes(bytes(buffer[start:start + layout['blocks'] * 16]))
+        if sys.byteorder != 'little':
+            pairs.byteswap()
+        self.first_keys = pairs[0::2]
+        self.block_offsets = pairs[1::2]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.path is not None:
+            # memory-mapped: reopen the file rather than copying the records
+            state['buffer'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.buffer is None:
+            self.buffer = map_file(self.path)
+
+    def truncate(self, endpoint):
+        '''Returns the key an endpoint is stored under'''
+        return _prefix(endpoint) >> (64 - self.key_bits)
+
+    def _block(self, block):
+        '''Yields the (key, start index) pairs of a block'''
+        buffer = self.buffer
+        index_size = self.index_size
+        position = self.offset + self.block_offsets[block]
+        key = self.first_keys[block]
+        for n in range(min(self.block_records, self.count - block * self.block_records)):
+            if n:
+                delta = shift = 0
+                while True:
+                    byte = buffer[position]
+                    position += 1
+                    delta |= (byte & 0x7f) << shift
+                    if byte < 0x80:
+                        break
+                    shift += 7
+                key += delta
+            yield key, int.from_bytes(buffer[position:position + index_size], 'big')
+            position += index_size
+
+    def find(self, endpoint):
+        '''Returns the keyspace index of the start point of the chain
+        whose endpoint starts like endpoint, or None'''
+        key = self.truncate(endpoint)
+        if self.bloom is not None and key not in self.bloom:
+            return None
+        block = bisect.bisect_right(self.first_keys, key) - 1
+        if block < 0:
+            return None
+        for stored, start_index in self._block(block):
+            if stored >= key:
+                return start_index if stored == key else None
+        return None
+
+    def _endpoint(self, key):
+        return (key << (64 - self.key_bits)).to_bytes(8, 'big').ljust(self.key_size, b"\0")
+
+    def records(self):
+        '''Yields (truncated endpoint, start index) pairs sorted by endpoint'''
+        for block in range(len(self.first_keys)):
+            for key, start_index in self._block(block):
+                yield self._endpoint(key), start_index
+
+    def record(self, position):
+        '''Returns the (truncated endpoint, start index) pair at a position,
+        decoding its block'''
+        block, n = divmod(position, self.block_records)
+        key, start_index = next(itertools.islice(self._block(block), n, None))
+        return self._endpoint(key), start_index
+
+    def __contains__(self, endpoint):
+        return self.find(endpoint) is not None
+
+    def __getitem__(self, endpoint):
+        start_index = self.find(endpoint)
+        if start_index is None:
+            raise KeyError(endpoint)
+        return self.keyspace.unrank(start_index)
+
+    def __iter__(self):
+        for endpoint, _ in self.records():
+            yield endpoint
+
+    def __len__(self):
+        return self.count
+
+
+def _prefix(endpoint):
+    '''Returns the first 8 bytes of an endpoint as a sortable integer'''
+    return int.from_bytes(bytes(endpoint[:8]).ljust(8, b"\0"), 'big')
+
+
+def map_file(filename):
+    '''Maps a whole file read-only in memory'''
+    with open(filename, "rb") as fd:
+        return mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def write_table(filename, header, records, update=None):
+    '''Writes a table file
+
+    Arguments:
+        filename {string} -- output file path
+        header {TableHeader} -- table parameters, record_count must be set
+            unless update is given
+        records {iterable} -- (endpoint, start index) pairs sorted by endpoint
+        update {callable} -- called with the header once the records are
+            written and counted, to fill in what depends on them (default:
+            {None})
+
+    Returns:
+        int -- number of bytes written
+    '''
+    written = 0
+    with open(filename, "w+b") as fd:
+        header.checksums = {"block_size": CHECKSUM_BLOCK_SIZE}
+        header.pack()
+        # room for metadata growing once the records are known
+        data_offset = header.data_offset + DATA_ALIGNMENT
+        if update is not None:
+            data_offset += DATA_ALIGNMENT
+        if header.compact is not None:
+            data_offset += DATA_ALIGNMENT
+        bloom = None
+        if header.bloom is not None:
+            data_offset += DATA_ALIGNMENT
+            bloom = BloomFilter.for_capacity(
+                header.bloom.pop('capacity', header.number_of_chains), header.bloom['fpr'])
+            shift = 64 - header.compact['key_bits'] if header.compact is not None else 0
+            records = _add_keys(records, bloom, shift)
+        written += fd.write(header.pack(data_offset))
+        if header.compact is not None:
+            count, size = _write_compact(fd, header, records)
+            written += size
+        else:
+            count = 0
+            for endpoint, start_index in records:
+                written += fd.write(endpoint)
+                written += fd.write(start_index.to_bytes(header.index_size, 'big'))
+                count += 1
+        if bloom is not None:
+            header.bloom.update(offset=fd.tell() - data_offset, bits=bloom.bits,
+                                hashes=bloom.hashes)
+            written += fd.write(bloom.buffer)
+        # the data is read back once written, to compute its checksums
+        end = fd.tell()
+        checksums = block_checksums(fd, data_offset, end, CHECKSUM_BLOCK_SIZE)
+        header.checksums.update(offset=end - data_offset, blocks=len(checksums))
+        if sys.byteorder != 'little':
+            checksums.byteswap()
+        fd.seek(end)
+        written += fd.write(checksums.tobytes())
+        header.record_count = count
+        if update is not None:
+            update(header)
+        fd.seek(0)
+        fd.write(header.pack(data_offset))
+    return written
+
+
+def block_checksums(fd, start, end, block_size):
+    '''Returns the CRC32 of every block_size bytes of a file from start to end
+
+    Arguments:
+        fd {file} -- file opened for binary reading
+        start {int} -- offset of the first block
+        end {int} -- offset of the end of the last block
+        block_size {int} -- bytes per block
+
+    Returns:
+        array -- the CRC32 of the blocks, the last one may be shorter
+    '''
+    checksums = array('I')
+    fd.flush()
+    fd.seek(start)
+    while start < end:
+        size = min(block_size, end - start)
+        checksums.append(zlib.crc32(fd.read(size)))
+        start += size
+    return checksums
+
+
+def _add_keys(records, bloom, shift):
+    '''Yields the records, adding their endpoints, truncated by shift
+    bits, to a Bloom filter'''
+    for endpoint, start_index in records:
+        bloom.add(_prefix(endpoint) >> shift)
+        yield endpoint, start_index
+
+
+def _write_compact(fd, header, records):
+    '''Writes the delta-coded blocks and the sparse index of a compact
+    table, and completes header.compact. Records whose truncated
+    endpoints collide keep the first one.
+
+    Returns:
+        tuple -- number of records and of bytes written
+    '''
+    layout = header.compact
+    shift = 64 - layout['key_bits']
+    block_records = layout['block_records']
+    index_size = header.index_size
+    index = array('Q')
+    buffer = bytearray()
+    written = 0
+    count = 0
+    previous = None
+    for endpoint, start_index in records:
+        key = _prefix(endpoint) >> shift
+        if key == previous:
+            continue
+        if count % block_records == 0:
+            index.append(key)
+            index.append(written + len(buffer))
+        else:
+            delta = key - previous
+            while delta >= 0x80:
+                buffer.append((delta & 0x7f) | 0x80)
+                delta >>= 7
+            buffer.append(delta)
+        buffer += start_index.to_bytes(index_size, 'big')
+        previous = key
+        count += 1
+        if len(buffer) >= 1 << 16:
+            written += fd.write(buffer)
+            buffer.clear()
+    written += fd.write(buffer)
+    layout['blocks'] = len(index) // 2
+    layout['index_offset'] = written
+    if sys.byteorder != 'little':
+        index.byteswap()
+    written += fd.write(index.tobytes())
+    return count, written
+
+
+def read_header(filename):
+    '''Reads the header of a table file, whatever follows it
+
+    Raises:
+        ValueError -- if the file does not start with a valid header
+    '''
+    buffer = map_file(filename)
+    try:
+        return TableHeader.unpack(buffer)
+    finally:
+        buffer.close()
+
+
+def open_table(filename, keyspace_factory):
+    '''Opens a table file as a memory map
+
+    Arguments:
+        filename {string} -- input file path
+        keyspace_factory {callable} -- builds the keyspace from the header
+
+    Raises:
+        ValueError -- if the file is not a valid table file
+
+    Returns:
+        tuple -- the TableHeader and an EndpointIndex over the records
+    '''
+    buffer = map_file(filename)
+    header = TableHeader.unpack(buffer)
+    if len(buffer) < header.file_size():
+        raise ValueError("The file " + filename + " is truncated")
+    if header.compact is not None:
+        index = CompactEndpointIndex(buffer, header.record_count, header.key_size,
+                                     header.index_size, keyspace_factory(header),
+                                     header.compact, offset=header.data_offset,
+                                     path=filename)
+    else:
+        index = EndpointIndex(buffer, header.record_count, header.key_size,
+                              header.index_size, keyspace_factory(header),
+                              offset=header.data_offset, path=filename)
+    if header.bloom is not None:
+        # read into memory, the filter is checked on every probe
+        bloom_start = header.data_offset + header.bloom['offset']
+        index.bloom = BloomFilter(header.bloom['bits'], header.bloom['hashes'], bytearray(
+            buffer[bloom_start:bloom_start + header.bloom['bits'] // 8]), header.bloom['fpr'])
+    return header, index
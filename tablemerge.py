@@ -0,0 +1,224 @@
+'''Merging and extension of existing tables.
+
+Tables built with the same hash and reduce functions hold chains of the
+same kind, so their chains can be pooled into one table with the coverage
+of all of them. The records of the inputs are read in endpoint order
+straight from their memory maps, k-way merged and streamed into the output
+file, so merging never holds more than one record per input in memory.
+
+Extending a table generates the new chains into a table file of their own,
+with a new seed, and merges it with the existing table: the chains already
+stored are copied, not generated again.
+'''
+import copy
+import heapq
+import logging
+import math
+import os
+
+from constants import GENERATION_MEMORY_BUDGET
+from rainbowtable import RainbowTable
+from tablefile import (COMPACT_BLOCK_RECORDS, COMPACT_FALSE_MATCH_BITS, CompactEndpointIndex,
+                       compact_layout, write_table)
+from tradeoff import perfect_coverage
+
+# parameters the chains depend on, equal in tables that can be merged
+CHAIN_PARAMETERS = ('algorithm', 'charset', 'min_length', 'max_length', 'chain_length',
+                    'distinguished_bits', 'table_index', 'reduce_version', 'masks')
+
+
+def check_compatible(tables):
+    '''Checks that tables can be merged
+
+    Arguments:
+        tables {list} -- RainbowTable objects
+
+    Raises:
+        ValueError -- if two tables differ in a parameter of CHAIN_PARAMETERS
+    '''
+    first = tables[0]
+    for table in tables[1:]:
+        for name in CHAIN_PARAMETERS:
+            if getattr(table, name) != getattr(first, name):
+                raise ValueError(f"Tables with a different {name} cannot be merged "
+                                 f"({getattr(first, name)} and {getattr(table, name)})")
+
+
+def merged_key_bits(tables, compact, number_of_chains):
+    '''Returns the endpoint bits kept by a merge of the tables: those of
+    the layout of a compact table of number_of_chains chains (see
+    compact_layout), or fewer if a compact table keeps fewer. The false
+    match rate of the merge is then higher than that of compact tables,
+    and a warning is logged.
+
+    Arguments:
+        tables {list} -- RainbowTable objects
+        compact {bool} -- whether the merged table is compact
+        number_of_chains {int} -- chains of the merged table
+
+    Raises:
+        ValueError -- if a table is compact but the merge is not
+
+    Returns:
+        int -- endpoint bits kept, None if the merge is not compact
+    '''
+    bits = [table.table.key_bits for table in tables
+            if isinstance(table.table, CompactEndpointIndex)]
+    if bits and not compact:
+        raise ValueError("A compact table only holds truncated endpoints, "
+                         "the merged table has to be compact")
+    if not compact:
+        return None
+    key_bits = compact_layout(number_of_chains, tables[0].digest_size())['key_bits']
+    if bits and min(bits) < key_bits:
+        logging.warning(
+            f"The compact tables keep {min(bits)} endpoint bits, {key_bits} are needed for "
+            f"{number_of_chains} chains: probes of the merged table falsely match with "
+            f"probability {2.0 ** (max(1, number_of_chains - 1).bit_length() - min(bits)):.2g} "
+            f"instead of {2.0 ** -COMPACT_FALSE_MATCH_BITS:.2g}. Merge the full tables "
+            f"to keep the false match rate.")
+        return min(bits)
+    return key_bits
+
+
+def truncate(endpoint, key_bits):
+    '''Returns an endpoint cut to its first key_bits bits, padded with
+    zero bits, as the keys of a compact table'''
+    shift = 64 - key_bits
+    key = int.from_bytes(endpoint[:8], 'big') >> shift << shift
+    return key.to_bytes(8, 'big').ljust(len(endpoint), b"\0")
+
+
+def _numbered(table, number, key_bits):
+    '''Yields the (endpoint, table number, start index) records of a table'''
+    for endpoint, start_index in table.records():
+        if key_bits is not None:
+            endpoint = truncate(endpoint, key_bits)
+        yield endpoint, number, start_index
+
+
+def merged_records(tables, key_bits=None):
+    '''Yields the records of all the tables, sorted by endpoint, one per
+    endpoint: the chain of the first table holding it
+
+    Arguments:
+        tables {list} -- RainbowTable objects
+        key_bits {int} -- endpoint bits kept, all if None (default: {None})
+
+    Yields:
+        tuple -- (endpoint, start index) pairs
+    '''
+    last = None
+    for endpoint, _, start_index in heapq.merge(
+            *(_numbered(table, number, key_bits) for number, table in enumerate(tables))):
+        if endpoint == last:
+            continue
+        last = endpoint
+        yield endpoint, start_index
+
+
+def merged_coverage(tables, record_count):
+    '''Estimates the coverage of the merge of the tables
+
+    Arguments:
+        tables {list} -- RainbowTable objects
+        record_count {int} -- distinct endpoints of the merged table
+
+    Returns:
+        float -- success probability
+    '''
+    first = tables[0]
+    size = first.keyspace().size
+    if first.distinguished_bits:
+        # variable-length chains: the tables are taken as independent,
+        # which overestimates the coverage of their common points
+        return -math.expm1(sum(math.log1p(-min(table.estimated_coverage(), 1 - 1e-12))
+                               for table in tables))
+    # the chains kept have distinct endpoints, so they never merge
+    return perfect_coverage(size, record_count, first.chain_length)
+
+
+def merge_tables(tables, filename, compact=None):
+    '''Merges compatible tables into one table file, dropping duplicate
+    endpoints (see merged_records). The tables may be memory-mapped from
+    filename, the merged table is written aside then renamed.
+
+    Arguments:
+        tables {list} -- RainbowTable objects, the chains of the first
+            ones are kept on duplicate endpoints
+        filename {string} -- output file path
+        compact {bool} -- write a compact table; compact if one of the
+            tables is if None (default: {None})
+
+    Raises:
+        ValueError -- if the tables cannot be merged (see check_compatible)
+        ValueError -- if a table is compact but compact is false
+
+    Returns:
+        RainbowTable -- the merged table, mapped from filename
+    '''
+    if not tables:
+        raise ValueError("No table to merge")
+    check_compatible(tables)
+    if compact is None:
+        compact = any(isinstance(table.table, CompactEndpointIndex) for table in tables)
+    first = tables[0]
+    header = first.header(0)
+    header.number_of_chains = sum(table.number_of_chains for table in tables)
+    key_bits = merged_key_bits(tables, compact, header.number_of_chains)
+    # a merged table has no single seed
+    header.metadata.pop('seed', None)
+    header.metadata['perfect'] = all(table.perfect for table in tables)
+    if compact:
+        header.compact = {"key_bits": key_bits, "block_records": COMPACT_BLOCK_RECORDS}
+
+    def update(header):
+        header.metadata['coverage'] = merged_coverage(tables, header.record_count)
+
+    temporary = filename + ".tmp"
+    write_table(temporary, header, merged_records(tables, key_bits), update)
+    os.replace(temporary, filename)
+    return RainbowTable.load_from_file(filename)
+
+
+def extend_table(table, chains, filename, seed=None, workers=1, compact=None,
+                 memory_budget=GENERATION_MEMORY_BUDGET):
+    '''Adds chains to a table: generates them into a table file of their
+    own, in generation mode of the table, then merges it with the table
+    (see merge_tables). Duplicate endpoints keep the chain of the table.
+
+    Arguments:
+        table {RainbowTable} -- table to extend
+        chains {int} -- number of new start points
+        filename {string} -- output file path, may be the file of the table
+        seed {int} -- seed of the new start points, random if None
+            (default: {None})
+        workers {int} -- number of processes generating the chains (default: {1})
+        compact {bool} -- write a compact table; the layout of the table
+            if None (default: {None})
+        memory_budget {int} -- bytes of chains sorted in memory at once
+
+    Raises:
+        ValueError -- if seed is the seed of the table, whose chains would
+            be generated again
+
+    Returns:
+        RainbowTable -- the extended table, mapped from filename
+    '''
+    if seed is not None and seed == table.seed:
+        raise ValueError(f"Seed {seed} generated the table already, pick another one")
+    # same parameters, without the chains and the caches
+    extension = copy.copy(table)
+    extension.table = None
+    extension.seed = None
+    extension.coverage = None
+    extension.number_of_chains = chains
+    temporary = filename + ".extension"
+    try:
+        extension.generate_table(workers=workers, seed=seed, perfect=table.perfect,
+                                 distinguished_bits=table.distinguished_bits,
+                                 output=temporary, memory_budget=memory_budget)
+        return merge_tables([table, extension], filename, compact)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
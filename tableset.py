@@ -0,0 +1,154 @@
+'''Lookups over several rainbow tables at once.
+
+Tables built with the same hash and reduce functions (same
+RainbowTable.walk_parameters: algorithm, charset, lengths, chain length,
+distinguished bits and table index) only differ by their chains. The
+column endpoints of a hash are computed once for such a group, and then
+probed in every table of it. Tables of other table indices are
+independent and form their own groups, tried in decreasing order of
+expected success per unit of compute.
+'''
+import glob
+import os
+
+from rainbowtable import LookupResult, RainbowTable
+from tablefile import is_table_file
+from walkcache import WalkLog
+
+
+def find_tables(location):
+    '''Returns the table files matching a glob pattern, or the table files
+    of a directory (binary tables and legacy .rt files), sorted by name'''
+    if os.path.isdir(location):
+        return sorted(
+            path for path in (os.path.join(location, name)
+                              for name in os.listdir(location))
+            if os.path.isfile(path)
+            and (path.endswith(".rt") or is_table_file(path)))
+    return sorted(path for path in glob.glob(location) if os.path.isfile(path))
+
+
+class TableGroup:
+    '''Tables sharing their hash and reduce functions'''
+
+    def __init__(self, tables):
+        """TableGroup constructor
+
+        Arguments:
+                tables {list} -- (file name, RainbowTable) pairs
+        """
+        # the tables most likely to crack a hash are probed first
+        self.tables = sorted(tables, key=lambda entry: entry[1].estimated_coverage(),
+                             reverse=True)
+        self.parameters = self.tables[0][1]
+
+    def success(self):
+        '''Returns the probability that one of the tables cracks a random
+        password of the keyspace, the tables being independent'''
+        miss = 1.0
+        for _, table in self.tables:
+            miss *= 1.0 - table.estimated_coverage()
+        return 1.0 - miss
+
+    def cost(self):
+        '''Returns the steps of a lookup: the column walks, shared by the
+        tables, plus one endpoint probe per column and table'''
+        chain_length = self.parameters.chain_length
+        return chain_length * (chain_length + 1) / 2 + chain_length * len(self.tables)
+
+    def priority(self):
+        return self.success() / self.cost()
+
+
+class TableSet:
+    '''Table groups, in lookup order'''
+
+    def __init__(self, tables, walk_cache=None):
+        """TableSet constructor
+
+        Arguments:
+                tables {list} -- (file name, RainbowTable) pairs
+                walk_cache {WalkCache} -- persistent walk cache, walks are
+                    only shared within a lookup if None (default: {None})
+        """
+        groups = {}
+        for name, table in tables:
+            groups.setdefault(table.walk_parameters(), []).append((name, table))
+        self.groups = sorted((TableGroup(group) for group in groups.values()),
+                             key=TableGroup.priority, reverse=True)
+        self.walk_cache = walk_cache
+
+    @staticmethod
+    def load(location, walk_cache=None):
+        '''Loads the tables of a directory or glob pattern (see find_tables)
+
+        Raises:
+            ValueError -- if no table is found
+
+        Returns:
+            TableSet -- the loaded tables
+        '''
+        filenames = find_tables(location)
+        if not filenames:
+            raise ValueError("No rainbow table found in " + location)
+        return TableSet([(filename, RainbowTable.load_from_file(filename))
+                         for filename in filenames], walk_cache)
+
+    def __len__(self):
+        return sum(len(group.tables) for group in self.groups)
+
+    def _shared_walks(self):
+        '''Returns the walk cache of the tables of one group'''
+        return self.walk_cache if self.walk_cache is not None else WalkLog()
+
+    def lookup(self, hash_to_crack, workers=1):
+        '''Cracks a hash with every table, group by group, until a table
+        finds it (see RainbowTable.lookup_detailed)
+
+        Arguments:
+            hash_to_crack {string} -- hexadecimal hash to crack
+            workers {int} -- number of processes to use (default: {1})
+
+        Returns:
+            tuple -- the file name of the table that cracked the hash (or
+                None) and the LookupResult summed over the tables tried
+        '''
+        total = LookupResult()
+        for group in self.groups:
+            walks = self._shared_walks()
+            for name, table in group.tables:
+                table.walk_cache = walks
+                result = table.lookup_detailed(hash_to_crack, workers)
+                total.add(result)
+                if result.password is not None:
+                    return name, total
+        return None, total
+
+    def lookup_many(self, hashes, workers=1):
+        '''Cracks many hashes with every table, group by group; each table
+        only gets the hashes left uncracked (see RainbowTable.lookup_many)
+
+        Arguments:
+            hashes {iterable} -- hexadecimal hashes to crack
+            workers {int} -- number of processes to use (default: {1})
+
+        Yields:
+            tuple -- (hash, password, table file name) as soon as a hash
+                is cracked, then (hash, None, None) for every hash left
+        '''
+        remaining = list(dict.fromkeys(hashes))
+        for group in self.groups:
+            walks = self._shared_walks()
+            for name, table in group.tables:
+                if not remaining:
+                    return
+                table.walk_cache = walks
+                uncracked = []
+                for hash_string, password in table.lookup_many(remaining, workers):
+                    if password is not None:
+                        yield hash_string, password, name
+                    else:
+                        uncracked.append(hash_string)
+                remaining = uncracked
+        for hash_string in remaining:
+            yield hash_string, None, None
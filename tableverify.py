@@ -0,0 +1,307 @@
+'''Integrity checks of table files, far cheaper than generating the
+table again.
+
+A table is verified in four steps, from the cheapest:
+ - its header and metadata are checked for consistency with each other
+   and with the size of the file;
+ - the CRC32 of every checksum block of its data is computed again and
+   compared with the one stored (see tablefile.py);
+ - the chains of a random sample of records are recomputed from their
+   start points, in parallel, and must end in the endpoint stored, which
+   the index must find;
+ - a self-test cracks the hashes of random passwords of the keyspace,
+   and compares the success rate and the lookup times measured with the
+   coverage and the lookup cost predicted for the parameters of the table
+   (see tradeoff.py).
+
+A corrupt file fails the checksums, a table built with other reduce
+functions than its metadata says fails the recomputed chains, and a table
+whose coverage was overstated, by merges for instance, fails the
+self-test.
+'''
+import math
+import multiprocessing
+import random
+import sys
+import time
+from array import array
+
+from constants import LOOKUP_COLUMN_GROUP, SELF_TEST_SIGMAS, VERIFY_BATCH
+from stats import Stats
+from tablefile import CompactEndpointIndex, block_checksums
+from tradeoff import false_alarm_steps, measure_step_rate
+
+# reduce function versions of RainbowTable.reduce_function
+REDUCE_VERSIONS = (1, 2)
+
+_worker_table = None
+
+
+def _init_worker(table):
+    global _worker_table
+    _worker_table = table
+
+
+def _recompute_chains(records):
+    return recompute_chains(_worker_table, records)
+
+
+def _crack_passwords(passwords):
+    return crack_passwords(_worker_table, passwords)
+
+
+def _run(table, function, worker_function, work, workers):
+    '''Returns the results of function(table, unit) for every unit of
+    work, from a process pool with workers > 1'''
+    if workers <= 1 or len(work) <= 1:
+        return [function(table, unit) for unit in work]
+    with multiprocessing.Pool(min(workers, len(work)), initializer=_init_worker,
+                              initargs=(table,)) as pool:
+        return pool.map(worker_function, work)
+
+
+def _batches(items):
+    return [items[i:i + VERIFY_BATCH] for i in range(0, len(items), VERIFY_BATCH)]
+
+
+def check_header(header, table, file_size):
+    '''Checks that the parameters stored in a table file are consistent
+
+    Arguments:
+        header {TableHeader} -- header of the file
+        table {RainbowTable} -- table loaded from the file
+        file_size {int} -- size of the file in bytes
+
+    Returns:
+        list -- descriptions of the problems found, empty if none
+    '''
+    problems = []
+
+    def check(condition, problem):
+        if not condition:
+            problems.append(problem)
+
+    check(1 <= header.min_length <= header.max_length,
+          f"Invalid password lengths {header.min_length} to {header.max_length}")
+    check(header.chain_length >= 1, f"Invalid chain length {header.chain_length}")
+    check(header.key_size == table.digest_size(),
+          f"Endpoints of {header.key_size} bytes, {table.algorithm.name} hashes "
+          f"have {table.digest_size()}")
+    check(header.index_size == table.keyspace().index_size(),
+          f"Start indices of {header.index_size} bytes, the keyspace needs "
+          f"{table.keyspace().index_size()}")
+    check(header.record_count <= header.number_of_chains,
+          f"{header.record_count} chains stored, more than the "
+          f"{header.number_of_chains} generated")
+    check(table.reduce_version in REDUCE_VERSIONS,
+          f"Unknown reduce version {table.reduce_version}")
+    check(0 <= table.distinguished_bits <= 64,
+          f"Invalid distinguished bits {table.distinguished_bits}")
+    check(table.coverage is None or 0 <= table.coverage <= 1,
+          f"Invalid coverage {table.coverage}")
+    if header.compact is not None:
+        layout = header.compact
+        check(1 <= layout['key_bits'] <= min(64, header.key_size * 8),
+              f"Invalid compact endpoint bits {layout['key_bits']}")
+        check(layout['blocks'] == -(-header.record_count // layout['block_records']),
+              f"{layout['blocks']} compact blocks for {header.record_count} chains")
+    if header.bloom is not None:
+        bloom = header.bloom
+        check(0 < bloom['fpr'] < 1 and bloom['bits'] > 0 and bloom['bits'] % 8 == 0
+              and bloom['hashes'] >= 1, f"Invalid Bloom filter {bloom}")
+    check(file_size == header.file_size(),
+          f"The file has {file_size} bytes, its header describes {header.file_size()}")
+    return problems
+
+
+def check_checksums(filename, header):
+    '''Computes the checksums of the data of a table file again
+
+    Arguments:
+        filename {string} -- table file
+        header {TableHeader} -- header of the file
+
+    Returns:
+        list -- numbers of the checksum blocks whose data changed, or None
+            for files written without checksums
+    '''
+    checksums = header.checksums
+    if checksums is None or 'blocks' not in checksums:
+        return None
+    stored = array('I')
+    with open(filename, "rb") as fd:
+        fd.seek(header.data_offset + checksums['offset'])
+        stored.frombytes(fd.read(checksums['blocks'] * stored.itemsize))
+        if sys.byteorder != 'little':
+            stored.byteswap()
+        computed = block_checksums(fd, header.data_offset,
+                                   header.data_offset + checksums['offset'],
+                                   checksums['block_size'])
+    bad = [n for n, (expected, crc) in enumerate(zip(stored, computed)) if expected != crc]
+    # blocks missing on either side
+    bad += range(min(len(stored), len(computed)), max(len(stored), len(computed)))
+    return bad
+
+
+def sample_records(table, samples, rng):
+    '''Draws records of a table at random
+
+    Arguments:
+        table {RainbowTable} -- table to sample
+        samples {int} -- number of records, at most all of them
+        rng {random.Random} -- generator to draw from
+
+    Returns:
+        list -- (position, endpoint, start index) triples by position
+    '''
+    index = table.table
+    positions = sorted(rng.sample(range(len(index)), min(samples, len(index))))
+    if hasattr(index, 'record'):
+        return [(position,) + index.record(position) for position in positions]
+    # in-memory tables of older versions
+    records = list(table.records())
+    return [(position,) + records[position] for position in positions]
+
+
+def recompute_chains(table, records):
+    '''Recomputes the chains of some records from their start points
+
+    Arguments:
+        table {RainbowTable} -- table of the records
+        records {list} -- (position, endpoint, start index) triples
+
+    Returns:
+        list -- (position, start password) pairs of the chains that do not
+            end in their endpoint
+    '''
+    keyspace = table.keyspace()
+    passwords = [keyspace.unrank(start_index) for _, _, start_index in records]
+    # compact tables only keep the first bits of the endpoints
+    key = table.table.truncate if isinstance(table.table, CompactEndpointIndex) else bytes
+    return [(position, password)
+            for (position, endpoint, _), password, ended in zip(
+                records, passwords, table.chain_tails(passwords))
+            if ended is None or key(ended[0]) != key(endpoint)]
+
+
+def check_chains(table, samples, workers=1, seed=None):
+    '''Recomputes the chains of random records of a table, and checks that
+    the index finds every record by its endpoint
+
+    Arguments:
+        table {RainbowTable} -- table to check
+        samples {int} -- number of chains recomputed
+        workers {int} -- number of processes to use (default: {1})
+        seed {int} -- seed of the sample (default: {None})
+
+    Returns:
+        dict -- number of chains checked, (position, start password) pairs
+            of the chains ending elsewhere, and positions of the records
+            the index does not find
+    '''
+    records = sample_records(table, samples, random.Random(seed))
+    keyspace = table.keyspace()
+    unsearchable = [position for position, endpoint, start_index in records
+                    if table.table.get(endpoint) != keyspace.unrank(start_index)]
+    mismatches = [mismatch for batch in _run(table, recompute_chains, _recompute_chains,
+                                             _batches(records), workers)
+                  for mismatch in batch]
+    return {"checked": len(records), "mismatches": mismatches, "unsearchable": unsearchable}
+
+
+def crack_passwords(table, passwords):
+    '''Cracks the hashes of some passwords, one lookup at a time
+
+    Arguments:
+        table {RainbowTable} -- table to look the hashes up in
+        passwords {list} -- passwords whose hashes are cracked
+
+    Returns:
+        list -- (cracked, seconds, steps) triples: whether the lookup found
+            a password of the hash, the time it took and its hash calls
+    '''
+    results = []
+    previous = table.stats
+    # the steps of every lookup are counted apart
+    stats = table.stats = Stats()
+    try:
+        for password in passwords:
+            target = table.hash_function(password)
+            steps = stats.counters["hash_calls"]
+            start = time.perf_counter()
+            found = table.lookup_detailed(target.hex()).password
+            elapsed = time.perf_counter() - start
+            results.append((found is not None and table.hash_function(found) == target,
+                            elapsed, stats.counters["hash_calls"] - steps))
+    finally:
+        table.stats = previous
+    return results
+
+
+def percentiles(values):
+    '''Returns the median, 90th and 99th percentiles and maximum of values'''
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {"p50": ordered[len(ordered) // 2],
+            "p90": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+            "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+            "max": ordered[-1]}
+
+
+def self_test(table, hashes, workers=1, seed=None):
+    '''Cracks the hashes of random passwords of the keyspace, and compares
+    the results with the predictions for the parameters of the table. The
+    success rate fails the test if it is more than SELF_TEST_SIGMAS
+    standard deviations below the coverage of the table.
+
+    The lookups that find nothing are expected to walk every column and
+    check the false alarms of every column (see tradeoff.TablePlan). Their
+    steps are compared with the prediction, and their time with that of
+    hashing the predicted steps, at the step rate of walks measured in
+    this process: a lower bound, the probes and the false alarm checks
+    one chain at a time take longer. Distinguished point tables have no
+    such prediction.
+
+    Arguments:
+        table {RainbowTable} -- table to test
+        hashes {int} -- number of hashes cracked
+        workers {int} -- number of processes to use (default: {1})
+        seed {int} -- seed of the passwords (default: {None})
+
+    Returns:
+        dict -- the measured and expected success rates and lookup times
+    '''
+    rng = random.Random(seed)
+    keyspace = table.keyspace()
+    passwords = [keyspace.unrank(rng.randrange(keyspace.size)) for _ in range(hashes)]
+    results = [result for batch in _run(table, crack_passwords, _crack_passwords,
+                                        _batches(passwords), workers)
+               for result in batch]
+
+    cracked = sum(found for found, _, _ in results)
+    success = cracked / max(1, len(results))
+    coverage = table.estimated_coverage()
+    deviation = math.sqrt(coverage * (1 - coverage) / max(1, len(results)))
+    misses = [(seconds, steps) for found, seconds, steps in results if not found]
+    expected_steps = expected_miss = None
+    if not table.distinguished_bits:
+        t = table.chain_length
+        expected_steps = t * (t - 1) / 2 + false_alarm_steps(keyspace.size, len(table.table), t)
+        expected_miss = expected_steps / measure_step_rate(
+            table, seconds=0.5, batch=LOOKUP_COLUMN_GROUP)
+    return {
+        "hashes": len(results),
+        "cracked": cracked,
+        "success": success,
+        "expected_success": coverage,
+        "passed": success >= coverage - SELF_TEST_SIGMAS * deviation - 1 / max(1, len(results)),
+        "lookup_seconds": percentiles([seconds for _, seconds, _ in results]),
+        "hit_seconds": percentiles([seconds for found, seconds, _ in results if found]),
+        "miss_seconds": percentiles([seconds for seconds, _ in misses]),
+        "mean_miss_seconds": sum(seconds for seconds, _ in misses) / len(misses)
+        if misses else None,
+        "mean_miss_steps": sum(steps for _, steps in misses) / len(misses) if misses else None,
+        "expected_miss_steps": expected_steps,
+        "expected_miss_seconds": expected_miss,
+    }
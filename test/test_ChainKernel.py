@@ -0,0 +1,57 @@
+import pytest
+import random
+from rainbowtable import RainbowTable
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.mark.parametrize(
+    "algorithm,charset,min_length,max_length,table_index,reduce_version", [
+        ("sha1", "alphanumeric", 1, 8, 0, 1),
+        ("md5", "lower_alphanumeric", 3, 5, 0, 1),
+        ("sha1", "numeric", 6, 6, 0, 1),
+        ("sha1", "alphanumeric", 1, 8, 3, 1),
+        ("ntlm", "alphanumeric", 1, 8, 0, 1),
+        ("sha256", "numeric", 2, 4, 0, 1),
+        ("lm", "alphanumeric", 1, 7, 0, 1),
+        ("sha1", "alphanumeric", 1, 8, 0, 2),
+        ("md5", "lower_alphanumeric", 3, 5, 2, 2),
+        ("sha1", "numeric", 6, 6, 0, 2),
+        ("ntlm", "numeric", 1, 3, 0, 2),
+    ])
+def test_step_many_matches_reduce_function(algorithm, charset, min_length, max_length,
+                                           table_index, reduce_version):
+    test_table = RainbowTable(algorithm, charset, min_length, max_length, 50, 1,
+                              table_index=table_index, reduce_version=reduce_version)
+    kernel = test_table.kernel()
+    assert kernel is not None
+    rng = random.Random(1)
+    hashes = [test_table.hash_function(str(rng.random())) for _ in range(200)]
+    for column in [0, 1, 7, 19, 20, 49]:
+        expected = [test_table.hash_function(test_table.reduce_function(h, column))
+                    for h in hashes]
+        assert kernel.step_many(hashes, column) == expected
+
+
+def test_generate_block_matches_generate_chain():
+    test_table = RainbowTable("sha1", "lower_alphanumeric", 1, 5, 30, 100)
+    for password, tail, length in test_table.generate_block(0, 100, seed=3):
+        assert length == test_table.chain_length
+        assert test_table.generate_chain(password) == tail
+
+
+def test_batched_walks_match_walk():
+    test_table = RainbowTable("md5", "alphanumeric", 2, 6, 25, 1)
+    targets = [test_table.hash_function(password) for password in ("target", "other")]
+    expected = [[test_table.walk(target, column) for column in range(test_table.chain_length)]
+                for target in targets]
+    assert test_table.walk_columns(targets[0], 0, test_table.chain_length) == expected[0]
+    for column in range(test_table.chain_length):
+        assert test_table.walk_many(targets, column) == [walks[column] for walks in expected]
+
+
+def test_kernel_needs_ascii():
+    test_table = RainbowTable("sha1", "numeric", 4, 4, 20, 1, masks=["?d?d?d?d"])
+    # the masks only use digits, but the kernel is also given the table charset
+    test_table.charset = "0123456789\u00e9"
+    assert test_table.kernel() is None
@@ -0,0 +1,56 @@
+import pytest
+from rainbowtable import RainbowTable
+
+
+def interrupted_generation(checkpoint, fail_at_block, checkpoint_interval=1, **options):
+    test_table = RainbowTable("sha1", "lower_alphanumeric", 3, 4, 5, 4000)
+    generate_block = test_table.generate_block
+
+    def failing_generate_block(block, count, seed):
+        if block == fail_at_block:
+            raise KeyboardInterrupt()
+        return generate_block(block, count, seed)
+
+    test_table.generate_block = failing_generate_block
+    with pytest.raises(KeyboardInterrupt):
+        test_table.generate_table(seed=21, checkpoint=checkpoint,
+                                  checkpoint_interval=checkpoint_interval, **options)
+
+
+@pytest.mark.parametrize("options", [{}, {"perfect": True}])
+def test_resume_gives_same_table(tmpdir, options):
+    checkpoint = str(tmpdir) + "/table.ckpt"
+    interrupted_generation(checkpoint, 2, **options)
+    # a segment cut short by the crash is dropped
+    with open(checkpoint, "ab") as fd:
+        fd.write(b"SEGM\x03\x00")
+
+    resumed = RainbowTable("sha1", "lower_alphanumeric", 3, 4, 5, 4000)
+    resumed.generate_table(checkpoint=checkpoint, resume=True, **options)
+    expected = RainbowTable("sha1", "lower_alphanumeric", 3, 4, 5, 4000)
+    expected.generate_table(seed=21, **options)
+    assert resumed.seed == 21
+    assert resumed.table == expected.table
+    assert resumed.coverage == expected.coverage
+
+
+def test_resume_truncates_hash_log(tmpdir):
+    checkpoint = str(tmpdir) + "/table.ckpt"
+    # block 2 is logged after the segment of blocks 0 and 1, then built again
+    interrupted_generation(checkpoint, 3, checkpoint_interval=2)
+    resumed = RainbowTable("sha1", "lower_alphanumeric", 3, 4, 5, 4000)
+    resumed.generate_table(checkpoint=checkpoint, resume=True)
+    with open("hash.txt") as fd:
+        logged = fd.read()
+    expected = RainbowTable("sha1", "lower_alphanumeric", 3, 4, 5, 4000)
+    expected.generate_table(seed=21)
+    with open("hash.txt") as fd:
+        assert logged == fd.read()
+
+
+def test_resume_checks_parameters(tmpdir):
+    checkpoint = str(tmpdir) + "/table.ckpt"
+    interrupted_generation(checkpoint, 1)
+    other = RainbowTable("sha1", "lower_alphanumeric", 3, 4, 6, 4000)
+    with pytest.raises(ValueError):
+        other.generate_table(checkpoint=checkpoint, resume=True)
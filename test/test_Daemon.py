@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from rainbowd import CrackService, crack_lines, crack_with_daemon, daemon_tables, open_walk_cache, serve
+from rainbowtable import RainbowTable
+from tableset import TableSet
+
+
+def test_daemon_round_trip(tmpdir):
+    table = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 20, 150)
+    table.generate_table(seed=1)
+    filename = str(tmpdir.join("a.rt"))
+    table.save_to_file(filename)
+    socket_path = str(tmpdir.join("rainbowd.sock"))
+    assert daemon_tables(socket_path) is None
+
+    start = next(iter(table.table.values()))
+    password = table.reduce_function(table.hash_function(start), 0)
+    found = table.hash_function(password).hex()
+    missed = "00" * 20
+
+    loop = asyncio.new_event_loop()
+    service = CrackService(TableSet.load(filename), batch_wait=0.01)
+    task = loop.create_task(serve(service, socket_path, None))
+    thread = threading.Thread(
+        target=lambda: loop.run_until_complete(asyncio.wait([task])), daemon=True)
+    thread.start()
+    try:
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.05)
+        assert daemon_tables(socket_path) == [os.path.abspath(filename)]
+        results = {hash_string: (password, name) for hash_string, password, name
+                   in crack_with_daemon([found, missed, found.upper()], socket_path)}
+        assert results == {found: (password, os.path.abspath(filename)),
+                           missed: (None, None)}
+        metrics = service.metrics()
+        assert metrics["results"] == 2 and metrics["cracked"] == 1
+        assert metrics["queue_depth"] == 0
+    finally:
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(5)
+        loop.close()
+
+
+def test_daemon_walk_cache(tmpdir):
+    table = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 20, 150)
+    table.generate_table(seed=2)
+    filename = str(tmpdir.join("a.rt"))
+    table.save_to_file(filename)
+    start = next(iter(table.table.values()))
+    password = table.reduce_function(table.hash_function(start), 0)
+    found = table.hash_function(password).hex()
+    missed = "00" * 20
+
+    cache = open_walk_cache(str(tmpdir.join("walks.db")), 1 << 20)
+    service = CrackService(TableSet.load(filename, cache), batch_wait=0.01)
+
+    async def crack(hashes):
+        return [json.loads(line) async for line in crack_lines(service, hashes)]
+
+    async def run():
+        worker = asyncio.ensure_future(service.run())
+        try:
+            first = await crack([found, missed])
+            # the walk of the missed hash is read from the cache
+            second = await crack([missed])
+        finally:
+            worker.cancel()
+        return first, second
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        cache.close()
+    results = {line["hash"]: line["password"] for line in first if "hash" in line}
+    assert results == {found: password, missed: None}
+    assert second[-1] == {"done": True, "hashes": 1, "cracked": 0}
+    assert cache.hits >= 1
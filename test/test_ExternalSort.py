@@ -0,0 +1,56 @@
+import random
+import pytest
+from checkpoint import CheckpointState
+from externalsort import MERGE_FAN_IN, ChainSorter
+from keyspace import Keyspace
+from rainbowtable import RainbowTable
+
+
+def reference_records(records, keep_first, limit):
+    # last (or first) start of every endpoint, for the limit endpoints kept first
+    kept = {}
+    for position, (endpoint, start_index) in enumerate(records):
+        if not (keep_first and endpoint in kept):
+            kept[endpoint] = (position, start_index)
+    entries = sorted(kept.items(), key=lambda entry: entry[1][0])[:limit]
+    return sorted((endpoint, start_index) for endpoint, (_, start_index) in entries)
+
+
+@pytest.mark.parametrize("keep_first,limit", [(False, None), (True, None), (True, 150)])
+def test_merge_matches_in_memory_sort(tmpdir, keep_first, limit):
+    keyspace = Keyspace("abc", 1, 6)
+    rng = random.Random(3)
+    state = CheckpointState()
+    state.round_end = 0
+    sorter = ChainSorter(2, 2, 0, state, directory=str(tmpdir))
+    records = []
+    for block in range(MERGE_FAN_IN * 2 + 5):
+        for n in range(3):
+            endpoint = bytes([rng.randrange(16), rng.randrange(16)])
+            start_index = rng.randrange(keyspace.size)
+            sorter.add(endpoint, block * 1024 + n, start_index)
+            records.append((endpoint, start_index))
+        state.next_block = block + 1
+        # one run per block: the runs are merged in several passes
+        sorter.spill(block)
+
+    assert list(sorter.unique(keep_first, limit)) == reference_records(records, keep_first, limit)
+    sorter.close()
+    assert tmpdir.listdir() == []
+
+
+@pytest.mark.parametrize("options", [{}, {"perfect": True}])
+def test_streamed_generation_matches_in_memory(tmpdir, options):
+    output = str(tmpdir) + "/table.rt"
+    streamed = RainbowTable("sha1", "lower_alphanumeric", 3, 3, 5, 3000)
+    # the smallest budget writes a run every block
+    streamed.generate_table(seed=5, output=output, memory_budget=1, **options)
+    expected = RainbowTable("sha1", "lower_alphanumeric", 3, 3, 5, 3000)
+    expected.generate_table(seed=5, **options)
+
+    assert streamed.table == expected.table
+    assert streamed.coverage == expected.coverage
+    loaded = RainbowTable.load_from_file(output)
+    assert loaded.table == expected.table
+    assert loaded.coverage == expected.coverage
+    assert sorted(tmpdir.listdir()) == [tmpdir.join("table.rt")]
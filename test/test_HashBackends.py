@@ -0,0 +1,45 @@
+import hashlib
+import pytest
+from hashbackends import algorithm_names, get_backend
+from legacyhash import des_encrypt, md4
+from rainbowtable import RainbowTable
+
+
+def test_legacy_primitives():
+    assert md4(b"").hex() == "31d6cfe0d16ae931b73c59d7e0c089c0"
+    assert md4(b"abc").hex() == "a448017aaf21d8525fc10ae87aa6729d"
+    assert des_encrypt(bytes.fromhex("133457799bbcdff1"),
+                       bytes.fromhex("0123456789abcdef")).hex() == "85e813540f0ab405"
+
+
+@pytest.mark.parametrize("name,password,expected", [
+    ("ntlm", "password", "8846f7eaee8fb117ad06bdd830b7586c"),
+    ("lm", "password", "e52cac67419a9a224a3b108f3fa6cb6d"),
+    ("lm", "", "aad3b435b51404eeaad3b435b51404ee"),
+    ("sha256", "abc", hashlib.sha256(b"abc").hexdigest()),
+    ("sha512", "abc", hashlib.sha512(b"abc").hexdigest()),
+])
+def test_known_digests(name, password, expected):
+    backend = get_backend(name)
+    assert backend.hash_text(password).hex() == expected
+    assert backend.hash_many([password.encode('utf-8')] * 2) == [bytes.fromhex(expected)] * 2
+    assert backend.digest_size == len(bytes.fromhex(expected))
+
+
+def test_registry():
+    assert algorithm_names() == ["lm", "md5", "ntlm", "sha1", "sha256", "sha512"]
+    with pytest.raises(ValueError):
+        get_backend("crc32")
+    with pytest.raises(ValueError):
+        RainbowTable("lm", "numeric", 1, 15, 10, 10)
+
+
+@pytest.mark.parametrize("algorithm", ["ntlm", "sha512", "lm"])
+def test_lookup_with_backend(algorithm):
+    test_table = RainbowTable(algorithm, "lower_alphanumeric", 3, 3, 20, 200)
+    test_table.generate_table(seed=7)
+    start = next(iter(test_table.table.values()))
+    reduced = test_table.reduce_function(test_table.hash_function(start), 0)
+    hash_string = test_table.hash_function(reduced).hex()
+    password = test_table.lookup(hash_string)
+    assert test_table.hash_function(password).hex() == hash_string
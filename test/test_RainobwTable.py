@@ -1,3 +1,4 @@
+import argparse
 import pytest
 import string
 import hashlib
@@ -5,6 +6,7 @@ import uuid
 import random
 from rainbowtable import RainbowTable
 from algorithm import Algorithm
+from stats import Stats, add_stats_arguments
 
 def test_init():
     test_table = RainbowTable("sha1", "alphanumeric", 1, 1, 1, 1)
@@ -36,14 +38,48 @@ def test_reduce_function():
         assert len(reduced) in range(4, 8)
 
 
+def test_reduce_versions():
+    hashstring = bytes(range(20))
+    original = RainbowTable("sha1", "numeric", 2, 3, 1, 1, reduce_version=1)
+    # length from the second byte, characters from bytes column, column + 1, ...
+    assert original.reduce_function(hashstring, 5) == "678"
+    uniform = RainbowTable("sha1", "numeric", 2, 3, 1, 1)
+    assert uniform.reduce_version == 2
+    # 2-byte start indices: the leading 6 bytes as a number, plus the column, unranked
+    assert uniform.reduce_width() == 6
+    index = (int.from_bytes(hashstring[:6], 'big') + 5) % uniform.keyspace().size
+    assert uniform.reduce_function(hashstring, 5) == uniform.keyspace().unrank(index)
+
+
+def test_tables_without_reduce_version_use_the_original_reduce(tmp_path):
+    test_table = RainbowTable("sha1", "lower_alphanumeric", 1, 4, 20, 50, reduce_version=1)
+    test_table.generate_table(seed=1)
+    filename = str(tmp_path / "table.rt")
+    test_table.save_to_file(filename)
+    assert RainbowTable.load_from_file(filename).reduce_version == 1
+    del test_table.reduce_version
+    assert test_table.reduce_version == 1
+    assert RainbowTable("sha1", "numeric", 1, 2, 1, 1).walk_parameters() != \
+        RainbowTable("sha1", "numeric", 1, 2, 1, 1, reduce_version=1).walk_parameters()
+
+
 def test_generate_table():
     test_table = RainbowTable("sha1", "alphanumeric", 2, 4, 5, 30)
     test_table.generate_table()
-    first_chain = test_table.table.popitem()
+    first_chain = next(iter(test_table.table.items()))
     assert len(first_chain[0]) == 20
     assert len(first_chain[1]) in range(2, 5)
 
 
+def test_generate_table_workers():
+    test_table = RainbowTable("sha1", "alphanumeric", 2, 4, 5, 1500)
+    test_table.generate_table(seed=1234)
+    parallel_table = RainbowTable("sha1", "alphanumeric", 2, 4, 5, 1500)
+    parallel_table.generate_table(workers=2, seed=1234)
+    assert len(test_table.table) > 1000
+    assert test_table.table == parallel_table.table
+
+
 def test_save_and_load(tmpdir):
     test_table = RainbowTable("sha1", "alphanumeric", 2, 4, 5, 10)
     test_table.generate_table()
@@ -59,3 +95,175 @@ def test_lookup():
 		"e4815b09a6fdc84943f727b1611bd704899864ca"
 	)
 	assert psw == "cUK"
+
+
+def test_lookup_many():
+    test_table = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 20, 300)
+    test_table.generate_table(seed=99)
+    rng = random.Random(5)
+    passwords = []
+    for start in rng.sample(list(test_table.table.values()), 10):
+        reduced = start
+        for i in range(rng.randrange(test_table.chain_length)):
+            reduced = test_table.reduce_function(test_table.hash_function(reduced), i)
+        passwords.append(reduced)
+    hashes = [test_table.hash_function(p).hex() for p in passwords]
+    hashes.append("00" * 20)
+    results = dict(test_table.lookup_many(hashes))
+    assert len(results) == len(set(hashes))
+    assert results["00" * 20] is None
+    for password, hash_string in zip(passwords, hashes):
+        assert test_table.hash_function(results[hash_string]).hex() == hash_string
+
+
+def test_generate_perfect_table():
+    test_table = RainbowTable("sha1", "lower_alphanumeric", 3, 3, 100, 300)
+    test_table.generate_table(seed=11, perfect=True)
+    assert len(test_table.table) == 300
+    parallel_table = RainbowTable("sha1", "lower_alphanumeric", 3, 3, 100, 300)
+    parallel_table.generate_table(workers=2, seed=11, perfect=True)
+    assert test_table.table == parallel_table.table
+    rainbow_table = RainbowTable("sha1", "lower_alphanumeric", 3, 3, 100, 300)
+    rainbow_table.generate_table(seed=11)
+    assert len(rainbow_table.table) < 300
+    assert 0 < rainbow_table.coverage < test_table.coverage <= 1
+
+
+def test_rainbow_coverage_counts_stored_chains():
+    test_table = RainbowTable("sha1", "lower_alphanumeric", 3, 3, 30, 2000)
+    test_table.generate_table(seed=11)
+    # many chains merge, and only one chain of every endpoint is kept
+    assert len(test_table.table) < 0.7 * 2000
+    covered = set()
+    for start in test_table.table.values():
+        password = start
+        for column in range(test_table.chain_length):
+            covered.add(password)
+            password = test_table.reduce_function(test_table.hash_function(password), column)
+    assert test_table.coverage == pytest.approx(len(covered) / 36 ** 3, rel=0.02)
+
+
+def test_distinguished_point_table(tmpdir):
+    test_table = RainbowTable("md5", "lower_alphanumeric", 1, 3, 200, 100)
+    test_table.generate_table(seed=4, distinguished_bits=4)
+    assert len(test_table.table) == 100
+    assert all(test_table.is_distinguished(endpoint) for endpoint in test_table.table)
+    test_table.save_to_file(str(tmpdir) + "/dp.rt")
+    loaded = RainbowTable.load_from_file(str(tmpdir) + "/dp.rt")
+    assert loaded.distinguished_bits == 4 and loaded.perfect
+    assert loaded.coverage == test_table.coverage
+
+    start = next(iter(loaded.table.values()))
+    hashed = loaded.hash_function(start)
+    reduced = start
+    for i in range(3):
+        if loaded.is_distinguished(hashed):
+            break
+        reduced = loaded.reduce_function(hashed, i)
+        hashed = loaded.hash_function(reduced)
+    assert loaded.lookup(hashed.hex()) is not None
+    assert dict(loaded.lookup_many([hashed.hex()]))[hashed.hex()] is not None
+
+
+def test_lookup_continues_past_false_alarms():
+    # short passwords make chains merge, so most endpoint hits are false alarms
+    test_table = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 100, 300)
+    test_table.generate_table(seed=2)
+    rng = random.Random(1)
+    recovered_after_false_alarm = 0
+    for _ in range(100):
+        password = ''.join(rng.choices("abcdef0123", k=rng.randint(1, 3)))
+        hash_string = test_table.hash_function(password).hex()
+        result = test_table.lookup_detailed(hash_string)
+        assert result.columns_walked == test_table.chain_length or result.password
+        assert result.endpoint_hits == result.false_alarms + (result.password is not None)
+        if result.password is not None:
+            assert test_table.hash_function(result.password).hex() == hash_string
+            start = test_table.table[test_table.walk(bytes.fromhex(hash_string), result.column)]
+            assert test_table.regenerate(start, bytes.fromhex(hash_string),
+                                         result.column) == result.password
+            if result.false_alarms:
+                recovered_after_false_alarm += 1
+    assert recovered_after_false_alarm > 0
+
+
+def test_stats():
+    test_table = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 20, 300)
+    test_table.stats = Stats()
+    test_table.generate_table(seed=5)
+    counters = test_table.stats.counters
+    assert counters["hash_calls"] == 300 * 20
+    assert counters["reduce_calls"] == 300 * 19
+    assert counters["index_inserts"] == 300
+    assert counters["collisions"] == 300 - len(test_table.table)
+    assert set(test_table.stats.phases) == {"chain_stepping", "index_insert", "io"}
+
+    test_table.stats = Stats()
+    hashes = [test_table.hash_function(password).hex() for password in ["a1", "zz9", "q"]]
+    results = [test_table.lookup_detailed(hash_string) for hash_string in hashes]
+    counters = test_table.stats.counters
+    assert counters["index_probes"] == sum(r.index_probes for r in results) == 3 * 20
+    assert counters["endpoint_hits"] == sum(r.endpoint_hits for r in results)
+    assert counters["false_alarms"] == sum(r.false_alarms for r in results)
+    assert counters["cracked"] == sum(r.password is not None for r in results)
+    assert counters["reduce_calls"] >= 3 * 20 * 19 // 2
+
+    batch = Stats()
+    test_table.stats = batch
+    assert dict(test_table.lookup_many(hashes)) == \
+        {hash_string: r.password for hash_string, r in zip(hashes, results)}
+    assert batch.counters["endpoint_hits"] == \
+        batch.counters["false_alarms"] + batch.counters["cracked"]
+    assert batch.counters["cracked"] == counters["cracked"]
+
+
+def test_parallel_lookup(tmpdir):
+    test_table = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 150, 300)
+    test_table.generate_table(seed=8)
+    test_table.save_to_file(str(tmpdir) + "/table.rt")
+    mapped = RainbowTable.load_from_file(str(tmpdir) + "/table.rt")
+    ranges = mapped.column_ranges(8)
+    assert ranges[0][1] == mapped.chain_length and ranges[-1][0] == 0
+    assert all(a[0] == b[1] for a, b in zip(ranges, ranges[1:]))
+
+    rng = random.Random(6)
+    hashes = [mapped.hash_function(''.join(rng.choices("abc123", k=3))).hex()
+              for _ in range(20)]
+    for hash_string in hashes[:5]:
+        password = mapped.lookup_detailed(hash_string, workers=2).password
+        assert (password is None) == (mapped.lookup(hash_string) is None)
+        if password is not None:
+            assert mapped.hash_function(password).hex() == hash_string
+    assert dict(mapped.lookup_many(hashes, workers=2)) == dict(mapped.lookup_many(hashes))
+
+
+def test_mask_table(tmp_path):
+    test_table = RainbowTable("sha1", "numeric", 4, 5, 20, 300,
+                              masks=["pin", "?u?l?l?c", "?d?d?d"])
+    # the 6-digit PIN and the 3-digit masks are outside the length range
+    assert len(test_table.masks) == 2
+    assert test_table.keyspace().size == 10 ** 4 + 26 ** 3 * 10
+    test_table.generate_table(seed=2)
+    for password in list(test_table.table.values())[:50]:
+        test_table.keyspace().rank(password)
+    filename = str(tmp_path / "masks.rt")
+    test_table.save_to_file(filename)
+    loaded = RainbowTable.load_from_file(filename)
+    assert loaded.masks == test_table.masks
+    start = next(iter(loaded.table.values()))
+    password = loaded.reduce_function(loaded.hash_function(start), 0)
+    assert loaded.lookup(loaded.hash_function(password).hex()) == password
+    with pytest.raises(ValueError):
+        RainbowTable("sha1", "numeric", 1, 2, 20, 300, masks=["pin"])
+
+
+def test_stats_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("hash")
+    parser.add_argument("table")
+    add_stats_arguments(parser)
+    # --stats takes its file, it does not swallow the next argument
+    args = parser.parse_args(["--stats", "-", "ab12", "table.rt"])
+    assert (args.stats, args.hash, args.table) == ("-", "ab12", "table.rt")
+    with pytest.raises(SystemExit):
+        parser.parse_args(["ab12", "table.rt", "--stats"])
@@ -0,0 +1,52 @@
+import random
+from rainbowtable import RainbowTable
+from sharding import LocalCluster, ShardedTable, is_manifest, split_table
+from stats import Stats
+
+
+def test_sharded_lookup(tmpdir):
+    table = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 30, 600)
+    table.generate_table(seed=4)
+    rng = random.Random(3)
+    hashes = [table.hash_function(''.join(rng.choices("abc123", k=rng.randint(1, 3)))).hex()
+              for _ in range(60)]
+    expected = dict(table.lookup_many(hashes))
+
+    for compact in (False, True):
+        filename = str(tmpdir.join(f"table{compact}.rt"))
+        table.save_to_file(filename, compact=compact)
+        source = RainbowTable.load_from_file(filename)
+        manifest = split_table(source, str(tmpdir.join(f"shards{compact}")), 3)
+        assert is_manifest(manifest) and not is_manifest(filename)
+
+        sharded = ShardedTable.load(manifest)
+        assert len(sharded) == len(source.table)
+        assert all(abs(records - len(source.table) / 3) <= 1 for records in sharded.records)
+        shards = [RainbowTable.load_from_file(name) for name in sharded.files]
+        for endpoint, start in source.table.items():
+            assert shards[sharded.shard_of(endpoint)].table[endpoint] == start
+
+        with LocalCluster(sharded, 3) as cluster:
+            assert dict(sharded.lookup_many(hashes, cluster)) == expected
+        probes = [counters["probes"] for counters in cluster.counters]
+        assert min(probes) > sum(probes) / 6
+
+
+def test_sharded_lookup_stats(tmpdir):
+    table = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 30, 600)
+    table.generate_table(seed=4)
+    hashes = [table.hash_function(password).hex() for password in ("ab", "c1", "zz9")]
+    filename = str(tmpdir.join("table.rt"))
+    table.save_to_file(filename)
+    sharded = ShardedTable.load(split_table(RainbowTable.load_from_file(filename),
+                                            str(tmpdir.join("shards")), 2))
+    stats = sharded.table.stats = Stats()
+    with LocalCluster(sharded, 2) as cluster:
+        results = dict(sharded.lookup_many(hashes, cluster))
+    for counters in cluster.counters:
+        stats.merge(counters["stats"])
+    counters = stats.counters
+    assert counters["cracked"] == sum(password is not None for password in results.values())
+    assert counters["index_probes"] == sum(node["probes"] for node in cluster.counters) > 0
+    assert counters["endpoint_hits"] == counters["false_alarms"] + counters["cracked"]
+    assert counters["hash_calls"] > 0 and set(stats.phases) == {"walk", "probe"}
@@ -0,0 +1,125 @@
+import os
+import pytest
+import random
+from keyspace import Keyspace, MaskKeyspace, parse_mask
+from rainbowtable import RainbowTable
+from tablefile import CompactEndpointIndex, EndpointIndex, TableHeader, _prefix, is_table_file
+
+
+def test_keyspace():
+    keyspace = Keyspace("abc", 1, 3)
+    assert keyspace.size == 3 + 9 + 27
+    passwords = [keyspace.unrank(i) for i in range(keyspace.size)]
+    assert passwords[0] == "a"
+    assert passwords[3] == "aa"
+    assert passwords[-1] == "ccc"
+    assert len(set(passwords)) == keyspace.size
+    assert [keyspace.rank(p) for p in passwords] == list(range(keyspace.size))
+    with pytest.raises(ValueError):
+        keyspace.rank("abcd")
+    with pytest.raises(ValueError):
+        keyspace.unrank(keyspace.size)
+
+
+def test_mask_keyspace():
+    assert parse_mask("?u?d-x??", {}) == ["ABCDEFGHIJKLMNOPQRSTUVWXYZ", "0123456789",
+                                          "-", "x", "?"]
+    assert parse_mask("?{vowels}?c", {"vowels": "aeiou", "c": "xy"}) == ["aeiou", "xy"]
+    with pytest.raises(ValueError):
+        parse_mask("?q", {})
+    keyspace = MaskKeyspace([parse_mask("?d?d"), parse_mask("ab?d")])
+    assert keyspace.size == 110
+    assert (keyspace.min_length, keyspace.max_length) == (2, 3)
+    passwords = [keyspace.unrank(i) for i in range(keyspace.size)]
+    assert passwords[:2] == ["00", "01"]
+    assert passwords[100] == "ab0"
+    assert [keyspace.rank(p) for p in passwords] == list(range(keyspace.size))
+    with pytest.raises(ValueError):
+        keyspace.rank("ac0")
+
+
+def test_header_roundtrip():
+    header = TableHeader(1, "abc", 2, 5, 100, 1000, 990, 20, 2,
+                         {"seed": 42})
+    parsed = TableHeader.unpack(header.pack())
+    assert parsed.charset == "abc"
+    assert parsed.chain_length == 100
+    assert parsed.record_count == 990
+    assert parsed.metadata == {"seed": 42}
+    assert parsed.data_offset == header.data_offset
+
+
+def test_save_binary_and_mmap(tmpdir):
+    test_table = RainbowTable("md5", "alphanumeric", 2, 4, 5, 200)
+    test_table.generate_table(seed=7)
+    filename = str(tmpdir) + "/table.rt"
+    assert test_table.save_to_file(filename)
+    assert is_table_file(filename)
+    mapped = RainbowTable.load_from_file(filename)
+    assert isinstance(mapped.table, EndpointIndex)
+    assert list(mapped.table) == sorted(test_table.table)
+    for endpoint, password in random.sample(list(test_table.table.items()), 20):
+        assert mapped.table[endpoint] == password
+    assert mapped.table.get(bytes(16)) is None
+
+
+def test_compact_table(tmpdir):
+    test_table = RainbowTable("sha1", "lower_alphanumeric", 1, 5, 20, 3000)
+    test_table.generate_table(seed=3)
+    filename = str(tmpdir) + "/compact.rt"
+    test_table.save_to_file(filename, compact=True)
+    compact = RainbowTable.load_from_file(filename)
+    assert isinstance(compact.table, CompactEndpointIndex)
+    assert os.path.getsize(filename) < 10 * len(test_table.table)
+    # truncated endpoints only collide with a negligible probability
+    assert len(compact.table) >= len(test_table.table) - 2
+    found = sum(compact.table.get(endpoint) == password
+                for endpoint, password in test_table.table.items())
+    assert found >= len(test_table.table) - 2
+    assert compact.table.get(bytes(20)) is None
+    start = next(iter(test_table.table.values()))
+    password = compact.reduce_function(compact.hash_function(start), 0)
+    assert compact.lookup(compact.hash_function(password).hex()) == password
+    # saved again, a compact table keeps its truncated endpoints
+    again = str(tmpdir) + "/again.rt"
+    compact.save_to_file(again)
+    with open(filename, "rb") as original, open(again, "rb") as copy:
+        assert original.read() == copy.read()
+    with pytest.raises(ValueError):
+        compact.save_to_file(again, compact=False)
+
+
+def test_convert_pickled_table(tmpdir):
+    legacy = RainbowTable.load_from_file("test/mocktable.ttest")
+    filename = str(tmpdir) + "/converted.rt"
+    legacy.save_to_file(filename)
+    converted = RainbowTable.load_from_file(filename)
+    assert converted.table == legacy.table
+    assert converted.lookup("e4815b09a6fdc84943f727b1611bd704899864ca") == "cUK"
+
+
+def test_bloom_filter(tmpdir):
+    test_table = RainbowTable("sha1", "lower_alphanumeric", 1, 5, 20, 3000)
+    test_table.generate_table(seed=5)
+    rng = random.Random(2)
+    missing = [rng.getrandbits(160).to_bytes(20, 'big') for _ in range(4000)]
+    filename = str(tmpdir) + "/bloom.rt"
+    test_table.save_to_file(filename, bloom=0.01)
+    for compact in (False, True):
+        if compact:
+            RainbowTable.load_from_file(filename).save_to_file(filename + ".c", compact=True)
+        table = RainbowTable.load_from_file(filename + ".c" if compact else filename)
+        bloom = table.table.bloom
+        assert bloom is not None and bloom.fpr == 0.01
+        # no stored endpoint is rejected, few missing ones are accepted
+        found = sum(table.table.get(endpoint) == password
+                    for endpoint, password in test_table.table.items())
+        assert found >= len(test_table.table) - 2
+        key = (lambda e: _prefix(e) >> (64 - table.table.key_bits)) if compact else _prefix
+        assert sum(key(endpoint) in bloom for endpoint in missing) < 0.02 * len(missing)
+        assert all(table.table.get(endpoint) is None for endpoint in missing)
+    # bloom=0 drops the filter
+    RainbowTable.load_from_file(filename).save_to_file(filename + ".n", bloom=0)
+    assert RainbowTable.load_from_file(filename + ".n").table.bloom is None
+    with pytest.raises(ValueError):
+        test_table.save_to_file(filename, bloom=1)
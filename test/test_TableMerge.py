@@ -0,0 +1,66 @@
+import logging
+import pytest
+from rainbowtable import RainbowTable
+from tablefile import compact_layout
+from tablemerge import extend_table, merge_tables
+
+
+def generate(tmpdir, name, chains, seed, **parameters):
+    table = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 30, chains, **parameters)
+    table.generate_table(seed=seed, output=str(tmpdir.join(name)))
+    return RainbowTable.load_from_file(str(tmpdir.join(name)))
+
+
+def test_merge_and_extend(tmpdir):
+    first = generate(tmpdir, "a.rt", 400, 1)
+    second = generate(tmpdir, "b.rt", 400, 2)
+    merged = merge_tables([first, second], str(tmpdir.join("merged.rt")))
+    assert merged.number_of_chains == 800
+    assert merged.seed is None
+    assert list(merged.table) == sorted(set(first.table) | set(second.table))
+    for endpoint, start in merged.table.items():
+        assert start == first.table.get(endpoint, second.table.get(endpoint))
+    assert merged.coverage > max(first.coverage, second.coverage)
+
+    with pytest.raises(ValueError):
+        extend_table(first, 400, str(tmpdir.join("extended.rt")), seed=1)
+    extended = extend_table(first, 400, str(tmpdir.join("a.rt")), seed=2)
+    assert dict(extended.table.items()) == dict(merged.table.items())
+    assert extended.coverage == merged.coverage
+
+    other = generate(tmpdir, "c.rt", 400, 2, table_index=1)
+    with pytest.raises(ValueError):
+        merge_tables([first, other], str(tmpdir.join("bad.rt")))
+
+
+def test_merge_compact(tmpdir):
+    first = generate(tmpdir, "a.rt", 400, 1)
+    second = generate(tmpdir, "b.rt", 400, 2)
+    first.save_to_file(str(tmpdir.join("a.compact.rt")), compact=True)
+    compact = RainbowTable.load_from_file(str(tmpdir.join("a.compact.rt")))
+    with pytest.raises(ValueError):
+        merge_tables([compact, second], str(tmpdir.join("bad.rt")), compact=False)
+    merged = merge_tables([compact, second], str(tmpdir.join("merged.rt")))
+    assert merged.table.key_bits == compact.table.key_bits
+    # endpoints of both tables sharing their first key_bits bits are duplicates
+    for endpoint, start in first.table.items():
+        assert merged.table[endpoint] == start
+    truncate = compact.table.truncate
+    assert len(merged.table) == len({truncate(endpoint) for table in (first, second)
+                                     for endpoint in table.table})
+
+
+def test_extend_compact_key_bits(tmpdir, caplog):
+    first = generate(tmpdir, "a.rt", 400, 1)
+    # the extension of a full table keeps the bits of its new chain count
+    extended = extend_table(first, 4000, str(tmpdir.join("full.rt")), seed=2, compact=True)
+    assert extended.table.key_bits == compact_layout(4400, 20)['key_bits']
+    assert extended.table.key_bits > compact_layout(400, 20)['key_bits']
+
+    first.save_to_file(str(tmpdir.join("a.compact.rt")), compact=True)
+    compact = RainbowTable.load_from_file(str(tmpdir.join("a.compact.rt")))
+    with caplog.at_level(logging.WARNING):
+        extended = extend_table(compact, 4000, str(tmpdir.join("compact.rt")), seed=2)
+    # a compact table cannot recover the bits it dropped
+    assert extended.table.key_bits == compact.table.key_bits
+    assert "endpoint bits" in caplog.text
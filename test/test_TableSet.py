@@ -0,0 +1,50 @@
+import random
+from rainbowtable import RainbowTable
+from tableset import TableSet, find_tables
+
+
+def test_table_index_changes_reduce_family():
+    original = RainbowTable("sha1", "lower_alphanumeric", 1, 5, 10, 1)
+    other = RainbowTable("sha1", "lower_alphanumeric", 1, 5, 10, 1, table_index=1)
+    hashed = original.hash_function("abc")
+    assert original.reduce_mask() is None
+    assert [other.reduce_function(hashed, i) for i in range(10)] != \
+        [original.reduce_function(hashed, i) for i in range(10)]
+    assert other.walk_parameters() != original.walk_parameters()
+
+
+def test_lookup_across_tables(tmpdir):
+    for name, table_index, seed in [("a.rt", 0, 1), ("b.rt", 0, 2), ("c.rt", 1, 3)]:
+        table = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 20, 150,
+                             table_index=table_index)
+        table.generate_table(seed=seed)
+        table.save_to_file(str(tmpdir.join(name)))
+    tmpdir.join("notes.txt").write("not a table")
+    assert [path.rsplit("/", 1)[1] for path in find_tables(str(tmpdir))] == \
+        ["a.rt", "b.rt", "c.rt"]
+
+    tables = TableSet.load(str(tmpdir))
+    assert len(tables) == 3
+    assert sorted(len(group.tables) for group in tables.groups) == [1, 2]
+    priorities = [group.priority() for group in tables.groups]
+    assert priorities == sorted(priorities, reverse=True)
+    loaded = {name.rsplit("/", 1)[1]: table
+              for group in tables.groups for name, table in group.tables}
+    assert loaded["c.rt"].table_index == 1
+
+    rng = random.Random(2)
+    hashes = [loaded["a.rt"].hash_function(''.join(rng.choices("abc123", k=3))).hex()
+              for _ in range(40)]
+    expected = {}
+    for hash_string in hashes:
+        for table in loaded.values():
+            password = table.lookup(hash_string)
+            if password is not None:
+                expected[hash_string] = password
+                break
+    results = {hash_string: password
+               for hash_string, password, _ in tables.lookup_many(hashes)}
+    assert {h for h, p in results.items() if p is not None} == set(expected)
+    for hash_string in expected:
+        name, result = tables.lookup(hash_string)
+        assert loaded[name.rsplit("/", 1)[1]].hash_function(result.password).hex() == hash_string
@@ -0,0 +1,53 @@
+import os
+from rainbowtable import RainbowTable
+from tablefile import read_header
+from tableverify import check_chains, check_checksums, check_header, self_test
+
+
+def test_verify_table(tmpdir):
+    table = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 30, 600)
+    table.generate_table(seed=4)
+    filename = str(tmpdir.join("table.rt"))
+    table.save_to_file(filename, bloom=0.01)
+    loaded = RainbowTable.load_from_file(filename)
+    header = read_header(filename)
+    assert check_header(header, loaded, os.path.getsize(filename)) == []
+    assert check_checksums(filename, header) == []
+    chains = check_chains(loaded, 200, workers=2, seed=1)
+    assert chains == {"checked": 200, "mismatches": [], "unsearchable": []}
+    result = self_test(loaded, 40, seed=2)
+    assert result["passed"] and result["hashes"] == 40
+    assert abs(result["mean_miss_steps"] - result["expected_miss_steps"]) \
+        < 0.2 * result["expected_miss_steps"]
+
+    # a corrupt record fails its checksum block
+    with open(filename, "r+b") as fd:
+        fd.seek(header.data_offset + 100)
+        byte = fd.read(1)
+        fd.seek(header.data_offset + 100)
+        fd.write(bytes([byte[0] ^ 1]))
+    assert check_checksums(filename, header) == [0]
+
+    # chains built with other reduce functions than the metadata says
+    table.reduce_version = 1
+    wrong = str(tmpdir.join("wrong.rt"))
+    table.save_to_file(wrong)
+    assert len(check_chains(RainbowTable.load_from_file(wrong), 50, seed=1)["mismatches"]) == 50
+
+
+def test_verify_without_checksums(tmpdir):
+    table = RainbowTable("md5", "alphanumeric", 2, 3, 5, 100)
+    table.generate_table(seed=1)
+    filename = str(tmpdir.join("old.rt"))
+    table.save_to_file(filename)
+    # as written by older versions, without checksums
+    header = read_header(filename)
+    header.checksums = None
+    with open(filename, "r+b") as fd:
+        fd.write(header.pack(header.data_offset))
+        fd.truncate(header.data_end())
+    header = read_header(filename)
+    assert check_checksums(filename, header) is None
+    loaded = RainbowTable.load_from_file(filename)
+    assert check_header(header, loaded, os.path.getsize(filename)) == []
+    assert check_chains(loaded, 1000)["checked"] == len(table.table)
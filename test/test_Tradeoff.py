@@ -0,0 +1,39 @@
+import pytest
+from tradeoff import (TablePlan, column_points, perfect_coverage, points_coverage,
+                      rainbow_coverage, start_points_for, suggest_plans)
+
+
+def test_coverage_estimates():
+    assert perfect_coverage(1000, 10, 1) == pytest.approx(0.01)
+    assert perfect_coverage(1000, 1000, 5) == 1.0
+    assert rainbow_coverage(10 ** 6, 100, 1) == pytest.approx(1e-4)
+    # merges make a rainbow table cover less than a perfect one
+    assert rainbow_coverage(10 ** 6, 10 ** 4, 1000) < perfect_coverage(10 ** 6, 10 ** 4, 1000)
+    assert points_coverage(10 ** 6, 10 ** 6) == pytest.approx(0.632, abs=1e-3)
+
+
+def test_perfect_start_points_invert_column_points():
+    start_points = start_points_for(10 ** 6, 5000, 100)
+    assert column_points(10 ** 6, start_points, 100)[-1] >= 5000
+    assert column_points(10 ** 6, start_points - 1, 100)[-1] < 5000
+    # no more chains than a table started from the whole keyspace keeps
+    assert start_points_for(10 ** 6, 10 ** 6, 100) is None
+
+
+def test_plan_predictions():
+    plan = TablePlan(10 ** 6, 100, 10 ** 4, 10, step_rate=1000.0, tables=2, workers=4)
+    assert plan.success == pytest.approx(1 - (1 - rainbow_coverage(10 ** 6, 10 ** 4, 100)) ** 2)
+    assert plan.table_bytes == 2 * plan.stored_chains * 10
+    assert plan.generation_seconds == pytest.approx(2 * 10 ** 4 * 100 / 4000)
+    assert plan.lookup_seconds > 2 * 100 * 99 / 2 / 1000
+
+
+def test_suggested_plans_meet_the_target():
+    plans = suggest_plans(10 ** 6, 10, 1000.0, 0.95, max_bytes=10 ** 6)
+    assert plans
+    lookups = [plan.lookup_seconds for plan in plans]
+    assert lookups == sorted(lookups)
+    for plan in plans:
+        assert plan.success >= 0.95
+        assert plan.table_bytes <= 10 ** 6
+    assert suggest_plans(10 ** 6, 10, 1000.0, 0.95, max_bytes=100) == []
@@ -0,0 +1,69 @@
+import random
+from rainbowtable import RainbowTable
+from walkcache import WalkCache
+
+
+def test_get_put_and_lru_eviction(tmpdir):
+    cache = WalkCache(str(tmpdir) + "/walks.db", max_bytes=2 * 40 + 10)
+    first = [bytes([1]) * 20, bytes([2]) * 20]
+    assert cache.get("p", b"a", 20) is None
+    cache.put("p", b"a", first)
+    assert cache.get("p", b"a", 20) == first
+    assert cache.get("other", b"a", 20) is None
+    cache.put("p", b"b", first)
+    cache.get("p", b"a", 20)  # b becomes the least recently used walk
+    cache.put("p", b"c", first)
+    assert cache.get("p", b"b", 20) is None
+    assert cache.get("p", b"a", 20) == first
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert stats["bytes"] == 2 * 40
+    assert stats["hits"] == 3
+    cache.close()
+
+    reopened = WalkCache(str(tmpdir) + "/walks.db", max_bytes=2 * 40 + 10)
+    assert reopened.get("p", b"c", 20) == first
+    assert reopened.size == 2 * 40
+    reopened.close()
+
+
+def test_cached_walks_shared_by_sibling_tables(tmpdir):
+    first = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 15, 200)
+    first.generate_table(seed=1)
+    sibling = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 15, 200)
+    sibling.generate_table(seed=2)
+    rng = random.Random(3)
+    hashes = [first.hash_function(''.join(rng.choices("abc123", k=3))).hex()
+              for _ in range(30)]
+    expected = dict(sibling.lookup_many(hashes))
+
+    cache = WalkCache(str(tmpdir) + "/walks.db")
+    first.walk_cache = cache
+    uncracked = [h for h, password in first.lookup_many(hashes) if password is None]
+    assert cache.stats()["misses"] == len(set(hashes))
+
+    sibling.walk_cache = cache
+    assert dict(sibling.lookup_many(hashes)) == expected
+    assert cache.stats()["hits"] == len(set(uncracked))
+    target = bytes.fromhex(uncracked[0])
+    assert sibling._cached_walk(target) == [
+        sibling.walk(target, column) for column in range(sibling.chain_length)]
+    cache.close()
+
+
+def test_parallel_lookups_fill_the_cache(tmpdir):
+    test_table = RainbowTable("sha1", "lower_alphanumeric", 1, 3, 15, 200)
+    test_table.generate_table(seed=1)
+    rng = random.Random(4)
+    hashes = [test_table.hash_function(''.join(rng.choices("abc123", k=3))).hex()
+              for _ in range(12)]
+    expected = dict(test_table.lookup_many(hashes))
+
+    test_table.walk_cache = WalkCache(str(tmpdir) + "/walks.db")
+    assert dict(test_table.lookup_many(hashes, workers=2)) == expected
+    uncracked = [h for h, password in expected.items() if password is None]
+    assert test_table.walk_cache.stats()["entries"] == len(uncracked)
+    assert dict(test_table.lookup_many(hashes, workers=2)) == expected
+    assert test_table.walk_cache.stats()["hits"] == len(uncracked)
+    test_table.walk_cache.close()
@@ -0,0 +1,297 @@
+'''Analytical coverage estimates of rainbow tables.
+
+Coverage is the probability that a password drawn uniformly from the
+keyspace appears somewhere in the table, which is the success
+probability of a lookup (Oechslin, "Making a Faster Cryptanalytic
+Time-Memory Trade-Off", 2003). The same model predicts the storage,
+generation time and lookup cost of a table, for planning its parameters.
+'''
+import math
+import time
+
+
+def rainbow_coverage(keyspace_size, number_of_chains, chain_length):
+    '''Coverage of a rainbow table built from number_of_chains start
+    points, merges included: column i holds m_i distinct points, with
+    m_1 = number_of_chains and m_(i+1) = N (1 - e^(-m_i / N))
+
+    Arguments:
+        keyspace_size {int} -- number of passwords N
+        number_of_chains {int} -- number of start points
+        chain_length {int} -- number of columns
+
+    Returns:
+        float -- success probability
+    '''
+    n = float(keyspace_size)
+    m = float(number_of_chains)
+    log_miss = 0.0
+    for _ in range(chain_length):
+        if m >= n:
+            return 1.0
+        log_miss += math.log1p(-m / n)
+        m = -n * math.expm1(-m / n)
+    return -math.expm1(log_miss)
+
+
+def perfect_coverage(keyspace_size, number_of_chains, chain_length):
+    '''Coverage of a perfect rainbow table: chains never merge, so every
+    column holds number_of_chains distinct points
+
+    Arguments:
+        keyspace_size {int} -- number of passwords N
+        number_of_chains {int} -- number of unique chains
+        chain_length {int} -- number of columns
+
+    Returns:
+        float -- success probability
+    '''
+    if number_of_chains >= keyspace_size:
+        return 1.0
+    return -math.expm1(chain_length * math.log1p(-number_of_chains / keyspace_size))
+
+
+def points_coverage(keyspace_size, points):
+    '''Coverage of a table holding the given number of non-merging chain
+    points spread over independent reduce functions, such as a
+    distinguished point table
+
+    Arguments:
+        keyspace_size {int} -- number of passwords N
+        points {int} -- total length of the chains
+
+    Returns:
+        float -- success probability
+    '''
+    return -math.expm1(-points / keyspace_size)
+
+
+def column_points(keyspace_size, number_of_chains, chain_length):
+    '''Distinct points m_1 ... m_t of every column of a rainbow table, the
+    last one being the number of distinct endpoints kept
+
+    Arguments:
+        keyspace_size {int} -- number of passwords N
+        number_of_chains {int} -- number of start points
+        chain_length {int} -- number of columns
+
+    Returns:
+        list -- distinct points per column
+    '''
+    n = float(keyspace_size)
+    m = float(min(number_of_chains, keyspace_size))
+    points = []
+    for _ in range(chain_length):
+        points.append(m)
+        m = -n * math.expm1(-m / n)
+    return points
+
+
+def start_points_for(keyspace_size, unique_chains, chain_length):
+    '''Number of start points a perfect table draws to keep unique_chains
+    chains once the merging ones are dropped (inverse of the last entry of
+    column_points), or None if the keyspace cannot hold that many
+
+    Arguments:
+        keyspace_size {int} -- number of passwords N
+        unique_chains {int} -- chains to keep
+        chain_length {int} -- number of columns
+
+    Returns:
+        int -- start points to generate
+    '''
+    def kept(start_points):
+        return column_points(keyspace_size, start_points, chain_length)[-1]
+
+    if kept(keyspace_size) < unique_chains:
+        return None
+    low, high = unique_chains, keyspace_size
+    while low < high:
+        middle = (low + high) // 2
+        if kept(middle) >= unique_chains:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+def false_alarm_steps(keyspace_size, stored_chains, chain_length):
+    '''Expected hash + reduce steps spent regenerating chains on false
+    alarms during a lookup that finds nothing. The walk from column c ends
+    in the image of t - c - 1 reduce functions, which shrinks like the
+    columns of a table started from the whole keyspace; it hits one of the
+    stored endpoints with probability stored_chains / image size, and the
+    false alarm costs c + 1 steps
+
+    Arguments:
+        keyspace_size {int} -- number of passwords N
+        stored_chains {int} -- distinct endpoints of the table
+        chain_length {int} -- number of columns
+
+    Returns:
+        float -- expected steps
+    '''
+    images = column_points(keyspace_size, keyspace_size, chain_length)
+    return sum(min(1.0, stored_chains / images[chain_length - 1 - column]) * (column + 1)
+               for column in range(chain_length))
+
+
+class TablePlan:
+    '''Predicted cost and success of a set of tables'''
+
+    def __init__(self, keyspace_size, chain_length, number_of_chains, record_size,
+                 step_rate, perfect=False, tables=1, workers=1):
+        """TablePlan constructor
+
+        Arguments:
+                keyspace_size {int} -- number of passwords N
+                chain_length {int} -- number of columns
+                number_of_chains {int} -- chains requested per table (start
+                    points, or unique chains of a perfect table)
+                record_size {int} -- bytes stored per chain
+                step_rate {float} -- hash + reduce steps per second of one
+                    process
+                perfect {bool} -- merging chains are dropped and replaced
+                    (default: {False})
+                tables {int} -- tables of different table indices
+                    (default: {1})
+                workers {int} -- generation processes (default: {1})
+        """
+        self.keyspace_size = keyspace_size
+        self.chain_length = chain_length
+        self.number_of_chains = number_of_chains
+        self.perfect = perfect
+        self.tables = tables
+        if perfect:
+            self.start_points = start_points_for(keyspace_size, number_of_chains, chain_length)
+            self.stored_chains = number_of_chains
+            coverage = perfect_coverage(keyspace_size, number_of_chains, chain_length)
+        else:
+            self.start_points = number_of_chains
+            self.stored_chains = round(column_points(keyspace_size, number_of_chains,
+                                                     chain_length)[-1])
+            coverage = rainbow_coverage(keyspace_size, number_of_chains, chain_length)
+        self.feasible = self.start_points is not None
+        self.table_coverage = coverage
+        self.success = -math.expm1(tables * math.log1p(-coverage)) if coverage < 1 else 1.0
+        self.table_bytes = tables * self.stored_chains * record_size
+        generated = (self.start_points or 0) * chain_length * tables
+        self.generation_seconds = generated / (step_rate * workers)
+        # a lookup that finds nothing walks every column of every table
+        self.lookup_steps = tables * (chain_length * (chain_length - 1) / 2 + false_alarm_steps(
+            keyspace_size, self.stored_chains, chain_length))
+        self.lookup_seconds = self.lookup_steps / step_rate
+
+    def as_dict(self):
+        return {
+            "chain_length": self.chain_length,
+            "number_of_chains": self.number_of_chains,
+            "tables": self.tables,
+            "perfect": self.perfect,
+            "start_points": self.start_points,
+            "stored_chains": self.stored_chains,
+            "success": self.success,
+            "table_bytes": self.table_bytes,
+            "generation_seconds": self.generation_seconds,
+            "lookup_seconds": self.lookup_seconds,
+        }
+
+
+def chains_for_coverage(keyspace_size, chain_length, coverage, perfect=False):
+    '''Fewest chains per table reaching a coverage, or None if a single
+    table of that chain length cannot reach it
+
+    Arguments:
+        keyspace_size {int} -- number of passwords N
+        chain_length {int} -- number of columns
+        coverage {float} -- coverage to reach
+        perfect {bool} -- count unique chains of a perfect table
+            (default: {False})
+
+    Returns:
+        int -- chains to request
+    '''
+    if perfect:
+        # a perfect table keeps at most as many chains as a rainbow table
+        # started from the whole keyspace
+        most = int(column_points(keyspace_size, keyspace_size, chain_length)[-1])
+        estimate = perfect_coverage
+    else:
+        most = keyspace_size
+        estimate = rainbow_coverage
+    if estimate(keyspace_size, most, chain_length) < coverage:
+        return None
+    low, high = 1, most
+    while low < high:
+        middle = (low + high) // 2
+        if estimate(keyspace_size, middle, chain_length) >= coverage:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+def suggest_plans(keyspace_size, record_size, step_rate, target_success, max_bytes=None,
+                  perfect=False, workers=1, max_tables=4, max_chain_length=2 ** 14,
+                  count=5):
+    '''Searches chain lengths (powers of two) and numbers of tables for the
+    smallest tables reaching a success rate, and returns the ones fitting
+    in max_bytes, fastest lookups first
+
+    Arguments:
+        keyspace_size {int} -- number of passwords N
+        record_size {int} -- bytes stored per chain
+        step_rate {float} -- hash + reduce steps per second of one process
+        target_success {float} -- success probability to reach
+        max_bytes {int} -- storage budget of all the tables, None for no
+            limit (default: {None})
+        perfect {bool} -- plan perfect tables (default: {False})
+        workers {int} -- generation processes (default: {1})
+        max_tables {int} -- most tables to combine (default: {4})
+        max_chain_length {int} -- longest chains tried (default: {2 ** 14})
+        count {int} -- number of plans returned (default: {5})
+
+    Returns:
+        list -- TablePlan instances
+    '''
+    plans = []
+    chain_length = 2
+    while chain_length <= min(keyspace_size, max_chain_length):
+        for tables in range(1, max_tables + 1):
+            # independent tables: 1 - (1 - p)^tables = target_success
+            coverage = -math.expm1(math.log1p(-target_success) / tables)
+            chains = chains_for_coverage(keyspace_size, chain_length, coverage, perfect)
+            if chains is None:
+                continue
+            plan = TablePlan(keyspace_size, chain_length, chains, record_size, step_rate,
+                             perfect, tables, workers)
+            if plan.feasible and (max_bytes is None or plan.table_bytes <= max_bytes):
+                plans.append(plan)
+        chain_length *= 2
+    plans.sort(key=lambda plan: (plan.lookup_seconds, plan.generation_seconds))
+    return plans[:count]
+
+
+def measure_step_rate(table, seconds=1.0, batch=256):
+    '''Measures the hash + reduce steps per second of a table in this
+    process, by stepping a batch of hashes through its columns
+
+    Arguments:
+        table {RainbowTable} -- table whose functions are timed
+        seconds {float} -- minimum time measured (default: {1.0})
+        batch {int} -- hashes stepped together (default: {256})
+
+    Returns:
+        float -- steps per second
+    '''
+    hashes = [table.hash_function(str(n)) for n in range(batch)]
+    steps = 0
+    column = 0
+    start = time.perf_counter()
+    while True:
+        hashes = table.step_many(hashes, column)
+        steps += batch
+        column = (column + 1) % table.chain_length
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return steps / elapsed
@@ -0,0 +1,161 @@
+'''Persistent cache of lookup column walks.
+
+Walking a hash to the endpoint of every column costs about
+chain_length^2 / 2 hash + reduce steps, and the result only depends on the
+hash and on the chain parameters, not on the chains of a table. The cache
+keeps those endpoints in an SQLite file so re-running the same hashes
+against a sibling table (same parameters, other chains) only costs the
+endpoint probes and the false alarm checks.
+
+The cache is bounded in bytes and evicts the least recently used walks.
+'''
+import sqlite3
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class WalkCache:
+    '''Size-bounded LRU cache of column endpoints, stored in SQLite'''
+
+    def __init__(self, filename, max_bytes=DEFAULT_MAX_BYTES, check_same_thread=True):
+        """WalkCache constructor
+
+        Arguments:
+                filename {string} -- SQLite file holding the cache
+                max_bytes {int} -- maximum size of the cached endpoints
+                check_same_thread {bool} -- only allow the thread creating
+                    the cache to use it; callers serializing the accesses
+                    of several threads pass False (default: {True})
+        """
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.connection = sqlite3.connect(filename, check_same_thread=check_same_thread)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS walks ("
+            " parameters TEXT NOT NULL,"
+            " target BLOB NOT NULL,"
+            " endpoints BLOB NOT NULL,"
+            " last_used INTEGER NOT NULL,"
+            " PRIMARY KEY (parameters, target))"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS walks_lru ON walks (last_used)")
+        self.clock, self.size = self.connection.execute(
+            "SELECT COALESCE(MAX(last_used), 0), COALESCE(SUM(LENGTH(endpoints)), 0)"
+            " FROM walks").fetchone()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _tick(self):
+        self.clock += 1
+        return self.clock
+
+    def get(self, parameters, target, key_size):
+        '''Returns the cached endpoints of a hash, or None
+
+        Arguments:
+            parameters {string} -- chain parameters (see RainbowTable.walk_parameters)
+            target {bytes} -- hash looked up
+            key_size {int} -- size of one endpoint
+
+        Returns:
+            list -- endpoints indexed by column, or None on a miss
+        '''
+        row = self.connection.execute(
+            "SELECT endpoints FROM walks WHERE parameters = ? AND target = ?",
+            (parameters, target)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute(
+            "UPDATE walks SET last_used = ? WHERE parameters = ? AND target = ?",
+            (self._tick(), parameters, target))
+        endpoints = row[0]
+        return [endpoints[i:i + key_size] for i in range(0, len(endpoints), key_size)]
+
+    def put(self, parameters, target, endpoints):
+        '''Stores the endpoints of a hash, evicting old walks if needed
+
+        Arguments:
+            parameters {string} -- chain parameters (see RainbowTable.walk_parameters)
+            target {bytes} -- hash looked up
+            endpoints {list} -- endpoints indexed by column
+        '''
+        blob = b''.join(endpoints)
+        if len(blob) > self.max_bytes:
+            return
+        previous = self.connection.execute(
+            "SELECT LENGTH(endpoints) FROM walks WHERE parameters = ? AND target = ?",
+            (parameters, target)).fetchone()
+        if previous is not None:
+            self.size -= previous[0]
+        self.connection.execute(
+            "INSERT OR REPLACE INTO walks VALUES (?, ?, ?, ?)",
+            (parameters, target, blob, self._tick()))
+        self.size += len(blob)
+        self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes:
+            rows = self.connection.execute(
+                "SELECT parameters, target, LENGTH(endpoints) FROM walks"
+                " ORDER BY last_used LIMIT 64").fetchall()
+            for parameters, target, size in rows:
+                if self.size <= self.max_bytes:
+                    break
+                self.connection.execute(
+                    "DELETE FROM walks WHERE parameters = ? AND target = ?",
+                    (parameters, target))
+                self.size -= size
+                self.evictions += 1
+
+    def stats(self):
+        '''Returns the hit/miss counters of this session and the cache size'''
+        entries = self.connection.execute("SELECT COUNT(*) FROM walks").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+class WalkLog:
+    '''In-memory stand-in for a WalkCache, for the walks of one set of
+    chain parameters: serves the walks it was given or stored, and
+    records the stored ones in new. Lookup workers use it to send their
+    walks to the process owning the cache, and tables of a TableGroup to
+    share their walks.'''
+
+    def __init__(self, walks=None):
+        self.walks = walks if walks is not None else {}
+        self.new = {}
+
+    def get(self, parameters, target, key_size):
+        return self.walks.get(target)
+
+    def put(self, parameters, target, endpoints):
+        self.walks[target] = endpoints
+        self.new[target] = endpoints
+
+    def commit(self):
+        pass